@@ -0,0 +1,178 @@
+import json
+import os
+from datetime import datetime, timezone
+from xml.sax.saxutils import escape, quoteattr
+
+from htmlnode import ParentNode
+from indexpages import collect_sections, page_url
+from markdown_blocks import text_to_children
+from searchindex import SEARCH_DIR_NAME, write_search_index
+from template import rewrite_links
+from writer import AtomicWriter, write_if_changed
+
+
+SITEMAP_NAME = "sitemap.xml"
+ASSET_MANIFEST_NAME = "assets.json"
+SEARCH_INDEX_NAME = "search-index.json"
+FEED_NAME = "atom.xml"
+FEED_SIZE = 20
+SEARCH_INDEX_VERSION = 2
+ARTIFACT_OUTPUT = "artifact"
+ASSET_MANIFEST_OUTPUT = "asset manifest"
+
+
+def write_artifacts(
+    records,
+    content_dir,
+    dest_dir,
+    basepath="/",
+    site_url="",
+    manifest=None,
+    site_author="",
+    assets=None,
+):
+    # every artifact is streamed entry by entry from the page records, so
+    # memory stays flat however many pages the site has; AtomicWriter leaves
+    # artifacts whose bytes did not change untouched
+    pages = sorted(
+        ((page_url(record.dest_path, dest_dir), record) for record in records.values()),
+        key=lambda page: page[0],
+    )
+    outputs = [(SEARCH_INDEX_NAME, iter_search_index(pages, basepath))]
+    # sitemaps and Atom ids must be absolute URLs, which takes the site's
+    # origin; without it they are not written, and old ones are pruned
+    if site_url:
+        outputs.append((SITEMAP_NAME, iter_sitemap(pages, basepath, site_url)))
+        sections = collect_sections(records, content_dir, dest_dir)
+        for section, posts in sections.items():
+            posts = posts[:FEED_SIZE]
+            # a feed needs an author, either its own or one for every entry
+            if not site_author and not all(post.author for post in posts):
+                continue
+            outputs.append(
+                (
+                    f"{section}/{FEED_NAME}",
+                    iter_feed(
+                        section, posts, basepath, site_url, site_author, assets
+                    ),
+                )
+            )
+
+    written = []
+    for rel_path, lines in outputs:
+        dest_path = os.path.join(dest_dir, *rel_path.split("/"))
+        writer = AtomicWriter(dest_path)
+        with writer as f:
+            f.writelines(lines)
+        if manifest is not None:
+            manifest.record_output(dest_path, ARTIFACT_OUTPUT)
+        if writer.changed:
+            print(f" * artifact -> {dest_path}")
+            written.append(dest_path)
+
+    # the sharded index keeps the doc ids of the URL order above
+    docs = [
+        (public_url(url, basepath), record.title, record.tokens)
+        for url, record in pages
+    ]
+    # a site has many shards, so they are reported with a single line
+    shards = write_search_index(docs, dest_dir, manifest)
+    if shards:
+        search_dir = os.path.join(dest_dir, SEARCH_DIR_NAME)
+        print(f" * search index -> {len(shards)} file(s) in {search_dir}")
+        written.extend(shards)
+    return written
+
+
+def write_asset_manifest(assets, dest_dir, manifest=None):
+    # maps every asset URL to its fingerprinted name, for scripts and tools
+    # outside the build that need to find an asset
+    dest_path = os.path.join(dest_dir, ASSET_MANIFEST_NAME)
+    text = json.dumps(assets, indent=1, sort_keys=True) + "\n"
+    if manifest is not None:
+        manifest.record_output(dest_path, ASSET_MANIFEST_OUTPUT)
+    if write_if_changed(dest_path, text):
+        print(f" * artifact -> {dest_path}")
+        return True
+    return False
+
+
+def public_url(url, basepath="/", site_url=""):
+    # the same rewrite the templates apply to root-relative links
+    return site_url.rstrip("/") + basepath + url[1:]
+
+
+def iter_sitemap(pages, basepath="/", site_url=""):
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n'
+    yield '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+    for url, record in pages:
+        loc = escape(public_url(url, basepath, site_url))
+        lastmod = record.metadata.get("date")
+        if lastmod is None:
+            yield f"  <url><loc>{loc}</loc></url>\n"
+        else:
+            lastmod = escape(str(lastmod))
+            yield f"  <url><loc>{loc}</loc><lastmod>{lastmod}</lastmod></url>\n"
+    yield "</urlset>\n"
+
+
+def iter_search_index(pages, basepath="/"):
+    # one page per line, so the file is written and diffed entry by entry;
+    # this is the page list for browsing, the words are only in search/
+    yield f'{{"version": {SEARCH_INDEX_VERSION}, "pages": [\n'
+    for index, (url, record) in enumerate(pages):
+        entry = {
+            "url": public_url(url, basepath),
+            "title": record.title,
+            "summary": record.summary,
+        }
+        separator = ",\n" if index > 0 else ""
+        yield separator + json.dumps(entry, ensure_ascii=False, sort_keys=True)
+    yield "\n]}\n"
+
+
+def iter_feed(section, posts, basepath="/", site_url="", author="", assets=None):
+    section_url = public_url(f"/{section}", basepath, site_url)
+    feed_url = public_url(f"/{section}/{FEED_NAME}", basepath, site_url)
+    updated = max((atom_date(post) for post in posts), default=atom_timestamp(0))
+    yield '<?xml version="1.0" encoding="utf-8"?>\n'
+    yield '<feed xmlns="http://www.w3.org/2005/Atom">\n'
+    yield f"  <title>{escape(section.replace('-', ' ').capitalize())}</title>\n"
+    yield f"  <id>{escape(section_url)}</id>\n"
+    yield f"  <link href={quoteattr(section_url)} />\n"
+    yield f"  <link href={quoteattr(feed_url)} rel=\"self\" />\n"
+    yield f"  <updated>{updated}</updated>\n"
+    if author:
+        yield f"  <author><name>{escape(author)}</name></author>\n"
+    for post in posts:
+        url = public_url(post.url, basepath, site_url)
+        yield "  <entry>\n"
+        yield f"    <title>{escape(post.title)}</title>\n"
+        yield f"    <id>{escape(url)}</id>\n"
+        yield f"    <link href={quoteattr(url)} />\n"
+        yield f"    <updated>{atom_date(post)}</updated>\n"
+        if post.author:
+            yield f"    <author><name>{escape(str(post.author))}</name></author>\n"
+        if post.summary is not None:
+            summary = ParentNode("p", text_to_children(post.summary)).to_html()
+            # feed readers show the summary away from the site, so its links
+            # get the basepath and fingerprints of the pages, and the origin
+            root = public_url("/", basepath, site_url)
+            summary = rewrite_links(summary, root, assets)
+            yield f'    <summary type="html">{escape(summary)}</summary>\n'
+        yield "  </entry>\n"
+    yield "</feed>\n"
+
+
+def atom_date(post):
+    # the front-matter date if there is one, else the source's mtime
+    if post.date is not None:
+        if "T" in post.date:
+            return post.date
+        return f"{post.date}T00:00:00Z"
+    return atom_timestamp(post.mtime or 0)
+
+
+def atom_timestamp(mtime_ns):
+    moment = datetime.fromtimestamp(mtime_ns / 1e9, timezone.utc)
+    return moment.strftime("%Y-%m-%dT%H:%M:%SZ")
@@ -0,0 +1,533 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import inline_markdown
+import markdown_blocks
+import textnode
+from htmlnode import LeafNode, ParentNode
+from inline_markdown import split_nodes_delimiter, text_to_textnodes
+from document import markdown_to_document
+from gencontent import generate_pages_recursive
+from markdown_blocks import (
+    BlockType,
+    block_to_block_type,
+    markdown_to_blocks,
+    markdown_to_html_node,
+)
+from searchindex import SEARCH_DIR_NAME, SearchIndex, write_search_index
+from textnode import TextNode, TextType
+
+
+MB = 1024 * 1024
+
+
+def best_time(func, *args, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def split_chain_to_textnodes(text):
+    # the five-pass chain text_to_textnodes used before the inline scanner,
+    # kept here as the reference the scanner is measured against
+    nodes = [TextNode(text, TextType.TEXT)]
+    nodes = split_nodes_delimiter(nodes, "**", TextType.BOLD)
+    nodes = split_nodes_delimiter(nodes, "_", TextType.ITALIC)
+    nodes = split_nodes_delimiter(nodes, "`", TextType.CODE)
+    nodes = chain_split_nodes_image(nodes)
+    nodes = chain_split_nodes_link(nodes)
+    return nodes
+
+
+# frozen copies of split_nodes_image and split_nodes_link as they were in the
+# chain: each match rebuilds its markdown and splits the rest of the text on
+# it, which is quadratic in the number of links of a paragraph
+CHAIN_IMAGE_PATTERN = r"!\[([^\[\]]*)\]\(([^\(\)]*)\)"
+CHAIN_LINK_PATTERN = r"(?<!!)\[([^\[\]]*)\]\(([^\(\)]*)\)"
+
+
+def chain_split_nodes_image(old_nodes):
+    new_nodes = []
+    for old_node in old_nodes:
+        if old_node.text_type != TextType.TEXT:
+            new_nodes.append(old_node)
+            continue
+        original_text = old_node.text
+        images = re.findall(CHAIN_IMAGE_PATTERN, original_text)
+        if len(images) == 0:
+            new_nodes.append(old_node)
+            continue
+        for image in images:
+            sections = original_text.split(f"![{image[0]}]({image[1]})", 1)
+            if len(sections) != 2:
+                raise ValueError("invalid markdown, image section not closed")
+            if sections[0] != "":
+                new_nodes.append(TextNode(sections[0], TextType.TEXT))
+            new_nodes.append(TextNode(image[0], TextType.IMAGE, image[1]))
+            original_text = sections[1]
+        if original_text != "":
+            new_nodes.append(TextNode(original_text, TextType.TEXT))
+    return new_nodes
+
+
+def chain_split_nodes_link(old_nodes):
+    new_nodes = []
+    for old_node in old_nodes:
+        if old_node.text_type != TextType.TEXT:
+            new_nodes.append(old_node)
+            continue
+        original_text = old_node.text
+        links = re.findall(CHAIN_LINK_PATTERN, original_text)
+        if len(links) == 0:
+            new_nodes.append(old_node)
+            continue
+        for link in links:
+            sections = original_text.split(f"[{link[0]}]({link[1]})", 1)
+            if len(sections) != 2:
+                raise ValueError("invalid markdown, link section not closed")
+            if sections[0] != "":
+                new_nodes.append(TextNode(sections[0], TextType.TEXT))
+            new_nodes.append(TextNode(link[0], TextType.LINK, link[1]))
+            original_text = sections[1]
+        if original_text != "":
+            new_nodes.append(TextNode(original_text, TextType.TEXT))
+    return new_nodes
+
+
+WORDS = (
+    "the ring hobbit shire elf dwarf wizard mountain river forest road "
+    "tower king sword song light shadow ship star tree stone"
+).split()
+
+
+def synthetic_markdown(size_bytes, seed=0):
+    rng = random.Random(seed)
+    blocks = []
+    total = 0
+    while total < size_bytes:
+        kind = rng.randrange(6)
+        if kind == 0:
+            block = "#" * rng.randint(1, 3) + " " + synthetic_sentence(rng, 5)
+        elif kind == 1:
+            block = "- " + "\n- ".join(synthetic_sentence(rng, 8) for _ in range(4))
+        elif kind == 2:
+            block = "> " + "\n> ".join(synthetic_sentence(rng, 10) for _ in range(2))
+        elif kind == 3:
+            lines = [synthetic_sentence(rng, 6) for _ in range(4)]
+            block = "```\n" + "\n".join(lines) + "\n```"
+        else:
+            block = "\n".join(synthetic_sentence(rng, 16) for _ in range(3))
+        blocks.append(block)
+        total += len(block) + 2
+    return "\n\n".join(blocks)
+
+
+def link_heavy_corpus(size_bytes, seed=0):
+    rng = random.Random(seed)
+    blocks = []
+    total = 0
+    while total < size_bytes:
+        links = [
+            f"[{synthetic_sentence(rng, 3)}](/blog/post-{rng.randrange(10000)})"
+            for _ in range(200)
+        ]
+        block = ", ".join(links)
+        blocks.append(block)
+        total += len(block) + 2
+    return "\n\n".join(blocks)
+
+
+def long_list_corpus(size_bytes, seed=0):
+    rng = random.Random(seed)
+    blocks = []
+    total = 0
+    while total < size_bytes:
+        items = [synthetic_sentence(rng, 8) for _ in range(500)]
+        if len(blocks) % 2 == 0:
+            block = "\n".join(f"- {item}" for item in items)
+        else:
+            block = "\n".join(f"{i}. {item}" for i, item in enumerate(items, 1))
+        blocks.append(block)
+        total += len(block) + 2
+    return "\n\n".join(blocks)
+
+
+def code_block_corpus(size_bytes, seed=0):
+    rng = random.Random(seed)
+    blocks = []
+    total = 0
+    while total < size_bytes:
+        lines = [synthetic_sentence(rng, 10) for _ in range(20000)]
+        block = "```\n" + "\n".join(lines) + "\n```"
+        blocks.append(block)
+        total += len(block) + 2
+    return "\n\n".join(blocks)
+
+
+def synthetic_sentence(rng, length):
+    words = []
+    for _ in range(length):
+        word = rng.choice(WORDS)
+        roll = rng.random()
+        if roll < 0.05:
+            word = f"**{word}**"
+        elif roll < 0.1:
+            word = f"_{word}_"
+        elif roll < 0.13:
+            word = f"`{word}`"
+        elif roll < 0.17:
+            word = f"[{word}](/blog/{word})"
+        words.append(word)
+    return " ".join(words)
+
+
+def link_paragraph(count):
+    return " ".join(
+        f"see [post number {i}](https://example.com/posts/{i}) and"
+        for i in range(count)
+    )
+
+
+def bench_inline():
+    print("inline: split_nodes_* chain vs single-pass scanner")
+    print(f"{'links':>8} {'chain (s)':>12} {'scanner (s)':>12} {'speedup':>9}")
+    for count in (1000, 2000, 4000, 8000, 16000):
+        text = link_paragraph(count)
+        chain = best_time(split_chain_to_textnodes, text)
+        scanner = best_time(text_to_textnodes, text)
+        print(f"{count:>8} {chain:>12.4f} {scanner:>12.4f} {chain / scanner:>8.1f}x")
+    return {"inline.scanner.mb_per_s": len(text) / MB / scanner}
+
+
+class DictTextNode:
+    def __init__(self, text, text_type, url=None):
+        self.text = text
+        self.text_type = text_type
+        self.url = url
+
+
+class DictHTMLNode:
+    def __init__(self, tag=None, value=None, children=None, props=None):
+        self.tag = tag
+        self.value = value
+        self.children = children
+        self.props = props
+
+
+class DictLeafNode(DictHTMLNode):
+    def __init__(self, tag, value, props=None):
+        super().__init__(tag, value, None, props)
+
+
+class DictParentNode(DictHTMLNode):
+    def __init__(self, tag, children, props=None):
+        super().__init__(tag, None, children, props)
+
+
+@contextlib.contextmanager
+def node_classes(text_node, leaf_node, parent_node):
+    # the parser looks its node classes up as module globals at call time, so
+    # swapping them lets the same code run against either layout
+    targets = [
+        (inline_markdown, "TextNode", text_node),
+        (markdown_blocks, "TextNode", text_node),
+        (textnode, "LeafNode", leaf_node),
+        (markdown_blocks, "ParentNode", parent_node),
+    ]
+    saved = [(module, name, getattr(module, name)) for module, name, _ in targets]
+    for module, name, cls in targets:
+        setattr(module, name, cls)
+    try:
+        yield
+    finally:
+        for module, name, cls in saved:
+            setattr(module, name, cls)
+
+
+def retained_memory(func, *args):
+    tracemalloc.start()
+    try:
+        result = func(*args)
+        current, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return current
+
+
+def bench_nodes(corpus_mb):
+    corpus = synthetic_markdown(int(corpus_mb * 1024 * 1024))
+    size_mb = len(corpus) / (1024 * 1024)
+    print(f"nodes: __dict__ vs __slots__ layout on a {size_mb:.1f} MB corpus")
+    print(f"{'layout':>8} {'parse (s)':>10} {'MB/s':>8} {'retained (MB)':>14}")
+    layouts = [
+        ("dict", (DictTextNode, DictLeafNode, DictParentNode)),
+        ("slots", (TextNode, LeafNode, ParentNode)),
+    ]
+    results = {}
+    for label, classes in layouts:
+        with node_classes(*classes):
+            elapsed = best_time(markdown_to_html_node, corpus, repeat=1)
+            retained = retained_memory(markdown_to_html_node, corpus)
+        print(
+            f"{label:>8} {elapsed:>10.3f} {size_mb / elapsed:>8.2f}"
+            f" {retained / (1024 * 1024):>14.1f}"
+        )
+        results[f"nodes.{label}.mb_per_s"] = size_mb / elapsed
+    return results
+
+
+CORPORA = {
+    "mixed": synthetic_markdown,
+    "links": link_heavy_corpus,
+    "lists": long_list_corpus,
+    "code": code_block_corpus,
+}
+
+
+def bench_pipeline(scale):
+    print("pipeline: throughput of each stage per synthetic corpus")
+    print(f"{'corpus':>8} {'stage':>22} {'seconds':>9} {'MB/s':>8}")
+    results = {}
+    for name, generate in CORPORA.items():
+        corpus = generate(int(2 * MB * scale))
+        size_mb = len(corpus.encode("utf-8")) / MB
+        blocks = markdown_to_blocks(corpus)
+        inline_blocks = [
+            block for block in blocks if block_to_block_type(block) != BlockType.CODE
+        ]
+        node = markdown_to_html_node(corpus)
+        stages = [("markdown_to_blocks", lambda: markdown_to_blocks(corpus))]
+        if inline_blocks:
+            stages.append(
+                (
+                    "text_to_textnodes",
+                    lambda: [text_to_textnodes(block) for block in inline_blocks],
+                )
+            )
+        stages.append(("markdown_to_html_node", lambda: markdown_to_html_node(corpus)))
+        stages.append(("to_html", node.to_html))
+        for stage, func in stages:
+            elapsed = best_time(func)
+            print(f"{name:>8} {stage:>22} {elapsed:>9.4f} {size_mb / elapsed:>8.2f}")
+            results[f"pipeline.{name}.{stage}.mb_per_s"] = size_mb / elapsed
+    return results
+
+
+def bench_site(scale, workers):
+    print(f"site: generate_pages_recursive with {workers} worker(s)")
+    print(
+        f"{'site':>8} {'pages':>7} {'MB':>7} {'seconds':>9}"
+        f" {'pages/s':>9} {'MB/s':>8}"
+    )
+    sites = [
+        ("small", max(1, int(2000 * scale)), 2 * 1024),
+        ("giant", 4, int(4 * MB * scale)),
+    ]
+    results = {}
+    for name, pages, page_size in sites:
+        with tempfile.TemporaryDirectory() as tmp:
+            size_mb = write_site(tmp, pages, page_size)
+            content = os.path.join(tmp, "content")
+            template = os.path.join(tmp, "template.html")
+            dest = os.path.join(tmp, "docs")
+            with contextlib.redirect_stdout(io.StringIO()):
+                elapsed = best_time(
+                    generate_pages_recursive,
+                    content,
+                    template,
+                    dest,
+                    "/",
+                    None,
+                    workers,
+                    repeat=1,
+                )
+        print(
+            f"{name:>8} {pages:>7} {size_mb:>7.1f} {elapsed:>9.3f}"
+            f" {pages / elapsed:>9.1f} {size_mb / elapsed:>8.2f}"
+        )
+        results[f"site.{name}.pages_per_s"] = pages / elapsed
+        results[f"site.{name}.mb_per_s"] = size_mb / elapsed
+    return results
+
+
+def write_site(root, pages, page_size):
+    with open(os.path.join(root, "template.html"), "w") as f:
+        f.write("<html><title>{{ Title }}</title><body>{{ Content }}</body></html>")
+    total = 0
+    for i in range(pages):
+        page_dir = os.path.join(root, "content", f"post-{i}")
+        os.makedirs(page_dir)
+        markdown = f"# Post {i}\n\n" + synthetic_markdown(page_size, seed=i)
+        with open(os.path.join(page_dir, "index.md"), "w") as f:
+            f.write(markdown)
+        total += len(markdown)
+    return total / MB
+
+
+def synthetic_search_docs(pages, seed=0):
+    # the synthetic prose only has a few dozen words, so every page also gets
+    # terms from a larger vocabulary, common ones far more often than rare
+    rng = random.Random(seed)
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    vocabulary = [
+        "".join(rng.choices(letters, k=rng.randint(3, 10)))
+        for _ in range(max(100, pages * 10))
+    ]
+    weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+    docs = []
+    for i in range(pages):
+        tokens = markdown_to_document(synthetic_markdown(2 * 1024, seed=i)).tokens
+        tokens.update(rng.choices(vocabulary, weights, k=200))
+        docs.append((f"/post-{i}", f"Post {i}", sorted(tokens)))
+    return docs
+
+
+def bench_search(scale):
+    print("search: sharded inverted index build, size and lookups")
+    print(
+        f"{'pages':>7} {'build (s)':>10} {'shards':>7} {'index KB':>9}"
+        f" {'flat KB':>8} {'cold/s':>9} {'warm/s':>9}"
+    )
+    results = {}
+    for pages in (max(1, int(200 * scale)), max(1, int(2000 * scale))):
+        docs = synthetic_search_docs(pages)
+        # what the index replaces: every page with its full token list
+        flat = len(json.dumps([[url, title, tokens] for url, title, tokens in docs]))
+        rng = random.Random(pages)
+        queries = [
+            " ".join(rng.choice(tokens) for _ in range(rng.randint(1, 3)))
+            for _, _, tokens in rng.choices(docs, k=500)
+        ]
+        with tempfile.TemporaryDirectory() as tmp:
+            build = best_time(write_search_index, docs, tmp, repeat=1)
+            search_dir = os.path.join(tmp, SEARCH_DIR_NAME)
+            names = os.listdir(search_dir)
+            size = sum(os.path.getsize(os.path.join(search_dir, n)) for n in names)
+
+            # cold: a fresh index per query, as a page load would see it
+            def cold():
+                for query in queries:
+                    SearchIndex(search_dir).search(query)
+
+            index = SearchIndex(search_dir)
+
+            def warm():
+                for query in queries:
+                    index.search(query)
+
+            cold_elapsed = best_time(cold)
+            warm_elapsed = best_time(warm)
+        print(
+            f"{pages:>7} {build:>10.3f} {len(names) - 1:>7} {size / 1024:>9.1f}"
+            f" {flat / 1024:>8.1f} {len(queries) / cold_elapsed:>9.0f}"
+            f" {len(queries) / warm_elapsed:>9.0f}"
+        )
+        label = f"search.{pages}"
+        results[f"{label}.build_pages_per_s"] = pages / build
+        results[f"{label}.flat_to_index_ratio"] = flat / size
+        results[f"{label}.cold_lookups_per_s"] = len(queries) / cold_elapsed
+        results[f"{label}.warm_lookups_per_s"] = len(queries) / warm_elapsed
+    return results
+
+
+def compare_to_baseline(results, baseline, tolerance):
+    print(f"baseline comparison (tolerance {tolerance:.0%}, higher is better)")
+    print(f"{'metric':<52} {'baseline':>10} {'current':>10} {'change':>8}")
+    regressions = []
+    for metric, value in sorted(results.items()):
+        expected = baseline.get(metric)
+        if not expected:
+            continue
+        change = value / expected - 1
+        flag = ""
+        if change < -tolerance:
+            regressions.append(metric)
+            flag = "  REGRESSION"
+        print(f"{metric:<52} {expected:>10.2f} {value:>10.2f} {change:>+8.1%}{flag}")
+    return regressions
+
+
+BENCHMARKS = {
+    "inline": lambda args: bench_inline(),
+    "nodes": lambda args: bench_nodes(args.corpus_mb),
+    "pipeline": lambda args: bench_pipeline(args.scale),
+    "site": lambda args: bench_site(args.scale, args.jobs),
+    "search": lambda args: bench_search(args.scale),
+}
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Benchmark the markdown pipeline.")
+    parser.add_argument(
+        "names", nargs="*", choices=[[], *BENCHMARKS], default=[]
+    )
+    parser.add_argument(
+        "--corpus-mb",
+        type=float,
+        default=10,
+        help="size of the synthetic markdown corpus (default: 10)",
+    )
+    parser.add_argument(
+        "--scale",
+        type=float,
+        default=1,
+        help="multiplier for the pipeline and site corpora sizes (default: 1)",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="worker processes used by the site benchmark (default: 1)",
+    )
+    parser.add_argument(
+        "--save-baseline",
+        metavar="PATH",
+        help="write the results to PATH for later comparison",
+    )
+    parser.add_argument(
+        "--baseline",
+        metavar="PATH",
+        help="compare the results against a baseline saved with --save-baseline",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="slowdown allowed before a metric counts as a regression (default: 0.2)",
+    )
+    args = parser.parse_args(argv)
+
+    results = {}
+    for name in args.names or list(BENCHMARKS):
+        results.update(BENCHMARKS[name](args))
+        print()
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"saved baseline to {args.save_baseline}")
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        if compare_to_baseline(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
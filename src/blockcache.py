@@ -0,0 +1,91 @@
+import hashlib
+import json
+from collections import OrderedDict
+
+from writer import read_versioned_json, write_if_changed
+
+
+CACHE_VERSION = 1
+
+
+class BlockCache:
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        # entries put since the last take_changes(), for a copy of the cache
+        # in a worker process; None while not tracked
+        self.added = None
+
+    @staticmethod
+    def key(block):
+        return hashlib.sha1(block.encode("utf-8")).hexdigest()
+
+    def get(self, block):
+        key = self.key(block)
+        html = self.entries.get(key)
+        if html is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return html
+
+    def put(self, block, html):
+        self.store(self.key(block), html)
+
+    def store(self, key, html):
+        self.entries[key] = html
+        self.entries.move_to_end(key)
+        if self.added is not None:
+            self.added[key] = html
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def track_changes(self):
+        # a worker starts from a copy of the parent's cache, counters included
+        self.added = {}
+        self.hits = 0
+        self.misses = 0
+
+    def take_changes(self):
+        # what a worker learned since the last call, to be merged into the
+        # parent's cache
+        changes = (list(self.added.items()), self.hits, self.misses)
+        self.added = {}
+        self.hits = 0
+        self.misses = 0
+        return changes
+
+    def merge(self, changes):
+        entries, hits, misses = changes
+        for key, html in entries:
+            self.store(key, html)
+        self.hits += hits
+        self.misses += misses
+
+    def __len__(self):
+        return len(self.entries)
+
+    def load(self, path):
+        data = read_versioned_json(path, CACHE_VERSION)
+        if data is None:
+            return
+        for key, html in data["entries"][-self.maxsize :]:
+            self.entries[key] = html
+
+    def save(self, path):
+        data = {"version": CACHE_VERSION, "entries": list(self.entries.items())}
+        write_if_changed(path, json.dumps(data))
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        rate = self.hits / lookups * 100 if lookups else 0.0
+        return (
+            f"{self.hits} hits, {self.misses} misses ({rate:.1f}% hit rate), "
+            f"{len(self.entries)}/{self.maxsize} entries"
+        )
+
+    def __repr__(self):
+        return f"BlockCache({self.stats()})"
@@ -0,0 +1,64 @@
+import os
+from pathlib import Path
+
+
+MARKDOWN_EXTENSIONS = frozenset([".md", ".markdown"])
+
+
+class BuildPlan:
+    def __init__(self, pages, static_dirs, static_files):
+        self.pages = pages
+        self.static_dirs = static_dirs
+        self.static_files = static_files
+
+    def __repr__(self):
+        return (
+            f"BuildPlan({len(self.pages)} pages, {len(self.static_dirs)} static dirs,"
+            f" {len(self.static_files)} static files)"
+        )
+
+
+def make_build_plan(dir_path_content, dir_path_static, dest_dir_path):
+    pages = plan_pages(dir_path_content, dest_dir_path)
+    static_dirs, static_files = plan_static(dir_path_static, dest_dir_path)
+    return BuildPlan(pages, static_dirs, static_files)
+
+
+def is_markdown(path):
+    return os.path.splitext(path)[1] in MARKDOWN_EXTENSIONS
+
+
+def plan_pages(dir_path_content, dest_dir_path):
+    pages = []
+    stack = [(dir_path_content, dest_dir_path)]
+    while stack:
+        source_dir, dest_dir = stack.pop()
+        with os.scandir(source_dir) as entries:
+            for entry in entries:
+                dest_path = os.path.join(dest_dir, entry.name)
+                if entry.is_dir():
+                    stack.append((entry.path, dest_path))
+                elif is_markdown(entry.name):
+                    dest_path = Path(dest_path).with_suffix(".html")
+                    pages.append((entry.path, dest_path, entry.stat()))
+    # scandir order is arbitrary; sort by path components so builds are
+    # reproducible and list a directory's pages together
+    pages.sort(key=lambda page: page[0].split(os.sep))
+    return pages
+
+
+def plan_static(dir_path_static, dest_dir_path):
+    dest_dirs = [dest_dir_path]
+    files = []
+    stack = [(dir_path_static, dest_dir_path)]
+    while stack:
+        source_dir, dest_dir = stack.pop()
+        with os.scandir(source_dir) as entries:
+            for entry in entries:
+                dest_path = os.path.join(dest_dir, entry.name)
+                if entry.is_dir():
+                    dest_dirs.append(dest_path)
+                    stack.append((entry.path, dest_path))
+                else:
+                    files.append((entry.path, dest_path, entry.stat()))
+    return dest_dirs, files
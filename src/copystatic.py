@@ -1,16 +1,480 @@
+import hashlib
 import os
+import re
 import shutil
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from itertools import repeat
+from urllib.parse import unquote
 
+from buildplan import plan_static
+from writer import AtomicWriter
 
-def copy_files_recursive(source_dir_path, dest_dir_path):
-    if not os.path.exists(dest_dir_path):
-        os.mkdir(dest_dir_path)
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
 
-    for filename in os.listdir(source_dir_path):
-        from_path = os.path.join(source_dir_path, filename)
-        dest_path = os.path.join(dest_dir_path, filename)
-        print(f" * {from_path} -> {dest_path}")
-        if os.path.isfile(from_path):
-            shutil.copy(from_path, dest_path)
+
+COPY_MODES = ("copy", "hardlink", "reflink")
+PROGRESS_INTERVAL = 5000
+COPY_BUFFER_SIZE = 1024 * 1024
+
+# assets that are only ever loaded through a link in a page; anything else
+# (favicon.ico, robots.txt, CNAME, ...) is fetched by name and keeps it
+FINGERPRINT_EXTENSIONS = frozenset(
+    [
+        ".css",
+        ".js",
+        ".png",
+        ".jpg",
+        ".jpeg",
+        ".gif",
+        ".svg",
+        ".webp",
+        ".avif",
+        ".woff",
+        ".woff2",
+        ".ttf",
+        ".otf",
+        ".mp4",
+        ".webm",
+    ]
+)
+# hex digits of the content hash put into fingerprinted names
+FINGERPRINT_LENGTH = 12
+# url() references in a stylesheet, quoted or not; group 2 is the target
+CSS_URL_RE = re.compile(r"""url\(\s*(['"]?)([^'"()\s]+)\1\s*\)""")
+
+# ioctl request number of FICLONE from linux/fs.h
+FICLONE = 0x40049409
+
+
+class SyncStats:
+    def __init__(self):
+        self.copied_files = 0
+        self.copied_bytes = 0
+        self.skipped_files = 0
+        self.skipped_bytes = 0
+        self.removed_files = 0
+
+    def summary(self):
+        return (
+            f"copied {self.copied_files} file(s)"
+            f" ({format_bytes(self.copied_bytes)}), "
+            f"skipped {self.skipped_files} unchanged"
+            f" ({format_bytes(self.skipped_bytes)}), "
+            f"removed {self.removed_files} orphan(s)"
+        )
+
+    def __repr__(self):
+        return f"SyncStats({self.summary()})"
+
+
+class StaticOptions:
+    def __init__(
+        self,
+        mode="copy",
+        threads=None,
+        verbosity=1,
+        fingerprint=False,
+        images=False,
+        image_widths=(),
+    ):
+        self.mode = mode
+        self.threads = threads
+        self.verbosity = verbosity
+        self.fingerprint = fingerprint
+        self.images = images
+        self.image_widths = image_widths
+
+    def __repr__(self):
+        return (
+            f"StaticOptions({self.mode}, {self.threads}, {self.verbosity}, "
+            f"fingerprint: {self.fingerprint}, images: {self.images}, "
+            f"{self.image_widths})"
+        )
+
+
+def format_bytes(size):
+    if size < 1024:
+        return f"{size} B"
+    for unit in ("KB", "MB", "GB"):
+        size /= 1024
+        if size < 1024 or unit == "GB":
+            return f"{size:.1f} {unit}"
+
+
+def default_copy_threads():
+    # copying is I/O bound, so oversubscribe the CPUs
+    return min(32, (os.cpu_count() or 1) * 4)
+
+
+def copy_static_tree(
+    source_dir_path,
+    dest_dir_path,
+    manifest=None,
+    mode="copy",
+    threads=None,
+    verbosity=1,
+    fingerprint=False,
+):
+    dest_dirs, files = plan_static(source_dir_path, dest_dir_path)
+    return copy_static_files(
+        dest_dirs,
+        files,
+        manifest,
+        mode,
+        threads,
+        verbosity,
+        fingerprint,
+        dest_dir_path,
+    )
+
+
+def copy_static_files(
+    dest_dirs,
+    files,
+    manifest=None,
+    mode="copy",
+    threads=None,
+    verbosity=1,
+    fingerprint=False,
+    root_dir=None,
+):
+    stats = SyncStats()
+    for dest_dir in dest_dirs:
+        os.makedirs(dest_dir, exist_ok=True)
+
+    pending = []
+    stylesheets = []
+    # where every output went, for the url() references of the stylesheets
+    placed = {}
+    for from_path, dest_path, stat in files:
+        if fingerprint and is_stylesheet(dest_path):
+            stylesheets.append((from_path, dest_path, stat))
+            continue
+        placed_path = dest_path
+        if fingerprint and is_fingerprinted(dest_path):
+            # the fingerprinted name is only known once the file was hashed,
+            # so an unchanged asset is found through the previous build
+            placed_path = previous_fingerprint(manifest, from_path, dest_path)
+        if placed_path is not None and is_synced(stat, placed_path):
+            if manifest is not None:
+                manifest.record_static(
+                    from_path, stat, placed_path, original_path(dest_path, placed_path)
+                )
+            placed[os.path.normpath(dest_path)] = placed_path
+            stats.skipped_files += 1
+            stats.skipped_bytes += stat.st_size
+        else:
+            pending.append((from_path, dest_path, stat))
+
+    if not threads:
+        threads = default_copy_threads()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        results = executor.map(
+            place_static_file,
+            [from_path for from_path, _, _ in pending],
+            [dest_path for _, dest_path, _ in pending],
+            repeat(mode),
+            repeat(fingerprint),
+        )
+        for (from_path, dest_path, stat), placed_path in zip(pending, results):
+            # recorded once placed, so an output this replaces is only removed
+            # after the new one exists
+            if manifest is not None:
+                manifest.record_static(
+                    from_path, stat, placed_path, original_path(dest_path, placed_path)
+                )
+            placed[os.path.normpath(dest_path)] = placed_path
+            stats.copied_files += 1
+            stats.copied_bytes += stat.st_size
+            if verbosity >= 2:
+                print(f" * {from_path} -> {placed_path}")
+            elif verbosity >= 1 and stats.copied_files % PROGRESS_INTERVAL == 0:
+                print(f"   {stats.copied_files}/{len(pending)} files copied...")
+
+    for from_path, dest_path, stat, placed_path, copied in place_stylesheets(
+        stylesheets, placed, manifest, mode, root_dir
+    ):
+        if manifest is not None:
+            manifest.record_static(
+                from_path, stat, placed_path, original_path(dest_path, placed_path)
+            )
+        if copied:
+            stats.copied_files += 1
+            stats.copied_bytes += stat.st_size
+            if verbosity >= 2:
+                print(f" * {from_path} -> {placed_path}")
         else:
-            copy_files_recursive(from_path, dest_path)
+            stats.skipped_files += 1
+            stats.skipped_bytes += stat.st_size
+
+    if manifest is not None:
+        # only files an earlier build put there count as orphans; generated
+        # pages share the destination and must survive
+        for path in manifest.prune_static():
+            if verbosity >= 2:
+                print(f" - {path}")
+            stats.removed_files += 1
+    return stats
+
+
+def copy_static_file(
+    from_path, dest_path, manifest=None, mode="copy", stats=None
+):
+    stat = os.stat(from_path)
+    if is_synced(stat, dest_path):
+        if manifest is not None:
+            manifest.record_static(from_path, stat, dest_path)
+        if stats is not None:
+            stats.skipped_files += 1
+            stats.skipped_bytes += stat.st_size
+        return False
+
+    print(f" * {from_path} -> {dest_path}")
+    dest_dir_path = os.path.dirname(dest_path)
+    if dest_dir_path != "":
+        os.makedirs(dest_dir_path, exist_ok=True)
+    place_file(from_path, dest_path, mode)
+    if manifest is not None:
+        manifest.record_static(from_path, stat, dest_path)
+    if stats is not None:
+        stats.copied_files += 1
+        stats.copied_bytes += stat.st_size
+    return True
+
+
+def is_synced(source_stat, dest_path):
+    try:
+        dest_stat = os.stat(dest_path)
+    except FileNotFoundError:
+        return False
+    return (
+        dest_stat.st_size == source_stat.st_size
+        and dest_stat.st_mtime_ns == source_stat.st_mtime_ns
+    )
+
+
+def is_fingerprinted(dest_path):
+    return os.path.splitext(dest_path)[1].lower() in FINGERPRINT_EXTENSIONS
+
+
+def is_stylesheet(dest_path):
+    return os.path.splitext(dest_path)[1].lower() == ".css"
+
+
+def fingerprint_path(path, digest):
+    # images/tom.png -> images/tom.<hash>.png
+    root, ext = os.path.splitext(path)
+    return f"{root}.{digest[:FINGERPRINT_LENGTH]}{ext}"
+
+
+def previous_fingerprint(manifest, from_path, dest_path):
+    if manifest is None:
+        return None
+    entry = manifest.static.get(from_path)
+    if entry is None or entry.get("original") != str(dest_path):
+        return None
+    return entry["dest"]
+
+
+def original_path(dest_path, placed_path):
+    # the unfingerprinted name of an asset, or None if it kept it
+    if str(placed_path) == str(dest_path):
+        return None
+    return dest_path
+
+
+def place_static_file(from_path, dest_path, mode="copy", fingerprint=False):
+    # returns the path the file ended up at
+    if not fingerprint or not is_fingerprinted(dest_path):
+        place_file(from_path, dest_path, mode)
+        return dest_path
+    if mode != "copy":
+        # links and clones share the source's data, so it is read once to
+        # hash it and never copied
+        placed_path = fingerprint_path(dest_path, hash_stream(from_path))
+        place_file(from_path, placed_path, mode)
+        return placed_path
+    return copy_fingerprinted(from_path, dest_path)
+
+
+def copy_fingerprinted(from_path, dest_path):
+    # hashes the data while it is copied, so the source is read only once;
+    # the copy goes to a temp file that is renamed once the hash is known
+    dir_path, name = os.path.split(dest_path)
+    tmp_path = os.path.join(dir_path, f".{name}.{uuid.uuid4().hex}.tmp")
+    digest = hashlib.sha256()
+    try:
+        with open(from_path, "rb") as src, open(tmp_path, "wb") as dst:
+            while True:
+                chunk = src.read(COPY_BUFFER_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                dst.write(chunk)
+        shutil.copystat(from_path, tmp_path)
+        placed_path = fingerprint_path(dest_path, digest.hexdigest())
+        os.replace(tmp_path, placed_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return placed_path
+
+
+def place_stylesheets(stylesheets, placed, manifest=None, mode="copy", root_dir=None):
+    # a stylesheet names fonts, images and other stylesheets in url(), which
+    # must point at their fingerprinted names; so stylesheets are placed once
+    # what they reference was, and the hash is that of the rewritten text.
+    # Yields (from_path, dest_path, stat, placed_path, copied) for each
+    pending = {
+        os.path.normpath(dest_path): (from_path, dest_path, stat)
+        for from_path, dest_path, stat in stylesheets
+    }
+    while pending:
+        yield from place_stylesheet(
+            next(iter(pending)), pending, placed, manifest, mode, root_dir
+        )
+
+
+def place_stylesheet(key, pending, placed, manifest=None, mode="copy", root_dir=None):
+    from_path, dest_path, stat = pending.pop(key)
+    # a stylesheet that is imported back by one it imports keeps that name
+    placed[key] = None
+    try:
+        with open(from_path, encoding="utf-8", newline="") as f:
+            text = f.read()
+    except UnicodeDecodeError:
+        text = ""
+    # the stylesheets it references are placed first, so their new names are
+    # known when its own references are rewritten
+    references = [
+        stylesheet_reference(match.group(2), os.path.dirname(key), root_dir)
+        for match in CSS_URL_RE.finditer(text)
+    ]
+    for reference in references:
+        if reference in pending:
+            yield from place_stylesheet(
+                reference, pending, placed, manifest, mode, root_dir
+            )
+    rewritten = CSS_URL_RE.sub(
+        lambda match: rewrite_reference(match, placed, os.path.dirname(key), root_dir),
+        text,
+    )
+
+    if rewritten == text:
+        # nothing to rewrite: placed like any other asset
+        placed_path = previous_fingerprint(manifest, from_path, dest_path)
+        copied = placed_path is None or not is_synced(stat, placed_path)
+        if copied:
+            placed_path = place_static_file(from_path, dest_path, mode, True)
+    else:
+        digest = hashlib.sha256(rewritten.encode("utf-8")).hexdigest()
+        placed_path = fingerprint_path(dest_path, digest)
+        writer = AtomicWriter(placed_path)
+        with writer as f:
+            f.write(rewritten)
+        copied = writer.changed
+        if copied:
+            shutil.copystat(from_path, placed_path)
+    placed[key] = placed_path
+    yield from_path, dest_path, stat, placed_path, copied
+
+
+def stylesheet_reference(target, base_dir, root_dir=None):
+    # the output path a url() target names, or None for data: URIs, other
+    # sites, and root-relative targets when the root is not known
+    path = unquote(target.split("?", 1)[0].split("#", 1)[0])
+    if path == "" or ":" in path or path.startswith("//"):
+        return None
+    if path.startswith("/"):
+        if root_dir is None:
+            return None
+        return os.path.normpath(os.path.join(root_dir, *path[1:].split("/")))
+    return os.path.normpath(os.path.join(base_dir, *path.split("/")))
+
+
+def rewrite_reference(match, placed, base_dir, root_dir=None):
+    # url(../fonts/a.woff) -> url(../fonts/a.<hash>.woff), in the form the
+    # reference was written in; anything not fingerprinted is left alone
+    quote, target = match.group(1), match.group(2)
+    reference = stylesheet_reference(target, base_dir, root_dir)
+    placed_path = placed.get(reference)
+    if placed_path is None or os.path.normpath(placed_path) == reference:
+        return match.group()
+    digest = os.path.splitext(placed_path)[0].rsplit(".", 1)[1]
+    path, suffix = re.match(r"([^?#]*)(.*)", target).groups()
+    return f"url({quote}{fingerprint_path(path, digest)}{suffix}{quote})"
+
+
+def hash_stream(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(COPY_BUFFER_SIZE)
+            if not chunk:
+                return digest.hexdigest()
+            digest.update(chunk)
+
+
+def asset_urls(manifest, dest_dir):
+    # {"/images/tom.png": "/images/tom.<hash>.png"} for every fingerprinted
+    # asset of the build
+    urls = {}
+    for entry in manifest.static.values():
+        original = entry.get("original")
+        if original is not None:
+            urls[output_url(original, dest_dir)] = output_url(entry["dest"], dest_dir)
+    return urls
+
+
+def output_url(path, dest_dir):
+    return "/" + os.path.relpath(path, dest_dir).replace(os.sep, "/")
+
+
+def place_file(from_path, dest_path, mode="copy"):
+    if mode not in COPY_MODES:
+        raise ValueError(f"invalid copy mode: {mode}")
+    if mode == "hardlink":
+        if os.path.lexists(dest_path):
+            os.remove(dest_path)
+        try:
+            os.link(from_path, dest_path)
+            return
+        except OSError:
+            # cross-device or unsupported: fall back to a real copy
+            pass
+    if mode == "reflink":
+        reflink_file(from_path, dest_path)
+        shutil.copystat(from_path, dest_path)
+        return
+    # copy2 keeps the source mtime, which is what is_synced compares against
+    shutil.copy2(from_path, dest_path)
+
+
+def reflink_file(from_path, dest_path):
+    with open(from_path, "rb") as src, open(dest_path, "wb") as dst:
+        if fcntl is not None:
+            try:
+                fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+                return
+            except OSError:
+                pass
+        # copy_file_range stays in the kernel and shares extents on
+        # filesystems that support it even when FICLONE is refused
+        try:
+            remaining = os.fstat(src.fileno()).st_size
+            while remaining > 0:
+                count = os.copy_file_range(src.fileno(), dst.fileno(), remaining)
+                if count == 0:
+                    break
+                remaining -= count
+            return
+        except (AttributeError, OSError):
+            src.seek(0)
+            dst.seek(0)
+            dst.truncate()
+        shutil.copyfileobj(src, dst)
@@ -0,0 +1,142 @@
+import itertools
+
+from htmlnode import ParentNode
+from inline_markdown import MEDIA_RE, iter_inline
+from linkcheck import is_internal_url
+from markdown_blocks import BlockType, iter_numbered_blocks, lines_to_html_node
+from searchindex import tokenize
+from textnode import TextType
+
+
+class Document:
+    def __init__(self, metadata=None):
+        # a title set in the front matter wins over the first heading
+        self.metadata = metadata if metadata is not None else {}
+        self.title = self.metadata.get("title")
+        self.outline = []
+        self.word_count = 0
+        self.summary = None
+        self.tokens = set()
+        self.links = []
+        self.linked = set()
+        self.node = None
+
+    def add_block(self, block_type, lines, first_line=1):
+        # code is not prose: it adds neither headings nor words
+        if block_type == BlockType.CODE:
+            return
+        if block_type == BlockType.HEADING:
+            level, text = heading_parts(lines)
+            self.outline.append((level, text))
+            if level == 1 and self.title is None:
+                self.title = text
+        if block_type == BlockType.PARAGRAPH and self.summary is None:
+            # the first paragraph with prose in it; a lone "back" link or an
+            # image on its own line does not summarize anything
+            text = " ".join(lines)
+            if MEDIA_RE.sub("", text).strip() != "":
+                self.summary = text
+        for line in lines:
+            self.word_count += len(strip_marker(block_type, line).split())
+        if any("](" in line for line in lines):
+            self.add_links(block_type, lines, first_line)
+
+    def add_links(self, block_type, lines, first_line):
+        # the internal link and image targets the renderer finds in a block,
+        # so markup that is not rendered as a link is not checked either; a
+        # target is kept once, with the line it was first written on, so a
+        # broken one is reported where it was written
+        if block_type in (BlockType.ULIST, BlockType.OLIST):
+            # list items are rendered one by one
+            texts = [
+                (number, strip_marker(block_type, line))
+                for number, line in enumerate(lines, first_line)
+            ]
+        else:
+            text = "\n".join(strip_marker(block_type, line) for line in lines)
+            texts = [(first_line, text)]
+        for number, text in texts:
+            for start, node in iter_inline(text):
+                if node.text_type not in (TextType.LINK, TextType.IMAGE):
+                    continue
+                url = node.url
+                if is_internal_url(url) and url not in self.linked:
+                    self.linked.add(url)
+                    self.links.append((number + text.count("\n", 0, start), url))
+
+    def add_node(self, block_type, node):
+        # search tokens come from the rendered text, so markup, link targets
+        # and image sources never end up in the index; code is left out
+        if block_type == BlockType.CODE:
+            return
+        for text in node.iter_text():
+            self.tokens.update(tokenize(text))
+
+    def read_blocks(self, numbered_blocks):
+        # records each block as it passes through, so the metadata is complete
+        # once the renderer has consumed the last block; the line numbers are
+        # dropped from what is passed on
+        for first_line, block_type, lines in numbered_blocks:
+            self.add_block(block_type, lines, first_line)
+            yield block_type, lines
+
+    def iter_nodes(self, blocks, cache=None):
+        for block_type, lines in blocks:
+            node = lines_to_html_node(block_type, lines, cache)
+            self.add_node(block_type, node)
+            yield node
+
+    def read_until_title(self, blocks):
+        # pulls blocks until the title is known and hands back an iterator
+        # that replays the ones already read ahead of the rest
+        blocks = self.read_blocks(blocks)
+        seen = []
+        while self.title is None:
+            block = next(blocks, None)
+            if block is None:
+                raise ValueError("no title found")
+            seen.append(block)
+        return itertools.chain(seen, blocks)
+
+    def summary_record(self):
+        return {
+            "title": self.title,
+            "summary": self.summary,
+            "tokens": " ".join(sorted(self.tokens)),
+            "links": [[number, url] for number, url in self.links],
+        }
+
+    def __repr__(self):
+        return (
+            f"Document({self.title}, {len(self.outline)} heading(s), "
+            f"{self.word_count} word(s))"
+        )
+
+
+def blocks_to_document(numbered_blocks, cache=None, metadata=None):
+    document = Document(metadata)
+    nodes = document.iter_nodes(document.read_blocks(numbered_blocks), cache)
+    document.node = ParentNode("div", list(nodes))
+    return document
+
+
+def markdown_to_document(markdown, cache=None):
+    return blocks_to_document(iter_numbered_blocks(markdown.split("\n")), cache)
+
+
+def heading_parts(lines):
+    line = lines[0]
+    level = len(line) - len(line.lstrip("#"))
+    return level, line[level + 1 :]
+
+
+def strip_marker(block_type, line):
+    if block_type == BlockType.HEADING:
+        return line.lstrip("#")
+    if block_type == BlockType.QUOTE:
+        return line.lstrip(">")
+    if block_type == BlockType.ULIST:
+        return line[2:]
+    if block_type == BlockType.OLIST:
+        return line.split(". ", 1)[1]
+    return line
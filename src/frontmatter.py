@@ -0,0 +1,82 @@
+import itertools
+
+
+FRONT_MATTER_DELIMITER = "---"
+
+
+def read_front_matter(path):
+    # only the lines up to the closing delimiter are read, so metadata for a
+    # whole site can be collected without touching the markdown bodies
+    with open(path, "r") as f:
+        metadata, _ = split_front_matter(f)
+    return metadata
+
+
+def split_front_matter(lines):
+    # returns the metadata and an iterator over the lines after the header;
+    # a file that does not start with the delimiter has no front matter
+    metadata, lines, _ = split_front_matter_numbered(lines)
+    return metadata, lines
+
+
+def split_front_matter_numbered(lines):
+    # also returns the line number the body starts on
+    lines = iter(lines)
+    first = next(lines, None)
+    if first is None:
+        return {}, lines, 1
+    if first.rstrip("\r\n") != FRONT_MATTER_DELIMITER:
+        return {}, itertools.chain([first], lines), 1
+    header = []
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if line == FRONT_MATTER_DELIMITER:
+            # the header, plus the two delimiter lines around it
+            return parse_front_matter(header), lines, len(header) + 3
+        header.append(line)
+    raise ValueError("invalid front matter, closing --- not found")
+
+
+def parse_front_matter(lines):
+    metadata = {}
+    key = None
+    # line numbers are counted from the opening delimiter on line 1
+    for number, line in enumerate(lines, 2):
+        stripped = line.strip()
+        if stripped == "" or stripped.startswith("#"):
+            continue
+        if stripped.startswith("- ") and key is not None:
+            if metadata[key] == "":
+                metadata[key] = []
+            if isinstance(metadata[key], list):
+                metadata[key].append(parse_scalar(stripped[2:]))
+                continue
+        name, sep, value = line.partition(":")
+        name = name.strip()
+        if sep == "" or name == "" or line[0].isspace():
+            raise ValueError(f"invalid front matter on line {number}: {line}")
+        key = name
+        metadata[key] = parse_value(value.strip())
+    return metadata
+
+
+def parse_value(value):
+    if value.startswith("[") and value.endswith("]"):
+        items = value[1:-1].split(",")
+        return [parse_scalar(item) for item in items if item.strip() != ""]
+    return parse_scalar(value)
+
+
+def parse_scalar(value):
+    value = value.strip()
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in "\"'":
+        return value[1:-1]
+    if value.lower() == "true":
+        return True
+    if value.lower() == "false":
+        return False
+    return value
+
+
+def is_draft(metadata):
+    return metadata.get("draft") is True
@@ -1,43 +1,272 @@
 import os
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from markdown_blocks import markdown_to_html_node
 
+from buildplan import plan_pages
+from document import Document
+from frontmatter import is_draft, read_front_matter, split_front_matter_numbered
+from manifest import hash_file
+from markdown_blocks import iter_block_nodes, iter_numbered_blocks
+from profiler import NULL_CLOCK, NULL_PROFILER, BuildProfiler
+from template import TemplateRegistry
+from writer import AtomicWriter
 
-def generate_pages_recursive(dir_path_content, template_path, dest_dir_path, basepath):
-    for filename in os.listdir(dir_path_content):
-        from_path = os.path.join(dir_path_content, filename)
-        dest_path = os.path.join(dest_dir_path, filename)
-        if os.path.isfile(from_path):
-            dest_path = Path(dest_path).with_suffix(".html")
-            generate_page(from_path, template_path, dest_path, basepath)
-        else:
-            generate_pages_recursive(from_path, template_path, dest_path, basepath)
 
+class PageBuildError(Exception):
+    def __init__(self, failures):
+        self.failures = failures
+        lines = [f"{len(failures)} page(s) failed to build:"]
+        for from_path, error in failures:
+            lines.append(f"  {from_path}: {error}")
+        super().__init__("\n".join(lines))
 
-def generate_page(from_path, template_path, dest_path, basepath):
-    print(f" * {from_path} {template_path} -> {dest_path}")
+
+class PageRecord:
+    # what the index pages need to know about a built page, gathered while
+    # it rendered or carried over from the manifest when it was unchanged
+    def __init__(self, dest_path, metadata, summary, mtime=None):
+        self.dest_path = dest_path
+        self.metadata = metadata
+        self.title = summary["title"]
+        self.summary = summary["summary"]
+        self.tokens = summary.get("tokens", "").split()
+        self.links = summary.get("links", [])
+        self.mtime = mtime
+
+    def __repr__(self):
+        return f"PageRecord({self.dest_path}, {self.title}, {self.metadata})"
+
+
+def generate_pages_recursive(
+    dir_path_content,
+    template_path,
+    dest_dir_path,
+    basepath,
+    manifest=None,
+    workers=1,
+    cache=None,
+    profiler=None,
+):
+    pages = plan_pages(dir_path_content, dest_dir_path)
+    templates = TemplateRegistry(template_path, basepath)
+    return generate_pages(pages, templates, manifest, workers, cache, profiler)
+
+
+def generate_pages(
+    pages,
+    templates,
+    manifest=None,
+    workers=1,
+    cache=None,
+    profiler=None,
+    drafts=False,
+):
+    # returns {from_path: PageRecord} for every page that was built or is
+    # unchanged since the last build, for the index pages and the sitemap,
+    # feeds and search index built from them
+    jobs = []
+    failures = []
+    stats = {}
+    digests = {}
+    metadata = {}
+    mtimes = {}
+    records = {}
+    for from_path, dest_path, stat in pages:
+        try:
+            page_metadata = read_page_metadata(from_path, stat, manifest)
+            template = templates.template_for(
+                from_path, page_metadata.get("template")
+            )
+        except ValueError as e:
+            failures.append((from_path, f"{type(e).__name__}: {e}"))
+            continue
+        if is_draft(page_metadata) and not drafts:
+            continue
+        metadata[from_path] = page_metadata
+        mtimes[from_path] = stat.st_mtime_ns
+        if manifest is not None:
+            # an unchanged size and mtime is trusted without rehashing
+            # pages built before summaries were recorded are rendered again
+            summary = manifest.page_summary(from_path)
+            if summary is not None and manifest.page_stat_matches(
+                from_path, stat, dest_path, template.path
+            ):
+                records[from_path] = PageRecord(
+                    dest_path, page_metadata, summary, stat.st_mtime_ns
+                )
+                continue
+            digest = hash_file(from_path)
+            if summary is not None and not manifest.page_changed(
+                from_path, digest, dest_path, template.path
+            ):
+                manifest.record_page(
+                    from_path,
+                    digest,
+                    dest_path,
+                    stat,
+                    template.path,
+                    page_metadata,
+                    summary,
+                )
+                records[from_path] = PageRecord(
+                    dest_path, page_metadata, summary, stat.st_mtime_ns
+                )
+                continue
+            stats[from_path] = stat
+            digests[from_path] = digest
+        jobs.append((from_path, template, dest_path))
+
+    for (from_path, template, dest_path), (error, summary) in zip(
+        jobs, render_page_jobs(jobs, workers, cache, profiler)
+    ):
+        if error is not None:
+            failures.append((from_path, error))
+            continue
+        records[from_path] = PageRecord(
+            dest_path, metadata[from_path], summary, mtimes[from_path]
+        )
+        if manifest is not None:
+            manifest.record_page(
+                from_path,
+                digests[from_path],
+                dest_path,
+                stats[from_path],
+                template.path,
+                metadata[from_path],
+                summary,
+            )
+    if failures:
+        raise PageBuildError(failures)
+    return records
+
+
+def read_page_metadata(from_path, stat, manifest=None):
+    # an unchanged source reuses the metadata recorded by the last build, so
+    # not even its header is read again
+    if manifest is not None:
+        metadata = manifest.page_metadata(from_path, stat)
+        if metadata is not None:
+            return metadata
+    return read_front_matter(from_path)
+
+
+def manifest_records(manifest):
+    # the records of every page in the manifest, for rebuilding the index
+    # pages after a single page changed
+    records = {}
+    for source_path, entry in manifest.pages.items():
+        summary = entry.get("page")
+        if summary is not None:
+            records[source_path] = PageRecord(
+                entry["dest"], entry.get("meta", {}), summary, entry.get("mtime")
+            )
+    return records
+
+
+def page_dest_path(from_path, dir_path_content, dest_dir_path):
+    rel_path = os.path.relpath(from_path, dir_path_content)
+    return Path(os.path.join(dest_dir_path, rel_path)).with_suffix(".html")
+
+
+def render_page_jobs(jobs, workers=1, cache=None, profiler=None):
+    # jobs are (from_path, template, dest_path) triples, the arguments of
+    # generate_page
+    profiling = profiler is not None and profiler.enabled
+    executor = None
+    _init_worker(cache, profiling)
+    results = map(_render_page_job, jobs)
+    if workers > 1 and len(jobs) > 1:
+        # every worker starts from a copy of the cache and ships the entries
+        # it adds back with each result, so the parent's cache ends up as if
+        # the pages had been rendered in it
+        executor = ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(cache, profiling, True),
+        )
+        # map() hands results back in submission order, so the log and the
+        # failure report are identical to a sequential build
+        chunksize = max(1, len(jobs) // (workers * 4))
+        results = executor.map(_render_page_job, jobs, chunksize=chunksize)
+    try:
+        for job, (error, records, summary, changes) in zip(jobs, results):
+            from_path, template, dest_path = job
+            print(f" * {from_path} {template.path} -> {dest_path}")
+            if profiling:
+                profiler.merge(records)
+            if changes is not None:
+                cache.merge(changes)
+            yield error, summary
+    finally:
+        _init_worker(None, False)
+        if executor is not None:
+            executor.shutdown()
+
+
+_worker_cache = None
+_worker_profiling = False
+_worker_ships_cache = False
+
+
+def _init_worker(cache, profiling, ships_cache=False):
+    global _worker_cache, _worker_profiling, _worker_ships_cache
+    _worker_cache = cache
+    _worker_profiling = profiling
+    _worker_ships_cache = ships_cache and cache is not None
+    if _worker_ships_cache:
+        cache.track_changes()
+
+
+def _render_page_job(args):
+    # each job profiles into its own recorder and ships the records back, so
+    # parallel builds produce the same report as sequential ones
+    profiler = BuildProfiler() if _worker_profiling else None
+    error = None
+    summary = None
+    try:
+        summary = generate_page(*args, _worker_cache, profiler).summary_record()
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    records = profiler.records if profiler is not None else None
+    changes = _worker_cache.take_changes() if _worker_ships_cache else None
+    return error, records, summary, changes
+
+
+def generate_page(from_path, template, dest_path, cache=None, profiler=None):
+    # blocks are parsed, rendered and written one at a time while the source
+    # is read, so a page never has to fit in memory as a whole; the document
+    # collects its metadata from the same pass. A profiled page runs the same
+    # pipeline with each stage timed as it pulls from the one before
+    clock = (profiler or NULL_PROFILER).page_clock(from_path)
     from_file = open(from_path, "r")
-    markdown_content = from_file.read()
-    from_file.close()
-
-    template_file = open(template_path, "r")
-    template = template_file.read()
-    template_file.close()
-
-    node = markdown_to_html_node(markdown_content)
-    html = node.to_html()
-
-    title = extract_title(markdown_content)
-    template = template.replace("{{ Title }}", title)
-    template = template.replace("{{ Content }}", html)
-    template = template.replace('href="/', 'href="' + basepath)
-    template = template.replace('src="/', 'src="' + basepath)
-
-    dest_dir_path = os.path.dirname(dest_path)
-    if dest_dir_path != "":
-        os.makedirs(dest_dir_path, exist_ok=True)
-    to_file = open(dest_path, "w")
-    to_file.write(template)
+    try:
+        with clock.stage("block split"):
+            metadata, lines, first_line = split_front_matter_numbered(
+                clock.iterate("file read", from_file)
+            )
+        document = Document(metadata)
+        blocks = clock.iterate("block split", iter_numbered_blocks(lines, first_line))
+        with clock.stage("inline parse"):
+            blocks = document.read_until_title(blocks)
+        content = iter_content_html(blocks, cache, document, clock)
+        with clock.stage("template substitution"):
+            with AtomicWriter(dest_path) as to_file:
+                template.write(to_file, Title=document.title, Content=content)
+    finally:
+        from_file.close()
+        clock.stop()
+    return document
+
+
+def iter_content_html(blocks, cache=None, document=None, clock=NULL_CLOCK):
+    if document is not None:
+        nodes = document.iter_nodes(blocks, cache)
+    else:
+        nodes = iter_block_nodes(blocks, cache)
+    yield "<div>"
+    for node in clock.iterate("inline parse", nodes):
+        yield from clock.iterate("to_html", node.iter_html())
+    yield "</div>"
 
 
 def extract_title(md):
@@ -1,4 +1,6 @@
 class HTMLNode:
+    __slots__ = ("tag", "value", "children", "props")
+
     def __init__(self, tag=None, value=None, children=None, props=None):
         self.tag = tag
         self.value = value
@@ -6,8 +8,25 @@ class HTMLNode:
         self.props = props
 
     def to_html(self):
+        return "".join(self.iter_html())
+
+    def iter_html(self):
         raise NotImplementedError("to_html method not implemented")
 
+    def write_html(self, fp):
+        fp.writelines(self.iter_html())
+
+    def iter_text(self):
+        # the leaf values in document order, without any markup of their own
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if node.children is None:
+                if node.value is not None:
+                    yield node.value
+            else:
+                stack.extend(reversed(node.children))
+
     def props_to_html(self):
         if self.props is None:
             return ""
@@ -21,8 +40,13 @@ class HTMLNode:
 
 
 class LeafNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(self, tag, value, props=None):
-        super().__init__(tag, value, None, props)
+        self.tag = tag
+        self.value = value
+        self.children = None
+        self.props = props
 
     def to_html(self):
         if self.value is None:
@@ -31,23 +55,45 @@ class LeafNode(HTMLNode):
             return self.value
         return f"<{self.tag}{self.props_to_html()}>{self.value}</{self.tag}>"
 
+    def iter_html(self):
+        yield self.to_html()
+
     def __repr__(self):
         return f"LeafNode({self.tag}, {self.value}, {self.props})"
 
 
 class ParentNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(self, tag, children, props=None):
-        super().__init__(tag, None, children, props)
+        self.tag = tag
+        self.value = None
+        self.children = children
+        self.props = props
 
-    def to_html(self):
+    def iter_html(self):
+        # walk the tree with an explicit stack instead of nested generators so
+        # each fragment is produced in O(1) regardless of how deep it sits
+        yield self.open_tag()
+        stack = [(self.tag, iter(self.children))]
+        while stack:
+            tag, children = stack[-1]
+            child = next(children, None)
+            if child is None:
+                stack.pop()
+                yield f"</{tag}>"
+            elif isinstance(child, ParentNode):
+                yield child.open_tag()
+                stack.append((child.tag, iter(child.children)))
+            else:
+                yield from child.iter_html()
+
+    def open_tag(self):
         if self.tag is None:
             raise ValueError("invalid HTML: no tag")
         if self.children is None:
             raise ValueError("invalid HTML: no children")
-        children_html = ""
-        for child in self.children:
-            children_html += child.to_html()
-        return f"<{self.tag}{self.props_to_html()}>{children_html}</{self.tag}>"
+        return f"<{self.tag}{self.props_to_html()}>"
 
     def __repr__(self):
         return f"ParentNode({self.tag}, children: {self.children}, {self.props})"
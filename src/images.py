@@ -0,0 +1,250 @@
+import json
+import os
+import re
+import shutil
+import struct
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+from copystatic import hash_stream, is_synced, output_url
+from writer import read_versioned_json, write_if_changed
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+
+IMAGE_EXTENSIONS = frozenset([".png", ".jpg", ".jpeg"])
+IMAGE_CACHE_VERSION = 1
+IMAGE_CACHE_INDEX = "index.json"
+IMAGE_OUTPUT = "image"
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# start-of-frame markers carry a JPEG's dimensions; C4, C8 and CC share the
+# range but are other segments
+JPEG_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+# markers without a length field
+JPEG_STANDALONE_MARKERS = frozenset([0x01, *range(0xD0, 0xDA)])
+
+IMG_RE = re.compile(r'<img src="(/[^"?#]*)"')
+
+
+class ImageCache:
+    # what is known about each image, keyed by the hash of its contents: its
+    # size and the variants already rendered; a source whose stat did not
+    # change is not even hashed again
+    def __init__(self, cache_dir, files=None, sizes=None):
+        self.cache_dir = cache_dir
+        self.files = files if files is not None else {}
+        self.sizes = sizes if sizes is not None else {}
+        self.seen_files = set()
+        self.seen_digests = set()
+
+    @classmethod
+    def load(cls, cache_dir):
+        path = os.path.join(cache_dir, IMAGE_CACHE_INDEX)
+        data = read_versioned_json(path, IMAGE_CACHE_VERSION)
+        if data is None:
+            return cls(cache_dir)
+        return cls(cache_dir, data.get("files"), data.get("sizes"))
+
+    def save(self):
+        # only what this build used is kept, including the rendered variants
+        os.makedirs(self.cache_dir, exist_ok=True)
+        for entry in os.scandir(self.cache_dir):
+            digest = entry.name.split("-", 1)[0]
+            if entry.name != IMAGE_CACHE_INDEX and digest not in self.seen_digests:
+                os.remove(entry.path)
+        data = {
+            "version": IMAGE_CACHE_VERSION,
+            "files": {path: self.files[path] for path in self.seen_files},
+            "sizes": {
+                digest: self.sizes[digest]
+                for digest in self.seen_digests
+                if digest in self.sizes
+            },
+        }
+        write_if_changed(
+            os.path.join(self.cache_dir, IMAGE_CACHE_INDEX),
+            json.dumps(data, indent=1, sort_keys=True),
+        )
+
+    def digest(self, source_path, stat):
+        self.seen_files.add(source_path)
+        entry = self.files.get(source_path)
+        if (
+            entry is None
+            or entry["mtime"] != stat.st_mtime_ns
+            or entry["size"] != stat.st_size
+        ):
+            entry = {
+                "mtime": stat.st_mtime_ns,
+                "size": stat.st_size,
+                "hash": hash_stream(source_path),
+            }
+            self.files[source_path] = entry
+        self.seen_digests.add(entry["hash"])
+        return entry["hash"]
+
+    def size(self, digest, source_path):
+        size = self.sizes.get(digest)
+        if size is None:
+            size = image_size(source_path)
+            if size is None:
+                return None
+            self.sizes[digest] = size
+        return tuple(size)
+
+    def variant_path(self, digest, width, ext):
+        return os.path.join(self.cache_dir, f"{digest}-{width}w{ext}")
+
+    def __repr__(self):
+        return f"ImageCache({self.cache_dir}, {len(self.sizes)} image(s))"
+
+
+def image_size(path):
+    # (width, height) from the PNG or JPEG header, or None for anything else
+    with open(path, "rb") as f:
+        header = f.read(24)
+        if header.startswith(PNG_SIGNATURE) and header[12:16] == b"IHDR":
+            return struct.unpack(">II", header[16:24])
+        if header.startswith(b"\xff\xd8"):
+            f.seek(2)
+            return jpeg_size(f)
+    return None
+
+
+def jpeg_size(f):
+    # walks the segments up to the first start-of-frame
+    while True:
+        byte = f.read(1)
+        if byte == b"":
+            return None
+        if byte != b"\xff":
+            continue
+        marker = f.read(1)
+        while marker == b"\xff":
+            marker = f.read(1)
+        if marker == b"":
+            return None
+        marker = marker[0]
+        if marker in JPEG_STANDALONE_MARKERS:
+            continue
+        length = f.read(2)
+        if len(length) < 2:
+            return None
+        length = struct.unpack(">H", length)[0]
+        if marker in JPEG_SOF_MARKERS:
+            frame = f.read(5)
+            if len(frame) < 5:
+                return None
+            height, width = struct.unpack(">HH", frame[1:5])
+            return width, height
+        f.seek(length - 2, os.SEEK_CUR)
+
+
+def variant_path(path, width):
+    # images/tom.png -> images/tom-480w.png
+    root, ext = os.path.splitext(path)
+    return f"{root}-{width}w{ext}"
+
+
+def process_images(manifest, dest_dir, cache_dir, widths=(), workers=1):
+    # returns {url: {"width": ..., "height": ..., "srcset": [[url, width]]}}
+    # for every PNG and JPEG of the build; variants are rendered into the
+    # cache once per image content and copied to dest_dir from there
+    cache = ImageCache.load(cache_dir)
+    widths = sorted(set(widths)) if Image is not None else []
+    images = {}
+    jobs = []
+    outputs = []
+    for source_path in sorted(manifest.static):
+        entry = manifest.static[source_path]
+        original = entry.get("original", entry["dest"])
+        ext = os.path.splitext(original)[1].lower()
+        if ext not in IMAGE_EXTENSIONS:
+            continue
+        digest = cache.digest(source_path, os.stat(source_path))
+        size = cache.size(digest, source_path)
+        if size is None:
+            continue
+        width, height = size
+        info = {"width": width, "height": height}
+        srcset = []
+        for variant_width in widths:
+            if variant_width >= width:
+                continue
+            cached_path = cache.variant_path(digest, variant_width, ext)
+            if not os.path.exists(cached_path):
+                jobs.append((source_path, cached_path, variant_width))
+            # the variant follows the name of the asset, fingerprint included
+            dest_path = variant_path(entry["dest"], variant_width)
+            outputs.append((cached_path, dest_path))
+            srcset.append([output_url(dest_path, dest_dir), variant_width])
+        if srcset:
+            info["srcset"] = srcset
+        images[output_url(original, dest_dir)] = info
+
+    if jobs:
+        os.makedirs(cache_dir, exist_ok=True)
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                list(executor.map(resize_image, *zip(*jobs)))
+        else:
+            for job in jobs:
+                resize_image(*job)
+    for cached_path, dest_path in outputs:
+        manifest.record_output(dest_path, IMAGE_OUTPUT)
+        if not is_synced(os.stat(cached_path), dest_path):
+            print(f" * image -> {dest_path}")
+            shutil.copy2(cached_path, dest_path)
+    cache.save()
+    return images
+
+
+def resize_image(source_path, dest_path, width):
+    # runs in a worker process; writes to a temp file so that an interrupted
+    # resize never leaves a partial variant in the cache
+    tmp_path = f"{dest_path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with Image.open(source_path) as image:
+            height = max(1, round(image.height * width / image.width))
+            resized = image.resize((width, height), Image.LANCZOS)
+            resized.save(tmp_path, format=image.format)
+        os.replace(tmp_path, dest_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return dest_path
+
+
+def add_image_attributes(html, images, basepath="/", assets=None):
+    # runs before the link rewrite, so src is still the URL written in the
+    # markdown; srcset gets its final URLs here since that rewrite only
+    # handles href and src
+    def replace(match):
+        url = match.group(1)
+        info = images.get(url)
+        if info is None:
+            return match.group(0)
+        width = info["width"]
+        attributes = (
+            f' width="{width}" height="{info["height"]}"'
+            ' loading="lazy" decoding="async"'
+        )
+        if info.get("srcset"):
+            candidates = [
+                f"{basepath}{variant_url[1:]} {variant_width}w"
+                for variant_url, variant_width in info["srcset"]
+            ]
+            full_url = assets.get(url, url) if assets else url
+            candidates.append(f"{basepath}{full_url[1:]} {width}w")
+            attributes += (
+                f' srcset="{", ".join(candidates)}"'
+                f' sizes="(max-width: {width}px) 100vw, {width}px"'
+            )
+        return match.group(0) + attributes
+
+    return IMG_RE.sub(replace, html)
@@ -0,0 +1,170 @@
+import os
+import re
+
+from htmlnode import LeafNode, ParentNode
+from markdown_blocks import text_to_children
+from writer import write_if_changed
+
+
+INDEX_PAGE_SIZE = 10
+INDEX_OUTPUT = "index"
+SLUG_RE = re.compile(r"[^a-z0-9]+")
+
+
+class Post:
+    def __init__(
+        self,
+        url,
+        title,
+        summary=None,
+        date=None,
+        tags=None,
+        mtime=None,
+        author=None,
+    ):
+        self.url = url
+        self.title = title
+        self.summary = summary
+        self.date = date
+        self.tags = tags if tags is not None else []
+        self.mtime = mtime
+        self.author = author
+
+    def __repr__(self):
+        return f"Post({self.url}, {self.title}, {self.date}, {self.tags})"
+
+
+def write_index_pages(
+    records, templates, content_dir, dest_dir, manifest=None, page_size=None
+):
+    # every index page is rendered from the records in memory, but only the
+    # ones whose HTML differs from what is already on disk are written
+    if page_size is None:
+        page_size = INDEX_PAGE_SIZE
+    written = []
+    for section, posts in collect_sections(records, content_dir, dest_dir).items():
+        template = templates.template_for(
+            os.path.join(content_dir, section, "index.md")
+        )
+        for rel_dir, title, node in section_index_pages(section, posts, page_size):
+            dest_path = os.path.join(dest_dir, *rel_dir.split("/"), "index.html")
+            html = template.render(Title=title, Content=node.to_html())
+            if manifest is not None:
+                manifest.record_output(dest_path, INDEX_OUTPUT)
+            if write_if_changed(dest_path, html):
+                print(f" * index {template.path} -> {dest_path}")
+                written.append(dest_path)
+    return written
+
+
+def collect_sections(records, content_dir, dest_dir):
+    # a post is a page one directory below a section of content/, either
+    # <section>/<post>/index.md or <section>/<post>.md; a section with its own
+    # index.md keeps it and gets no generated pages
+    sections = {}
+    hand_written = set()
+    for from_path, record in records.items():
+        parts = os.path.relpath(from_path, content_dir).split(os.sep)
+        stem = os.path.splitext(parts[-1])[0]
+        if len(parts) == 2 and stem == "index":
+            hand_written.add(parts[0])
+            continue
+        if len(parts) == 2 or (len(parts) == 3 and stem == "index"):
+            post = Post(
+                page_url(record.dest_path, dest_dir),
+                record.title,
+                record.summary,
+                record.metadata.get("date"),
+                post_tags(record.metadata),
+                record.mtime,
+                record.metadata.get("author"),
+            )
+            sections.setdefault(parts[0], []).append(post)
+    for section in hand_written:
+        sections.pop(section, None)
+    return {section: sort_posts(sections[section]) for section in sorted(sections)}
+
+
+def sort_posts(posts):
+    # newest first; undated posts go last, and ties keep title order
+    posts = sorted(posts, key=lambda post: post.title)
+    return sorted(posts, key=lambda post: post.date or "", reverse=True)
+
+
+def post_tags(metadata):
+    tags = metadata.get("tags", [])
+    if isinstance(tags, str):
+        tags = tags.split(",")
+    return [str(tag).strip() for tag in tags if str(tag).strip() != ""]
+
+
+def page_url(dest_path, dest_dir):
+    rel_path = os.path.relpath(dest_path, dest_dir).replace(os.sep, "/")
+    if rel_path == "index.html":
+        return "/"
+    if rel_path.endswith("/index.html"):
+        return "/" + rel_path[: -len("/index.html")]
+    return "/" + rel_path
+
+
+def slugify(text):
+    return SLUG_RE.sub("-", text.lower()).strip("-")
+
+
+def section_index_pages(section, posts, page_size):
+    title = section.replace("-", " ").capitalize()
+    yield from paginate(section, title, posts, page_size)
+    # tags that differ only in case or punctuation share one page, named
+    # after the spelling seen first
+    tagged = {}
+    names = {}
+    for post in posts:
+        for tag in post.tags:
+            slug = slugify(tag)
+            if slug == "":
+                continue
+            names.setdefault(slug, tag)
+            tagged.setdefault(slug, []).append(post)
+    for slug in sorted(tagged):
+        yield from paginate(
+            f"{section}/tags/{slug}",
+            f"{title}: {names[slug]}",
+            tagged[slug],
+            page_size,
+        )
+
+
+def paginate(base, title, posts, page_size):
+    chunks = [posts[i : i + page_size] for i in range(0, len(posts), page_size)]
+    for number, chunk in enumerate(chunks, 1):
+        if number == 1:
+            rel_dir, page_title = base, title
+        else:
+            rel_dir = f"{base}/page/{number}"
+            page_title = f"{title} (page {number})"
+        node = listing_to_html_node(page_title, chunk, base, number, len(chunks))
+        yield rel_dir, page_title, node
+
+
+def listing_to_html_node(title, posts, base, number, count):
+    items = []
+    for post in posts:
+        link = LeafNode("a", post.title, {"href": post.url})
+        children = [ParentNode("h2", [link])]
+        if post.date is not None:
+            children.append(LeafNode("time", post.date, {"datetime": post.date}))
+        if post.summary is not None:
+            children.append(ParentNode("p", text_to_children(post.summary)))
+        items.append(ParentNode("li", children))
+    children = [LeafNode("h1", title), ParentNode("ul", items)]
+    links = []
+    if number > 1:
+        newer = f"/{base}" if number == 2 else f"/{base}/page/{number - 1}"
+        links.append(LeafNode("a", "« Newer", {"href": newer}))
+    if number < count:
+        older = f"/{base}/page/{number + 1}"
+        links.append(LeafNode("a", "Older »", {"href": older}))
+    if links:
+        children.append(ParentNode("nav", links))
+    return ParentNode("div", children)
+
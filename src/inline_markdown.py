@@ -3,14 +3,71 @@ import re
 from textnode import TextNode, TextType
 
 
+IMAGE_RE = re.compile(r"!\[([^\[\]]*)\]\(([^\(\)]*)\)")
+LINK_RE = re.compile(r"\[([^\[\]]*)\]\(([^\(\)]*)\)")
+# images and links in one pattern; group 1 is "!" for an image and empty for
+# a link, so a "[" right after "!" is never reported as a link
+MEDIA_RE = re.compile(r"(!?)\[([^\[\]]*)\]\(([^\(\)]*)\)")
+INLINE_TOKEN_RE = re.compile(r"\*\*|!\[|[_`\[]")
+DELIMITER_TYPES = {
+    "**": TextType.BOLD,
+    "_": TextType.ITALIC,
+    "`": TextType.CODE,
+}
+
+
 def text_to_textnodes(text):
-    nodes = [TextNode(text, TextType.TEXT)]
-    nodes = split_nodes_delimiter(nodes, "**", TextType.BOLD)
-    nodes = split_nodes_delimiter(nodes, "_", TextType.ITALIC)
-    nodes = split_nodes_delimiter(nodes, "`", TextType.CODE)
-    nodes = split_nodes_image(nodes)
-    nodes = split_nodes_link(nodes)
-    return nodes
+    return scan_inline(text)
+
+
+def scan_inline(text):
+    return [node for _, node in iter_inline(text)]
+
+
+def iter_inline(text):
+    # one left-to-right pass: find the next token, consume its whole span and
+    # continue after it, so every character is looked at a bounded number of
+    # times no matter how many links or delimiters the text contains; each
+    # node comes with the offset its markup starts at
+    text_start = 0
+    pos = 0
+    while True:
+        token = INLINE_TOKEN_RE.search(text, pos)
+        if token is None:
+            break
+        start = token.start()
+        marker = token.group()
+
+        if marker in DELIMITER_TYPES:
+            close = text.find(marker, token.end())
+            if close == -1:
+                raise ValueError("invalid markdown, formatted section not closed")
+            if start > text_start:
+                yield text_start, TextNode(text[text_start:start], TextType.TEXT)
+            if close > token.end():
+                yield start, TextNode(
+                    text[token.end() : close], DELIMITER_TYPES[marker]
+                )
+            pos = text_start = close + len(marker)
+            continue
+
+        if marker == "![":
+            match = IMAGE_RE.match(text, start)
+            text_type = TextType.IMAGE
+        else:
+            match = LINK_RE.match(text, start)
+            text_type = TextType.LINK
+        if match is None:
+            # a "[" right after "!" can never start a link
+            pos = token.end()
+            continue
+        if start > text_start:
+            yield text_start, TextNode(text[text_start:start], TextType.TEXT)
+        yield start, TextNode(match.group(1), text_type, match.group(2))
+        pos = text_start = match.end()
+
+    if text_start < len(text):
+        yield text_start, TextNode(text[text_start:], TextType.TEXT)
 
 
 def split_nodes_delimiter(old_nodes, delimiter, text_type):
@@ -35,66 +92,54 @@ def split_nodes_delimiter(old_nodes, delimiter, text_type):
 
 
 def split_nodes_image(old_nodes):
-    new_nodes = []
-    for old_node in old_nodes:
-        if old_node.text_type != TextType.TEXT:
-            new_nodes.append(old_node)
-            continue
-        original_text = old_node.text
-        images = extract_markdown_images(original_text)
-        if len(images) == 0:
-            new_nodes.append(old_node)
-            continue
-        for image in images:
-            sections = original_text.split(f"![{image[0]}]({image[1]})", 1)
-            if len(sections) != 2:
-                raise ValueError("invalid markdown, image section not closed")
-            if sections[0] != "":
-                new_nodes.append(TextNode(sections[0], TextType.TEXT))
-            new_nodes.append(
-                TextNode(
-                    image[0],
-                    TextType.IMAGE,
-                    image[1],
-                )
-            )
-            original_text = sections[1]
-        if original_text != "":
-            new_nodes.append(TextNode(original_text, TextType.TEXT))
-    return new_nodes
+    return split_nodes_media(old_nodes, (TextType.IMAGE,))
 
 
 def split_nodes_link(old_nodes):
+    return split_nodes_media(old_nodes, (TextType.LINK,))
+
+
+def split_nodes_media(old_nodes, text_types=(TextType.IMAGE, TextType.LINK)):
+    # one finditer pass per node finds images and links together; the text
+    # between them is sliced from the match offsets instead of re-splitting
     new_nodes = []
     for old_node in old_nodes:
         if old_node.text_type != TextType.TEXT:
             new_nodes.append(old_node)
             continue
-        original_text = old_node.text
-        links = extract_markdown_links(original_text)
-        if len(links) == 0:
+        text = old_node.text
+        pos = 0
+        found = False
+        for match in MEDIA_RE.finditer(text):
+            text_type = TextType.IMAGE if match.group(1) else TextType.LINK
+            if text_type not in text_types:
+                continue
+            found = True
+            if match.start() > pos:
+                new_nodes.append(TextNode(text[pos : match.start()], TextType.TEXT))
+            new_nodes.append(TextNode(match.group(2), text_type, match.group(3)))
+            pos = match.end()
+        if not found:
             new_nodes.append(old_node)
-            continue
-        for link in links:
-            sections = original_text.split(f"[{link[0]}]({link[1]})", 1)
-            if len(sections) != 2:
-                raise ValueError("invalid markdown, link section not closed")
-            if sections[0] != "":
-                new_nodes.append(TextNode(sections[0], TextType.TEXT))
-            new_nodes.append(TextNode(link[0], TextType.LINK, link[1]))
-            original_text = sections[1]
-        if original_text != "":
-            new_nodes.append(TextNode(original_text, TextType.TEXT))
+        elif pos < len(text):
+            new_nodes.append(TextNode(text[pos:], TextType.TEXT))
     return new_nodes
 
 
+def extract_markdown_media(text):
+    images = []
+    links = []
+    for match in MEDIA_RE.finditer(text):
+        if match.group(1):
+            images.append(match.group(2, 3))
+        else:
+            links.append(match.group(2, 3))
+    return images, links
+
+
 def extract_markdown_images(text):
-    pattern = r"!\[([^\[\]]*)\]\(([^\(\)]*)\)"
-    matches = re.findall(pattern, text)
-    return matches
+    return IMAGE_RE.findall(text)
 
 
 def extract_markdown_links(text):
-    pattern = r"(?<!!)\[([^\[\]]*)\]\(([^\(\)]*)\)"
-    matches = re.findall(pattern, text)
-    return matches
+    return extract_markdown_media(text)[1]
@@ -0,0 +1,112 @@
+import os
+import posixpath
+import re
+import sys
+from urllib.parse import unquote
+
+
+# a scheme such as https: or mailto:, or a protocol-relative //host
+EXTERNAL_URL_RE = re.compile(r"^([a-zA-Z][a-zA-Z0-9+.-]*:|//)")
+
+
+class BrokenLink:
+    def __init__(self, source_path, line, url):
+        self.source_path = source_path
+        self.line = line
+        self.url = url
+
+    def __repr__(self):
+        return f"BrokenLink({self.source_path}, {self.line}, {self.url})"
+
+
+class PathIndex:
+    # every URL path the built site answers, in one set so that each link is
+    # checked with a single lookup however large the site is
+    def __init__(self, dest_dir):
+        self.dest_dir = dest_dir
+        self.paths = set()
+
+    @classmethod
+    def from_manifest(cls, manifest, dest_dir):
+        # the manifest already records every page, generated page, artifact
+        # and static file of the build, so docs/ is never walked
+        index = cls(dest_dir)
+        for entry in manifest.pages.values():
+            index.add_output(entry["dest"])
+        for dest_path in manifest.outputs:
+            index.add_output(dest_path)
+        for entry in manifest.static.values():
+            index.add_output(entry["dest"])
+            # links to a fingerprinted asset are rewritten to its new name
+            if "original" in entry:
+                index.add_output(entry["original"])
+        return index
+
+    def add_output(self, dest_path):
+        rel_path = os.path.relpath(dest_path, self.dest_dir).replace(os.sep, "/")
+        url = "/" + rel_path
+        self.paths.add(url)
+        if rel_path == "index.html":
+            self.paths.add("/")
+        elif url.endswith("/index.html"):
+            url = url[: -len("/index.html")]
+            self.paths.add(url)
+            self.paths.add(url + "/")
+        elif url.endswith(".html"):
+            # pages are served without their extension too
+            self.paths.add(url[: -len(".html")])
+
+    def __contains__(self, url):
+        return url in self.paths
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __repr__(self):
+        return f"PathIndex({self.dest_dir}, {len(self.paths)} path(s))"
+
+
+def is_internal_url(url):
+    url = url.strip()
+    return url != "" and not url.startswith("#") and not EXTERNAL_URL_RE.match(url)
+
+
+def resolve_url(url, base_dir):
+    # the root-relative path a link points at, without query or fragment;
+    # relative links are resolved against the directory of the page
+    path = unquote(url.strip().split("#", 1)[0].split("?", 1)[0])
+    if path == "":
+        return None
+    if not path.startswith("/"):
+        trailing = "/" if path.endswith("/") else ""
+        path = posixpath.normpath(posixpath.join(base_dir, path)) + trailing
+        if path.startswith("//"):
+            path = path[1:]
+    return path
+
+
+def check_links(records, index):
+    # records is {source_path: PageRecord}; every internal link of every
+    # page is a single set lookup, and the result is in source order
+    broken = []
+    for source_path in sorted(records):
+        record = records[source_path]
+        rel_dest = os.path.relpath(record.dest_path, index.dest_dir)
+        base_dir = "/" + posixpath.dirname(rel_dest.replace(os.sep, "/"))
+        for line, url in record.links:
+            path = resolve_url(url, base_dir)
+            if path is not None and path not in index:
+                broken.append(BrokenLink(source_path, line, url))
+    return broken
+
+
+def report_broken_links(broken, file=None):
+    if file is None:
+        file = sys.stderr
+    print(f"{len(broken)} broken link(s):", file=file)
+    source_path = None
+    for link in broken:
+        if link.source_path != source_path:
+            source_path = link.source_path
+            print(f"  {source_path}", file=file)
+        print(f"    line {link.line}: {link.url}", file=file)
@@ -1,32 +1,533 @@
+import argparse
 import os
 import shutil
 import sys
 
-from copystatic import copy_files_recursive
-from gencontent import generate_pages_recursive
+from blockcache import BlockCache
+from buildplan import is_markdown, make_build_plan
+from copystatic import (
+    COPY_MODES,
+    StaticOptions,
+    asset_urls,
+    copy_static_file,
+    copy_static_files,
+)
+from frontmatter import is_draft, read_front_matter
+from gencontent import (
+    PageBuildError,
+    generate_page,
+    generate_pages,
+    manifest_records,
+    page_dest_path,
+)
+from artifacts import ARTIFACT_OUTPUT, write_artifacts, write_asset_manifest
+from images import Image, process_images
+from indexpages import INDEX_OUTPUT, write_index_pages
+from linkcheck import PathIndex, check_links, report_broken_links
+from manifest import BuildManifest, hash_file
+from profiler import NULL_PROFILER, BuildProfiler
+from searchindex import SEARCH_OUTPUT
+from template import TemplateRegistry
+from watch import poll, serve
+from writer import keep_unchanged_outputs, swap_directories
 
 
 dir_path_static = "./static"
 dir_path_public = "./docs"
+dir_path_staging = "./docs.staging"
 dir_path_content = "./content"
 template_path = "./template.html"
+dir_path_templates = "./templates"
+manifest_path = "./.build-manifest.json"
+dir_path_image_cache = "./.image-cache"
 default_basepath = "/"
+# the kinds of outputs write_site_outputs produces
+SITE_OUTPUT_KINDS = (INDEX_OUTPUT, ARTIFACT_OUTPUT, SEARCH_OUTPUT)
+
+
+class SiteOptions:
+    def __init__(
+        self, drafts=False, site_url="", strict_links=False, site_author=""
+    ):
+        self.drafts = drafts
+        self.site_url = site_url
+        self.strict_links = strict_links
+        self.site_author = site_author
+
+    def __repr__(self):
+        return (
+            f"SiteOptions(drafts: {self.drafts}, {self.site_url}, "
+            f"{self.site_author}, strict links: {self.strict_links})"
+        )
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Build the static site.")
+    parser.add_argument("basepath", nargs="?", default=default_basepath)
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="only rebuild outputs whose inputs changed since the last build",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=parse_count,
+        default=1,
+        help="number of worker processes used to render pages (0 = one per CPU)",
+    )
+    parser.add_argument(
+        "--sync",
+        action="store_true",
+        help="keep docs/ and sync static files into it instead of recopying them",
+    )
+    parser.add_argument(
+        "--static-mode",
+        choices=COPY_MODES,
+        default="copy",
+        help="how changed static files are placed in docs/ (default: copy)",
+    )
+    parser.add_argument(
+        "--copy-threads",
+        type=parse_count,
+        metavar="N",
+        help="threads used to copy static files (0 or default: 4 per CPU, max 32)",
+    )
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        action="count",
+        default=0,
+        help="list every copied static file",
+    )
+    parser.add_argument(
+        "-q",
+        "--quiet",
+        action="count",
+        default=0,
+        help="only report errors from the static copy",
+    )
+    parser.add_argument(
+        "--fingerprint",
+        action="store_true",
+        help="copy assets as name.<hash>.ext and point links in pages at them",
+    )
+    parser.add_argument(
+        "--images",
+        action="store_true",
+        help="add width, height and lazy-loading attributes to PNG and JPEG images",
+    )
+    parser.add_argument(
+        "--image-widths",
+        type=parse_widths,
+        default=(),
+        metavar="W,W,...",
+        help="also render images downscaled to these widths and list them in "
+        "srcset (implies --images, needs Pillow)",
+    )
+    parser.add_argument(
+        "--drafts",
+        action="store_true",
+        help="also build pages marked draft: true in their front matter",
+    )
+    parser.add_argument(
+        "--site-url",
+        default="",
+        metavar="URL",
+        help="origin put in front of links in sitemap.xml and the feeds, "
+        "e.g. https://example.com; both are only written when it is set",
+    )
+    parser.add_argument(
+        "--site-author",
+        default="",
+        metavar="NAME",
+        help="author of the feeds; without it a feed is only written when "
+        "each of its posts names an author in its front matter",
+    )
+    parser.add_argument(
+        "--strict-links",
+        action="store_true",
+        help="fail the build when a page links to a path the site does not have",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="serve the site and rebuild changed pages and assets on save",
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=8888,
+        help="port used by --watch to serve the site (default: 8888)",
+    )
+    parser.add_argument(
+        "--block-cache",
+        metavar="PATH",
+        help="persist the rendered block cache to PATH between builds",
+    )
+    parser.add_argument(
+        "--block-cache-size",
+        type=int,
+        default=4096,
+        help="maximum number of rendered blocks kept in the cache (default: 4096)",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="time each build phase, trace its peak memory with tracemalloc "
+        "and print a per-page report",
+    )
+    parser.add_argument(
+        "--profile-json",
+        metavar="PATH",
+        help="also write the --profile report to PATH as JSON",
+    )
+    parser.add_argument(
+        "--profile-top",
+        type=int,
+        default=10,
+        metavar="N",
+        help="number of slowest pages listed in the profile (default: 10)",
+    )
+    return parser.parse_args(argv)
+
+
+def parse_count(text):
+    # a worker or thread count, where 0 picks the default for the machine
+    try:
+        count = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid count: {text}")
+    if count < 0:
+        raise argparse.ArgumentTypeError(f"invalid count: {text}")
+    return count
+
+
+def parse_widths(text):
+    try:
+        widths = [int(width) for width in text.split(",") if width.strip() != ""]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid widths: {text}")
+    if any(width <= 0 for width in widths):
+        raise argparse.ArgumentTypeError(f"invalid widths: {text}")
+    return widths
 
 
 def main():
-    basepath = default_basepath
-    if len(sys.argv) > 1:
-        basepath = sys.argv[1]
+    args = parse_args(sys.argv[1:])
+    basepath = args.basepath
+    workers = args.jobs if args.jobs > 0 else os.cpu_count()
+    profiler = NULL_PROFILER
+    if args.profile or args.profile_json:
+        profiler = BuildProfiler()
+
+    public_dir = dir_path_public
+    if args.incremental or args.watch:
+        manifest = BuildManifest.load(manifest_path)
+    elif args.sync:
+        # keep the static outputs recorded by the last build, but render
+        # every page again
+        manifest = BuildManifest.load(manifest_path)
+        manifest.invalidate_pages()
+    else:
+        # a full build goes into a staging directory that replaces docs/ only
+        # once it succeeded, so a failed build leaves the live site alone; it
+        # still records a fresh manifest so that the next incremental build
+        # starts from an accurate picture of docs/
+        manifest = BuildManifest()
+        public_dir = dir_path_staging
+        with profiler.phase("rmtree"):
+            if os.path.exists(dir_path_staging):
+                shutil.rmtree(dir_path_staging)
+    templates = TemplateRegistry(
+        template_path, basepath, dir_path_templates, dir_path_content
+    )
+    manifest.set_inputs(templates.hashes(), basepath)
+
+    cache = BlockCache(args.block_cache_size)
+    if args.block_cache:
+        cache.load(args.block_cache)
 
-    print("Deleting public directory...")
-    if os.path.exists(dir_path_public):
-        shutil.rmtree(dir_path_public)
+    static_options = StaticOptions(
+        args.static_mode,
+        args.copy_threads,
+        1 + args.verbose - args.quiet,
+        args.fingerprint,
+        args.images or bool(args.image_widths),
+        args.image_widths,
+    )
+    if args.image_widths and Image is None:
+        print("Pillow is not installed, image variants are skipped", file=sys.stderr)
+    if not args.site_url:
+        # sitemaps and Atom ids need absolute URLs
+        print("No --site-url, sitemap.xml and the feeds are skipped", file=sys.stderr)
+    elif not args.site_author:
+        print(
+            "No --site-author, feeds are only written for sections whose posts "
+            "all name an author",
+            file=sys.stderr,
+        )
+    site_options = SiteOptions(
+        args.drafts, args.site_url, args.strict_links, args.site_author
+    )
+    ok = build(
+        templates,
+        workers,
+        manifest,
+        cache,
+        static_options,
+        site_options,
+        profiler,
+        public_dir,
+    )
+    if public_dir == dir_path_public:
+        manifest.save(manifest_path)
+    elif ok:
+        print("Swapping the staged build into place...")
+        with profiler.phase("swap"):
+            # static files already keep the mtime of their source
+            keep_unchanged_outputs(
+                [entry["dest"] for entry in manifest.pages.values()]
+                + list(manifest.outputs),
+                dir_path_staging,
+                dir_path_public,
+            )
+            swap_directories(dir_path_staging, dir_path_public)
+        manifest.move_outputs(dir_path_staging, dir_path_public)
+        manifest.save(manifest_path)
+    else:
+        print("Build failed, keeping the current public directory", file=sys.stderr)
+        shutil.rmtree(dir_path_staging)
+    if profiler.enabled:
+        print(profiler.report(args.profile_top))
+        if args.profile_json:
+            profiler.write_json(args.profile_json, args.profile_top)
+    if cache.hits or cache.misses:
+        print(f"Block cache: {cache.stats()}")
+    if args.block_cache:
+        cache.save(args.block_cache)
+    if args.watch:
+        watch_and_serve(
+            templates,
+            workers,
+            manifest,
+            cache,
+            static_options,
+            site_options,
+            args.port,
+        )
+    elif not ok:
+        sys.exit(1)
+
+
+def build(
+    templates,
+    workers,
+    manifest,
+    cache,
+    static_options,
+    site_options,
+    profiler=NULL_PROFILER,
+    public_dir=dir_path_public,
+):
+    # the caller saves the manifest, once it knows where the outputs ended up
+    with profiler.phase("discovery"):
+        plan = make_build_plan(dir_path_content, dir_path_static, public_dir)
 
     print("Copying static files to public directory...")
-    copy_files_recursive(dir_path_static, dir_path_public)
+    with profiler.phase("static copy"):
+        stats = copy_static_files(
+            plan.static_dirs,
+            plan.static_files,
+            manifest,
+            static_options.mode,
+            static_options.threads,
+            static_options.verbosity,
+            static_options.fingerprint,
+            public_dir,
+        )
+    if static_options.verbosity >= 1:
+        print(f"Static files: {stats.summary()}")
+    # pages are rendered against the fingerprinted names and the image sizes
+    # of this build
+    assets = asset_urls(manifest, public_dir)
+    images = {}
+    if static_options.images:
+        with profiler.phase("images"):
+            images = process_images(
+                manifest,
+                public_dir,
+                dir_path_image_cache,
+                static_options.image_widths,
+                workers,
+            )
+    templates.set_assets(assets, images)
+    manifest.set_assets(assets, images)
+    if static_options.fingerprint:
+        write_asset_manifest(assets, public_dir, manifest)
 
     print("Generating content...")
-    generate_pages_recursive(dir_path_content, template_path, dir_path_public, basepath)
+    try:
+        records = generate_pages(
+            plan.pages,
+            templates,
+            manifest,
+            workers,
+            cache,
+            profiler,
+            site_options.drafts,
+        )
+    except PageBuildError as e:
+        print(e, file=sys.stderr)
+        return False
+
+    write_site_outputs(
+        records, templates, manifest, site_options, public_dir, profiler
+    )
+    for path in manifest.prune():
+        print(f" - {path}")
+    with profiler.phase("link check"):
+        links_ok = check_site_links(records, manifest, public_dir)
+    return links_ok or not site_options.strict_links
+
+
+def write_site_outputs(
+    records,
+    templates,
+    manifest,
+    site_options,
+    public_dir=dir_path_public,
+    profiler=NULL_PROFILER,
+):
+    # everything built from the page records rather than from a source file
+    with profiler.phase("index pages"):
+        write_index_pages(records, templates, dir_path_content, public_dir, manifest)
+    with profiler.phase("artifacts"):
+        write_artifacts(
+            records,
+            dir_path_content,
+            public_dir,
+            templates.basepath,
+            site_options.site_url,
+            manifest,
+            site_options.site_author,
+            templates.assets,
+        )
+
+
+def check_site_links(records, manifest, public_dir=dir_path_public):
+    # the links were collected while the pages rendered and the outputs are
+    # all in the manifest, so nothing is read back from the public directory
+    broken = check_links(records, PathIndex.from_manifest(manifest, public_dir))
+    if broken:
+        report_broken_links(broken)
+    return not broken
+
+
+def watch_and_serve(
+    templates, workers, manifest, cache, static_options, site_options, port
+):
+    server = serve(dir_path_public, port)
+    print(f"Serving {dir_path_public} at http://localhost:{port}/")
+    watched = [dir_path_content, dir_path_static, template_path, dir_path_templates]
+    print(f"Watching {', '.join(watched)}...")
+
+    def on_change(changed, removed):
+        rebuild_changed(
+            changed,
+            removed,
+            templates,
+            workers,
+            manifest,
+            cache,
+            static_options,
+            site_options,
+        )
+
+    try:
+        poll(watched, on_change)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+
+
+def rebuild_changed(
+    changed,
+    removed,
+    templates,
+    workers,
+    manifest,
+    cache,
+    static_options,
+    site_options,
+):
+    if (static_options.fingerprint or static_options.images) and any(
+        path.startswith(dir_path_static + os.sep) for path in changed + removed
+    ):
+        # a new fingerprint or image size changes every page that uses the asset
+        print("Assets changed, rebuilding the pages against them...")
+        build(templates, workers, manifest, cache, static_options, site_options)
+        manifest.save(manifest_path)
+        return
+    if any(is_template(path) for path in changed + removed):
+        print("Templates changed, regenerating the pages that use them...")
+        templates.reload()
+        manifest.set_inputs(templates.hashes(), templates.basepath)
+        build(templates, workers, manifest, cache, static_options, site_options)
+        manifest.save(manifest_path)
+        return
+
+    pages_changed = False
+    for path in changed:
+        if path.startswith(dir_path_static + os.sep):
+            rel_path = os.path.relpath(path, dir_path_static)
+            dest_path = os.path.join(dir_path_public, rel_path)
+            copy_static_file(path, dest_path, manifest, static_options.mode)
+        elif path.startswith(dir_path_content + os.sep) and is_markdown(path):
+            dest_path = page_dest_path(path, dir_path_content, dir_path_public)
+            try:
+                metadata = read_front_matter(path)
+                if is_draft(metadata) and not site_options.drafts:
+                    # a page that became a draft is taken down
+                    removed.append(path)
+                    continue
+                template = templates.template_for(path, metadata.get("template"))
+                print(f" * {path} {template.path} -> {dest_path}")
+                document = generate_page(path, template, dest_path, cache)
+            except Exception as e:
+                print(f"  {path}: {type(e).__name__}: {e}", file=sys.stderr)
+                continue
+            manifest.record_page(
+                path,
+                hash_file(path),
+                dest_path,
+                os.stat(path),
+                template.path,
+                metadata,
+                document.summary_record(),
+            )
+            pages_changed = True
+    for path in removed:
+        dest_path = manifest.forget(path)
+        if dest_path is not None:
+            print(f" - {dest_path}")
+            pages_changed = True
+    if pages_changed:
+        # the records of unchanged pages come from the manifest, so the
+        # index pages and artifacts are rebuilt without reading any other page
+        records = manifest_records(manifest)
+        write_site_outputs(records, templates, manifest, site_options)
+        # e.g. the page of a tag no post has any more
+        for path in manifest.prune_outputs(SITE_OUTPUT_KINDS):
+            print(f" - {path}")
+        check_site_links(records, manifest)
+    manifest.save(manifest_path)
+
+
+def is_template(path):
+    return path == template_path or path.startswith(dir_path_templates + os.sep)
 
 
-main()
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+import hashlib
+import json
+import os
+
+from writer import read_versioned_json, write_if_changed
+
+
+MANIFEST_VERSION = 6
+
+
+def hash_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(path):
+    with open(path, "rb") as f:
+        return hash_bytes(f.read())
+
+
+class BuildManifest:
+    def __init__(
+        self,
+        templates=None,
+        basepath=None,
+        pages=None,
+        static=None,
+        assets=None,
+        images=None,
+        outputs=None,
+    ):
+        self.templates = templates if templates is not None else {}
+        self.basepath = basepath
+        self.pages = pages if pages is not None else {}
+        self.static = static if static is not None else {}
+        self.assets = assets if assets is not None else {}
+        self.images = images if images is not None else {}
+        # outputs generated from the build as a whole rather than from one
+        # source file, e.g. index pages and artifacts, mapped to their kind
+        self.outputs = outputs if outputs is not None else {}
+        self.seen_pages = set()
+        self.seen_static = set()
+        self.seen_outputs = set()
+
+    @classmethod
+    def load(cls, path):
+        data = read_versioned_json(path, MANIFEST_VERSION)
+        if data is None:
+            return cls()
+        return cls(
+            data.get("templates"),
+            data.get("basepath"),
+            data.get("pages"),
+            data.get("static"),
+            data.get("assets"),
+            data.get("images"),
+            data.get("outputs"),
+        )
+
+    def save(self, path):
+        data = {
+            "version": MANIFEST_VERSION,
+            "templates": self.templates,
+            "basepath": self.basepath,
+            "pages": self.pages,
+            "static": self.static,
+            "assets": self.assets,
+            "images": self.images,
+            "outputs": self.outputs,
+        }
+        write_if_changed(path, json.dumps(data, indent=1, sort_keys=True))
+
+    def set_inputs(self, templates, basepath):
+        # every page embeds the basepath, so changing it invalidates all pages;
+        # templates maps each template path to its hash, and a changed
+        # template only invalidates the pages rendered with it
+        if basepath != self.basepath:
+            self.invalidate_pages()
+        else:
+            for source_path, entry in self.pages.items():
+                template = entry.get("template")
+                if templates.get(template) != self.templates.get(template):
+                    self.pages[source_path] = invalidated(entry)
+        self.templates = dict(templates)
+        self.basepath = basepath
+
+    def set_assets(self, assets, images=None):
+        # assets maps each fingerprinted asset URL to its current name and
+        # images each image URL to its size and variants; pages may link to
+        # any of them, so a change to either invalidates all pages
+        images = images if images is not None else {}
+        if assets != self.assets or images != self.images:
+            self.invalidate_pages()
+        self.assets = dict(assets)
+        self.images = dict(images)
+
+    def page_changed(self, source_path, digest, dest_path, template=None):
+        self.seen_pages.add(source_path)
+        entry = self.pages.get(source_path)
+        if entry is None or entry.get("template") != template:
+            return True
+        if entry["hash"] != digest or entry["dest"] != str(dest_path):
+            return True
+        return not os.path.exists(dest_path)
+
+    def page_stat_matches(self, source_path, stat, dest_path, template=None):
+        self.seen_pages.add(source_path)
+        entry = self.pages.get(source_path)
+        if entry is None or entry["dest"] != str(dest_path):
+            return False
+        if entry.get("template") != template:
+            return False
+        if entry.get("mtime") != stat.st_mtime_ns or entry.get("size") != stat.st_size:
+            return False
+        return os.path.exists(dest_path)
+
+    def page_metadata(self, source_path, stat):
+        entry = self.pages.get(source_path)
+        if entry is None:
+            return None
+        if entry.get("mtime") != stat.st_mtime_ns or entry.get("size") != stat.st_size:
+            return None
+        return entry.get("meta", {})
+
+    def page_summary(self, source_path):
+        entry = self.pages.get(source_path)
+        if entry is None:
+            return None
+        return entry.get("page")
+
+    def record_page(
+        self,
+        source_path,
+        digest,
+        dest_path,
+        stat=None,
+        template=None,
+        metadata=None,
+        summary=None,
+    ):
+        self.seen_pages.add(source_path)
+        entry = {"hash": digest, "dest": str(dest_path)}
+        if stat is not None:
+            entry["mtime"] = stat.st_mtime_ns
+            entry["size"] = stat.st_size
+        if template is not None:
+            entry["template"] = template
+        if metadata:
+            entry["meta"] = metadata
+        if summary is not None:
+            entry["page"] = summary
+        self.pages[source_path] = entry
+
+    def record_static(self, source_path, stat, dest_path, original_path=None):
+        # original_path is the name a fingerprinted asset was copied under;
+        # an output left behind under another name, e.g. the previous
+        # fingerprint of the file, is removed
+        self.seen_static.add(source_path)
+        previous = self.static.get(source_path)
+        entry = {
+            "mtime": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "dest": str(dest_path),
+        }
+        if original_path is not None:
+            entry["original"] = str(original_path)
+        self.static[source_path] = entry
+        if previous is not None and previous["dest"] != entry["dest"]:
+            remove_output(previous["dest"])
+
+    def record_output(self, dest_path, kind):
+        self.seen_outputs.add(str(dest_path))
+        self.outputs[str(dest_path)] = kind
+
+    def forget(self, source_path):
+        for entries in (self.pages, self.static):
+            entry = entries.pop(source_path, None)
+            if entry is not None and remove_output(entry["dest"]):
+                return entry["dest"]
+        return None
+
+    def move_outputs(self, from_dir, to_dir):
+        # for outputs built in a staging directory that was then moved into
+        # place; both spellings of the directory that paths may start with
+        # are rewritten
+        prefixes = [
+            (from_dir, to_dir),
+            (os.path.normpath(from_dir), os.path.normpath(to_dir)),
+        ]
+
+        def move(path):
+            for old, new in prefixes:
+                if path.startswith(old + os.sep):
+                    return new + path[len(old) :]
+            return path
+
+        for entries in (self.pages, self.static):
+            for entry in entries.values():
+                for key in ("dest", "original"):
+                    if key in entry:
+                        entry[key] = move(entry[key])
+        self.outputs = {move(path): kind for path, kind in self.outputs.items()}
+
+    def invalidate_pages(self):
+        # every page is rendered again, but the outputs stay known so that
+        # the ones no longer built are still pruned
+        self.pages = {
+            source_path: invalidated(entry) for source_path, entry in self.pages.items()
+        }
+
+    def prune(self):
+        return self.prune_pages() + self.prune_static() + self.prune_outputs()
+
+    def prune_pages(self):
+        return prune_entries(self.pages, self.seen_pages)
+
+    def prune_static(self):
+        return prune_entries(self.static, self.seen_static)
+
+    def prune_outputs(self, kinds=None):
+        # removes the outputs of the given kinds, or of every kind, that were
+        # not recorded since they were last pruned; a rebuild that only
+        # regenerates some kinds of outputs leaves the others alone
+        removed = []
+        for dest_path, kind in list(self.outputs.items()):
+            if kinds is not None and kind not in kinds:
+                continue
+            if dest_path not in self.seen_outputs:
+                del self.outputs[dest_path]
+                if remove_output(dest_path):
+                    removed.append(dest_path)
+        self.seen_outputs = {
+            dest_path
+            for dest_path in self.seen_outputs
+            if kinds is not None and self.outputs.get(dest_path) not in kinds
+        }
+        return removed
+
+
+def invalidated(entry):
+    return {"hash": None, "dest": entry["dest"]}
+
+
+def prune_entries(entries, seen):
+    removed = []
+    for source_path in list(entries):
+        if source_path in seen:
+            continue
+        dest_path = entries.pop(source_path)["dest"]
+        if remove_output(dest_path):
+            removed.append(dest_path)
+    return removed
+
+
+def remove_output(path):
+    if not os.path.isfile(path):
+        return False
+    os.remove(path)
+    try:
+        os.removedirs(os.path.dirname(path))
+    except OSError:
+        pass
+    return True
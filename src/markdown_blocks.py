@@ -1,6 +1,6 @@
 from enum import Enum
 
-from htmlnode import ParentNode
+from htmlnode import LeafNode, ParentNode
 from inline_markdown import text_to_textnodes
 from textnode import text_node_to_html_node, TextNode, TextType
 
@@ -25,56 +25,157 @@ def markdown_to_blocks(markdown):
     return filtered_blocks
 
 
+HEADING_PREFIXES = ("# ", "## ", "### ", "#### ", "##### ", "###### ")
+LIST_BLOCK_TYPES = (BlockType.QUOTE, BlockType.ULIST, BlockType.OLIST)
+# first characters of every block marker; most lines are prose and are ruled
+# out by one set lookup instead of a startswith per block type
+MARKER_CHARS = frozenset("#`>-1")
+
+
 def block_to_block_type(block):
-    lines = block.split("\n")
+    return lines_to_block_type(block.split("\n"))
+
+
+def lines_to_block_type(lines):
+    block_type = line_block_type(lines[0])
+    if block_type == BlockType.CODE:
+        return close_block_type(block_type, lines)
+    if block_type in LIST_BLOCK_TYPES:
+        for index, line in enumerate(lines):
+            if not line_continues(block_type, line, index):
+                return BlockType.PARAGRAPH
+    return block_type
+
 
-    if block.startswith(("# ", "## ", "### ", "#### ", "##### ", "###### ")):
+def line_block_type(line):
+    # the type a block gets from its first line, before later lines have had
+    # a chance to demote a quote or list block to a paragraph
+    if line[:1] not in MARKER_CHARS:
+        return BlockType.PARAGRAPH
+    if line.startswith(HEADING_PREFIXES):
         return BlockType.HEADING
-    if len(lines) > 1 and lines[0].startswith("```") and lines[-1].startswith("```"):
+    if line.startswith("```"):
         return BlockType.CODE
-    if block.startswith(">"):
-        for line in lines:
-            if not line.startswith(">"):
-                return BlockType.PARAGRAPH
+    if line.startswith(">"):
         return BlockType.QUOTE
-    if block.startswith("- "):
-        for line in lines:
-            if not line.startswith("- "):
-                return BlockType.PARAGRAPH
+    if line.startswith("- "):
         return BlockType.ULIST
-    if block.startswith("1. "):
-        i = 1
-        for line in lines:
-            if not line.startswith(f"{i}. "):
-                return BlockType.PARAGRAPH
-            i += 1
+    if line.startswith("1. "):
         return BlockType.OLIST
     return BlockType.PARAGRAPH
 
 
-def markdown_to_html_node(markdown):
-    blocks = markdown_to_blocks(markdown)
-    children = []
-    for block in blocks:
-        html_node = block_to_html_node(block)
-        children.append(html_node)
-    return ParentNode("div", children, None)
+def line_continues(block_type, line, index):
+    if block_type == BlockType.QUOTE:
+        return line.startswith(">")
+    if block_type == BlockType.ULIST:
+        return line.startswith("- ")
+    if block_type == BlockType.OLIST:
+        return line.startswith(f"{index + 1}. ")
+    return True
+
+
+def close_block_type(block_type, lines):
+    if block_type == BlockType.CODE:
+        if len(lines) > 1 and lines[-1].startswith("```"):
+            return BlockType.CODE
+        return BlockType.PARAGRAPH
+    return block_type
+
+
+def iter_blocks(lines):
+    for _, block_type, block in iter_numbered_blocks(lines):
+        yield block_type, block
+
+
+def iter_numbered_blocks(lines, first_line=1):
+    # lines is any iterable of lines (an open file, a list, ...); blocks are
+    # yielded as soon as the blank line after them is read, so memory use is
+    # bounded by the largest block rather than the whole document; each comes
+    # with the number of the line it starts on
+    block = []
+    block_type = None
+    fenced = False
+    start = first_line
+    for number, line in enumerate(lines, first_line):
+        line = line.rstrip("\r\n")
+        if fenced:
+            block.append(line)
+            if line.startswith("```"):
+                block[-1] = line.rstrip()
+                yield start, BlockType.CODE, block
+                block = []
+                fenced = False
+            continue
+        if line.strip() == "":
+            if block:
+                block[-1] = block[-1].rstrip()
+                yield start, close_block_type(block_type, block), block
+                block = []
+            continue
+        if not block:
+            line = line.lstrip()
+            start = number
+            block_type = line_block_type(line)
+            # a fence opener keeps blank lines inside the code block; a line
+            # like "```x```" is inline code and is not a fence
+            fenced = block_type == BlockType.CODE and "```" not in line[3:]
+        elif block_type in LIST_BLOCK_TYPES:
+            if not line_continues(block_type, line, len(block)):
+                block_type = BlockType.PARAGRAPH
+        block.append(line)
+    if block:
+        block[-1] = block[-1].rstrip()
+        yield start, close_block_type(block_type, block), block
+
+
+def markdown_to_html_node(markdown, cache=None):
+    return blocks_to_html_node(iter_blocks(markdown.split("\n")), cache)
+
+
+def blocks_to_html_node(blocks, cache=None):
+    return ParentNode("div", list(iter_block_nodes(blocks, cache)), None)
+
+
+def iter_block_nodes(blocks, cache=None):
+    for block_type, lines in blocks:
+        yield lines_to_html_node(block_type, lines, cache)
+
+
+def lines_to_html_node(block_type, lines, cache=None):
+    if cache is None:
+        return block_lines_to_html_node(block_type, lines)
+    return cached_block_to_html_node(block_type, lines, cache)
+
+
+def cached_block_to_html_node(block_type, lines, cache):
+    block = "\n".join(lines)
+    html = cache.get(block)
+    if html is not None:
+        return LeafNode(None, html)
+    html_node = block_lines_to_html_node(block_type, lines)
+    cache.put(block, html_node.to_html())
+    return html_node
 
 
 def block_to_html_node(block):
-    block_type = block_to_block_type(block)
+    lines = block.split("\n")
+    return block_lines_to_html_node(lines_to_block_type(lines), lines)
+
+
+def block_lines_to_html_node(block_type, lines):
     if block_type == BlockType.PARAGRAPH:
-        return paragraph_to_html_node(block)
+        return paragraph_to_html_node(lines)
     if block_type == BlockType.HEADING:
-        return heading_to_html_node(block)
+        return heading_to_html_node(lines)
     if block_type == BlockType.CODE:
-        return code_to_html_node(block)
+        return code_to_html_node(lines)
     if block_type == BlockType.OLIST:
-        return olist_to_html_node(block)
+        return olist_to_html_node(lines)
     if block_type == BlockType.ULIST:
-        return ulist_to_html_node(block)
+        return ulist_to_html_node(lines)
     if block_type == BlockType.QUOTE:
-        return quote_to_html_node(block)
+        return quote_to_html_node(lines)
     raise ValueError("invalid block type")
 
 
@@ -87,14 +188,14 @@ def text_to_children(text):
     return children
 
 
-def paragraph_to_html_node(block):
-    lines = block.split("\n")
+def paragraph_to_html_node(lines):
     paragraph = " ".join(lines)
     children = text_to_children(paragraph)
     return ParentNode("p", children)
 
 
-def heading_to_html_node(block):
+def heading_to_html_node(lines):
+    block = "\n".join(lines)
     level = 0
     for char in block:
         if char == "#":
@@ -108,38 +209,36 @@ def heading_to_html_node(block):
     return ParentNode(f"h{level}", children)
 
 
-def code_to_html_node(block):
-    if not block.startswith("```") or not block.endswith("```"):
+def code_to_html_node(lines):
+    if not lines[0].startswith("```") or not lines[-1].endswith("```"):
         raise ValueError("invalid code block")
-    text = block[4:-3]
+    # the opening fence line may carry a language tag, which is dropped
+    text = "".join(line + "\n" for line in lines[1:-1])
     raw_text_node = TextNode(text, TextType.TEXT)
     child = text_node_to_html_node(raw_text_node)
     code = ParentNode("code", [child])
     return ParentNode("pre", [code])
 
 
-def olist_to_html_node(block):
-    items = block.split("\n")
+def olist_to_html_node(lines):
     html_items = []
-    for item in items:
-        text = item[3:]
+    for item in lines:
+        text = item.split(". ", 1)[1]
         children = text_to_children(text)
         html_items.append(ParentNode("li", children))
     return ParentNode("ol", html_items)
 
 
-def ulist_to_html_node(block):
-    items = block.split("\n")
+def ulist_to_html_node(lines):
     html_items = []
-    for item in items:
+    for item in lines:
         text = item[2:]
         children = text_to_children(text)
         html_items.append(ParentNode("li", children))
     return ParentNode("ul", html_items)
 
 
-def quote_to_html_node(block):
-    lines = block.split("\n")
+def quote_to_html_node(lines):
     new_lines = []
     for line in lines:
         if not line.startswith(">"):
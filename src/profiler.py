@@ -0,0 +1,173 @@
+import contextlib
+import json
+import time
+import tracemalloc
+
+
+class BuildProfiler:
+    # records are (phase, page, seconds, peak bytes), where peak bytes is the
+    # most memory tracemalloc saw allocated on top of what was in use when
+    # the phase started
+    enabled = True
+
+    def __init__(self):
+        self.records = []
+        # [memory in use at the start, peak above it] of each open phase
+        self.open_phases = []
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def sample(self):
+        # the peak since the last sample counts for every open phase
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        for phase in self.open_phases:
+            phase[1] = max(phase[1], peak - phase[0])
+        return current, peak
+
+    @contextlib.contextmanager
+    def phase(self, name, page=None):
+        current, _ = self.sample()
+        memory = [current, 0]
+        self.open_phases.append(memory)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.sample()
+            self.open_phases.remove(memory)
+            self.records.append((name, page, elapsed, memory[1]))
+
+    def page_clock(self, page):
+        return StageClock(self, page)
+
+    def merge(self, records):
+        self.records.extend(records)
+
+    def phase_totals(self):
+        totals = {}
+        for name, _, elapsed, peak_bytes in self.records:
+            total = totals.setdefault(
+                name, {"calls": 0, "seconds": 0.0, "peak_bytes": 0}
+            )
+            total["calls"] += 1
+            total["seconds"] += elapsed
+            total["peak_bytes"] = max(total["peak_bytes"], peak_bytes)
+        return totals
+
+    def page_totals(self):
+        pages = {}
+        for name, page, elapsed, _ in self.records:
+            if page is None:
+                continue
+            phases = pages.setdefault(page, {})
+            phases[name] = phases.get(name, 0.0) + elapsed
+        totals = [
+            {"page": page, "seconds": sum(phases.values()), "phases": phases}
+            for page, phases in pages.items()
+        ]
+        totals.sort(key=lambda total: total["seconds"], reverse=True)
+        return totals
+
+    def to_dict(self, top=10):
+        pages = self.page_totals()
+        return {
+            "seconds": sum(record[2] for record in self.records),
+            "pages": len(pages),
+            "phases": self.phase_totals(),
+            "slowest_pages": pages[:top],
+        }
+
+    def write_json(self, path, top=10):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(top), f, indent=2)
+
+    def report(self, top=10):
+        data = self.to_dict(top)
+        lines = [
+            f"Build profile: {data['seconds']:.4f}s over {data['pages']} page(s)",
+            f"  {'phase':<24} {'calls':>7} {'seconds':>10} {'peak KiB':>12}",
+        ]
+        for name, total in data["phases"].items():
+            lines.append(
+                f"  {name:<24} {total['calls']:>7} {total['seconds']:>10.4f}"
+                f" {total['peak_bytes'] / 1024:>12.1f}"
+            )
+        if data["slowest_pages"]:
+            lines.append(f"Slowest {len(data['slowest_pages'])} page(s):")
+            for page in data["slowest_pages"]:
+                lines.append(f"  {page['seconds']:>10.4f}s  {page['page']}")
+        return "\n".join(lines)
+
+
+class StageClock:
+    # times the stages of a streaming page build, which pull from each other
+    # and so interleave: whatever runs is charged to the innermost stage it
+    # runs in, and each stage is recorded once per page when the clock stops
+    def __init__(self, profiler, page):
+        self.profiler = profiler
+        self.page = page
+        self.stack = []
+        self.totals = {}
+        self.mark = None
+
+    def switch(self):
+        now = time.perf_counter()
+        current, peak = self.profiler.sample()
+        if self.stack:
+            total = self.totals.setdefault(self.stack[-1], [0.0, 0])
+            total[0] += now - self.mark[0]
+            total[1] = max(total[1], peak - self.mark[1])
+        self.mark = (now, current)
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        self.switch()
+        self.stack.append(name)
+        try:
+            yield
+        finally:
+            self.switch()
+            self.stack.pop()
+
+    def iterate(self, name, iterable):
+        # only the time spent producing each item belongs to the stage, not
+        # the time its consumer spends on the item
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name):
+                item = next(iterator, StopIteration)
+            if item is StopIteration:
+                return
+            yield item
+
+    def stop(self):
+        for name, (elapsed, peak_bytes) in self.totals.items():
+            self.profiler.records.append((name, self.page, elapsed, peak_bytes))
+        self.totals = {}
+
+
+class NullProfiler:
+    enabled = False
+
+    def phase(self, name, page=None):
+        return contextlib.nullcontext()
+
+    def page_clock(self, page):
+        return NULL_CLOCK
+
+
+class NullClock:
+    def stage(self, name):
+        return contextlib.nullcontext()
+
+    def iterate(self, name, iterable):
+        return iterable
+
+    def stop(self):
+        pass
+
+
+NULL_PROFILER = NullProfiler()
+NULL_CLOCK = NullClock()
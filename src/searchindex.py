@@ -0,0 +1,160 @@
+import base64
+import html
+import json
+import os
+import re
+
+from writer import write_if_changed
+
+
+SEARCH_DIR_NAME = "search"
+SEARCH_OUTPUT = "search"
+SEARCH_INDEX_FORMAT = 1
+# terms are sharded by their first characters; two keeps shards small on big
+# sites while a one-word query still only needs a single download
+SHARD_PREFIX_LENGTH = 2
+# search tokens: runs of two or more letters or digits
+TOKEN_RE = re.compile(r"[^\W_]{2,}")
+TAG_RE = re.compile(r"<[^>]*>")
+
+
+def tokenize(text):
+    # leaf values are emitted verbatim, so a cached block is a leaf holding
+    # rendered HTML; tags are dropped and entities decoded either way
+    text = html.unescape(TAG_RE.sub(" ", text))
+    return TOKEN_RE.findall(text.lower())
+
+
+def build_postings(docs):
+    # docs is a list of token collections; doc ids are list positions, so
+    # every posting list comes out sorted
+    postings = {}
+    for doc_id, tokens in enumerate(docs):
+        for token in set(tokens):
+            postings.setdefault(token, []).append(doc_id)
+    return postings
+
+
+def encode_postings(doc_ids):
+    # gaps between sorted ids as LEB128 varints, in URL-safe base64
+    data = bytearray()
+    previous = 0
+    for doc_id in doc_ids:
+        gap = doc_id - previous
+        previous = doc_id
+        while gap >= 0x80:
+            data.append(gap & 0x7F | 0x80)
+            gap >>= 7
+        data.append(gap)
+    return base64.urlsafe_b64encode(bytes(data)).decode("ascii").rstrip("=")
+
+
+def decode_postings(text):
+    data = base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+    doc_ids = []
+    doc_id = 0
+    gap = 0
+    shift = 0
+    for byte in data:
+        gap |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        doc_id += gap
+        doc_ids.append(doc_id)
+        gap = 0
+        shift = 0
+    return doc_ids
+
+
+def shard_name(term):
+    prefix = term[:SHARD_PREFIX_LENGTH]
+    if prefix.isascii():
+        return prefix
+    # keep file names ASCII for servers and caches that mangle anything else
+    return "x" + prefix.encode("utf-8").hex()
+
+
+def write_search_index(docs, dest_dir, manifest=None):
+    # docs is a list of (url, title, tokens); writes search/index.json with
+    # the doc table and one search/<prefix>.json shard per term prefix, and
+    # returns the paths that changed
+    search_dir = os.path.join(dest_dir, SEARCH_DIR_NAME)
+    postings = build_postings([tokens for _, _, tokens in docs])
+    shards = {}
+    for term in sorted(postings):
+        shards.setdefault(shard_name(term), {})[term] = encode_postings(
+            postings[term]
+        )
+
+    outputs = [
+        (
+            "index.json",
+            {
+                "format": SEARCH_INDEX_FORMAT,
+                "prefix": SHARD_PREFIX_LENGTH,
+                "docs": [[url, title] for url, title, _ in docs],
+                "shards": sorted(shards),
+            },
+        )
+    ]
+    for name in sorted(shards):
+        outputs.append((f"{name}.json", shards[name]))
+
+    written = []
+    for file_name, data in outputs:
+        path = os.path.join(search_dir, file_name)
+        text = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+        if manifest is not None:
+            manifest.record_output(path, SEARCH_OUTPUT)
+        if write_if_changed(path, text):
+            written.append(path)
+    return written
+
+
+class SearchIndex:
+    # reads the format written by write_search_index the way the browser
+    # does: the doc table up front, and each shard only once a query needs it
+    def __init__(self, search_dir):
+        self.search_dir = search_dir
+        with open(os.path.join(search_dir, "index.json"), "r") as f:
+            data = json.load(f)
+        if data.get("format") != SEARCH_INDEX_FORMAT:
+            raise ValueError(f"unsupported search index format: {data.get('format')}")
+        self.docs = data["docs"]
+        self.shard_names = set(data["shards"])
+        self.shards = {}
+
+    def shard(self, name):
+        shard = self.shards.get(name)
+        if shard is None:
+            shard = {}
+            if name in self.shard_names:
+                with open(os.path.join(self.search_dir, f"{name}.json"), "r") as f:
+                    shard = json.load(f)
+            self.shards[name] = shard
+        return shard
+
+    def postings(self, term):
+        encoded = self.shard(shard_name(term)).get(term)
+        if encoded is None:
+            return []
+        return decode_postings(encoded)
+
+    def search(self, query):
+        # every term of the query must appear on the page; the shortest
+        # posting list is walked first
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+        lists = sorted((self.postings(term) for term in terms), key=len)
+        matches = set(lists[0])
+        for doc_ids in lists[1:]:
+            matches.intersection_update(doc_ids)
+        return [tuple(self.docs[doc_id]) for doc_id in sorted(matches)]
+
+    def __repr__(self):
+        return (
+            f"SearchIndex({self.search_dir}, {len(self.docs)} doc(s), "
+            f"{len(self.shards)}/{len(self.shard_names)} shard(s) loaded)"
+        )
@@ -0,0 +1,163 @@
+import os
+import re
+
+from images import add_image_attributes
+from manifest import hash_file
+
+PLACEHOLDER_RE = re.compile(r"\{\{ (\w+) \}\}")
+LINK_RE = re.compile(r'(href|src)="/')
+# the same links up to their query or fragment, to look them up as assets
+ASSET_LINK_RE = re.compile(r'(href|src)="(/[^"?#]*)')
+
+# slots whose values are rendered markdown and get the same basepath rewrite
+# as the template's own links; other slots (the title) are inserted verbatim
+REWRITTEN_SLOTS = frozenset(["Content"])
+
+# template used for the index page at the root of the content directory
+LANDING_TEMPLATE = "landing"
+
+
+def rewrite_links(html, basepath, assets=None):
+    # assets maps asset URLs to their fingerprinted names, see asset_urls()
+    if assets:
+        return ASSET_LINK_RE.sub(
+            lambda match: f'{match.group(1)}="{basepath}'
+            + assets.get(match.group(2), match.group(2))[1:],
+            html,
+        )
+    if basepath == "/":
+        return html
+    return LINK_RE.sub(lambda match: f'{match.group(1)}="{basepath}', html)
+
+
+class Template:
+    def __init__(self, source, basepath="/", path=None, assets=None, images=None):
+        self.basepath = basepath
+        self.path = path
+        self.assets = assets
+        self.images = images
+        self.segments = []
+        self.slots = []
+        pos = 0
+        for match in PLACEHOLDER_RE.finditer(source):
+            self.segments.append(self.rewrite(source[pos : match.start()]))
+            self.slots.append(match.group(1))
+            pos = match.end()
+        self.segments.append(self.rewrite(source[pos:]))
+
+    @classmethod
+    def load(cls, path, basepath="/", assets=None, images=None):
+        with open(path, "r") as f:
+            return cls(f.read(), basepath, str(path), assets, images)
+
+    def rewrite(self, html):
+        if self.images:
+            html = add_image_attributes(html, self.images, self.basepath, self.assets)
+        return rewrite_links(html, self.basepath, self.assets)
+
+    def render(self, **values):
+        return "".join(self.iter_render(**values))
+
+    def write(self, fp, **values):
+        fp.writelines(self.iter_render(**values))
+
+    def iter_render(self, **values):
+        # a slot value is either a string or an iterable of HTML fragments,
+        # e.g. HTMLNode.iter_html(), which is streamed without being joined
+        yield self.segments[0]
+        for slot, segment in zip(self.slots, self.segments[1:]):
+            value = values.get(slot)
+            if value is None:
+                yield "{{ " + slot + " }}"
+            elif slot in REWRITTEN_SLOTS:
+                if isinstance(value, str):
+                    yield self.rewrite(value)
+                else:
+                    for fragment in value:
+                        yield self.rewrite(fragment)
+            elif isinstance(value, str):
+                yield value
+            else:
+                yield from value
+            yield segment
+
+    def __repr__(self):
+        return f"Template({self.path}, slots: {self.slots}, {self.basepath})"
+
+
+class TemplateRegistry:
+    def __init__(
+        self, default_path, basepath="/", templates_dir=None, content_dir=None
+    ):
+        self.default_path = str(default_path)
+        self.basepath = basepath
+        self.templates_dir = templates_dir
+        self.content_dir = content_dir
+        self.named = {}
+        self.compiled = {}
+        self.assets = {}
+        self.images = {}
+        self.reload()
+
+    def reload(self):
+        # forget compiled templates and look for added or removed ones
+        self.compiled = {}
+        self.named = {}
+        if self.templates_dir is None or not os.path.isdir(self.templates_dir):
+            return
+        for entry in os.scandir(self.templates_dir):
+            name, ext = os.path.splitext(entry.name)
+            if ext == ".html" and entry.is_file():
+                self.named[name] = entry.path
+
+    def set_assets(self, assets, images=None):
+        # templates link to assets too, so they are compiled again when an
+        # asset got a new fingerprint or an image changed
+        images = images if images is not None else {}
+        if assets != self.assets or images != self.images:
+            self.assets = dict(assets)
+            self.images = dict(images)
+            self.compiled = {}
+
+    def paths(self):
+        return [self.default_path, *sorted(self.named.values())]
+
+    def hashes(self):
+        return {path: hash_file(path) for path in self.paths()}
+
+    def get(self, path):
+        # each template is read and compiled once per build, however many
+        # pages use it
+        template = self.compiled.get(path)
+        if template is None:
+            template = Template.load(path, self.basepath, self.assets, self.images)
+            self.compiled[path] = template
+        return template
+
+    def path_for(self, source_path, name=None):
+        if name is not None:
+            if name not in self.named:
+                raise ValueError(f"unknown template: {name}")
+            return self.named[name]
+        section = self.section(source_path)
+        if section in self.named:
+            return self.named[section]
+        return self.default_path
+
+    def template_for(self, source_path, name=None):
+        return self.get(self.path_for(source_path, name))
+
+    def section(self, source_path):
+        # pages pick the template named after their top-level directory in
+        # content/, and the root index page picks the landing template
+        if self.content_dir is None:
+            return None
+        parts = os.path.relpath(source_path, self.content_dir).split(os.sep)
+        if len(parts) > 1:
+            return parts[0]
+        if os.path.splitext(parts[0])[0] == "index":
+            return LANDING_TEMPLATE
+        return None
+
+    def __repr__(self):
+        return f"TemplateRegistry({self.default_path}, {sorted(self.named)})"
@@ -0,0 +1,161 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+from xml.sax.saxutils import escape
+
+from artifacts import atom_timestamp, iter_feed, public_url, write_artifacts
+from gencontent import PageRecord
+from indexpages import Post
+from manifest import BuildManifest
+
+
+class TestArtifacts(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.content = os.path.join(self.tmp.name, "content")
+        self.dest = os.path.join(self.tmp.name, "docs")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def record(self, rel_source, rel_dest, title, date=None, tokens=""):
+        metadata = {"date": date} if date is not None else {}
+        summary = {"title": title, "summary": f"About {title}", "tokens": tokens}
+        return (
+            os.path.join(self.content, rel_source),
+            PageRecord(os.path.join(self.dest, rel_dest), metadata, summary, 0),
+        )
+
+    def read(self, *parts):
+        with open(os.path.join(self.dest, *parts)) as f:
+            return f.read()
+
+    def write(
+        self, records, manifest=None, site_url="https://example.com", author="Me"
+    ):
+        self.log = io.StringIO()
+        with contextlib.redirect_stdout(self.log):
+            return write_artifacts(
+                dict(records),
+                self.content,
+                self.dest,
+                "/site/",
+                site_url,
+                manifest,
+                author,
+            )
+
+    def test_public_url(self):
+        self.assertEqual(public_url("/blog/a", "/site/"), "/site/blog/a")
+        self.assertEqual(
+            public_url("/", "/", "https://example.com/"), "https://example.com/"
+        )
+
+    def test_write_artifacts(self):
+        records = [
+            self.record("index.md", "index.html", "Home", tokens="home page"),
+            self.record("blog/a/index.md", "blog/a/index.html", "A & B", "2025-01-02"),
+        ]
+        manifest = BuildManifest()
+        written = self.write(records, manifest)
+        # sitemap, search index, feed, and the search doc table with two shards
+        self.assertEqual(len(written), 6)
+        self.assertEqual(len(manifest.outputs), 6)
+        # one line each for the sitemap, search-index.json, the feed and the
+        # three files of the sharded index
+        search_dir = os.path.join(self.dest, "search")
+        log = self.log.getvalue().splitlines()
+        self.assertEqual(len(log), 4)
+        self.assertIn(f" * search index -> 3 file(s) in {search_dir}", log)
+        self.assertEqual(
+            manifest.outputs[os.path.join(self.dest, "search", "ho.json")], "search"
+        )
+
+        sitemap = self.read("sitemap.xml")
+        self.assertIn("<loc>https://example.com/site/</loc>", sitemap)
+        self.assertIn(
+            "<loc>https://example.com/site/blog/a</loc><lastmod>2025-01-02</lastmod>",
+            sitemap,
+        )
+        index = json.loads(self.read("search-index.json"))
+        self.assertEqual(
+            index["pages"][0],
+            {"url": "/site/", "title": "Home", "summary": "About Home"},
+        )
+        # the words are only in the sharded index
+        with open(os.path.join(self.dest, "search", "ho.json")) as f:
+            self.assertIn("home", json.load(f))
+        feed = self.read("blog", "atom.xml")
+        self.assertIn("<title>A &amp; B</title>", feed)
+        self.assertIn("<updated>2025-01-02T00:00:00Z</updated>", feed)
+        self.assertIn("&lt;p&gt;About A &amp; B&lt;/p&gt;", feed)
+
+        self.assertEqual(self.write(records), [])
+
+    def test_no_site_url_skips_sitemap_and_feeds(self):
+        records = [
+            self.record("index.md", "index.html", "Home"),
+            self.record("blog/a/index.md", "blog/a/index.html", "A", "2025-01-02"),
+        ]
+        manifest = BuildManifest()
+        self.write(records, manifest, "")
+        self.assertFalse(os.path.exists(os.path.join(self.dest, "sitemap.xml")))
+        self.assertFalse(os.path.exists(os.path.join(self.dest, "blog", "atom.xml")))
+        self.assertIn(os.path.join(self.dest, "search-index.json"), manifest.outputs)
+        self.assertNotIn(os.path.join(self.dest, "sitemap.xml"), manifest.outputs)
+
+    def test_feed_author(self):
+        feed = self.read_feed([self.record("blog/a.md", "blog/a.html", "A")])
+        self.assertIn("<updated>", feed)
+        self.assertIn("  <author><name>Me</name></author>\n", feed)
+
+        # without a site author, every post needs its own
+        records = [
+            self.record("blog/a.md", "blog/a.html", "A"),
+            self.record("blog/b.md", "blog/b.html", "B"),
+        ]
+        records[0][1].metadata["author"] = "Ann"
+        self.assertIsNone(self.read_feed(records, author=""))
+        records[1][1].metadata["author"] = "Bo & Co"
+        feed = self.read_feed(records, author="")
+        self.assertNotIn("\n  <author>", feed)
+        self.assertIn("    <author><name>Bo &amp; Co</name></author>\n", feed)
+
+    def read_feed(self, records, author="Me"):
+        self.write(records, site_url="https://example.com", author=author)
+        path = os.path.join(self.dest, "blog", "atom.xml")
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            feed = f.read()
+        os.remove(path)
+        return feed
+
+    def test_feed_summary_links_are_absolute(self):
+        post = Post("/blog/a", "A", summary="See [Tom](/blog/tom) and ![x](/a.png)")
+        feed = "".join(
+            iter_feed(
+                "blog",
+                [post],
+                "/site/",
+                "https://example.com/",
+                "Me",
+                {"/a.png": "/a.1234.png"},
+            )
+        )
+        self.assertIn(escape('href="https://example.com/site/blog/tom"'), feed)
+        self.assertIn(escape('src="https://example.com/site/a.1234.png"'), feed)
+        self.assertNotIn(escape('"/blog/tom"'), feed)
+
+    def test_feed_uses_mtime_without_date(self):
+        post = Post("/blog/a", "A", mtime=86400 * 10**9)
+        feed = "".join(iter_feed("blog", [post]))
+        self.assertIn("<updated>1970-01-02T00:00:00Z</updated>", feed)
+        self.assertEqual(atom_timestamp(0), "1970-01-01T00:00:00Z")
+
+
+if __name__ == "__main__":
+    unittest.main()
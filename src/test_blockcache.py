@@ -0,0 +1,73 @@
+import os
+import tempfile
+import unittest
+
+from blockcache import BlockCache
+from markdown_blocks import markdown_to_html_node
+
+
+class TestBlockCache(unittest.TestCase):
+    def test_hit_and_miss_counters(self):
+        cache = BlockCache()
+        self.assertIsNone(cache.get("block"))
+        cache.put("block", "<p>block</p>")
+        self.assertEqual(cache.get("block"), "<p>block</p>")
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_lru_eviction(self):
+        cache = BlockCache(maxsize=2)
+        cache.put("a", "A")
+        cache.put("b", "B")
+        cache.get("a")
+        cache.put("c", "C")
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.get("a"), "A")
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), "C")
+
+    def test_merge_worker_changes(self):
+        parent = BlockCache()
+        parent.put("a", "A")
+        parent.get("a")
+        worker = BlockCache()
+        worker.put("a", "A")
+        worker.track_changes()
+        worker.get("a")
+        worker.get("b")
+        worker.put("b", "B")
+        parent.merge(worker.take_changes())
+        self.assertEqual((parent.hits, parent.misses), (2, 1))
+        self.assertEqual(parent.get("b"), "B")
+        self.assertEqual(worker.take_changes(), ([], 0, 0))
+
+    def test_save_load(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "cache.json")
+            cache = BlockCache()
+            cache.put("a", "A")
+            cache.put("b", "B")
+            cache.save(path)
+
+            loaded = BlockCache(maxsize=1)
+            loaded.load(path)
+            self.assertEqual(len(loaded), 1)
+            self.assertEqual(loaded.get("b"), "B")
+
+    def test_markdown_to_html_node_with_cache(self):
+        md = """
+# Post
+
+Shared **footer** text
+
+Shared **footer** text
+"""
+        cache = BlockCache()
+        expected = markdown_to_html_node(md).to_html()
+        self.assertEqual(markdown_to_html_node(md, cache).to_html(), expected)
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+        self.assertEqual(markdown_to_html_node(md, cache).to_html(), expected)
+        self.assertEqual((cache.hits, cache.misses), (4, 2))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import os
+import tempfile
+import unittest
+
+from buildplan import is_markdown, make_build_plan, plan_pages
+
+
+class TestBuildPlan(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.content = os.path.join(self.tmp.name, "content")
+        self.static = os.path.join(self.tmp.name, "static")
+        self.dest = os.path.join(self.tmp.name, "docs")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, path, text=""):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(text)
+
+    def test_plan_pages(self):
+        self.write(os.path.join(self.content, "index.md"), "# Home")
+        self.write(os.path.join(self.content, "blog", "b", "index.md"), "# B")
+        self.write(os.path.join(self.content, "blog", "a", "index.md"), "# A")
+        self.write(os.path.join(self.content, "blog", "a", ".DS_Store"))
+        self.write(os.path.join(self.content, "blog", "a", "cover.png"))
+        pages = plan_pages(self.content, self.dest)
+        self.assertEqual(
+            [
+                (
+                    os.path.relpath(source, self.content),
+                    os.path.relpath(dest, self.dest),
+                )
+                for source, dest, _ in pages
+            ],
+            [
+                ("blog/a/index.md", "blog/a/index.html"),
+                ("blog/b/index.md", "blog/b/index.html"),
+                ("index.md", "index.html"),
+            ],
+        )
+        self.assertEqual(pages[2][2].st_size, len("# Home"))
+
+    def test_make_build_plan(self):
+        self.write(os.path.join(self.content, "index.md"), "# Home")
+        self.write(os.path.join(self.static, "images", "a.png"), "png")
+        plan = make_build_plan(self.content, self.static, self.dest)
+        self.assertEqual(len(plan.pages), 1)
+        self.assertEqual(
+            plan.static_dirs, [self.dest, os.path.join(self.dest, "images")]
+        )
+        self.assertEqual(
+            [dest for _, dest, _ in plan.static_files],
+            [os.path.join(self.dest, "images", "a.png")],
+        )
+
+    def test_is_markdown(self):
+        self.assertTrue(is_markdown("content/index.md"))
+        self.assertTrue(is_markdown("notes.markdown"))
+        self.assertFalse(is_markdown("content/.DS_Store"))
+        self.assertFalse(is_markdown("content/cover.png"))
+
+
+if __name__ == "__main__":
+    unittest.main()
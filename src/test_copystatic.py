@@ -0,0 +1,200 @@
+import contextlib
+import hashlib
+import io
+import os
+import tempfile
+import unittest
+
+from buildplan import plan_static
+from copystatic import asset_urls, copy_static_tree, format_bytes
+from manifest import BuildManifest
+
+
+class TestCopyStatic(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.source = os.path.join(self.tmp.name, "static")
+        self.dest = os.path.join(self.tmp.name, "docs")
+        self.write(os.path.join(self.source, "index.css"), "body {}")
+        self.write(os.path.join(self.source, "images", "a.png"), "png-bytes")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, path, text):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(text)
+
+    def read(self, rel_path):
+        with open(os.path.join(self.dest, rel_path)) as f:
+            return f.read()
+
+    def sync(self, manifest=None, mode="copy", fingerprint=False):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return copy_static_tree(
+                self.source, self.dest, manifest, mode, 4, fingerprint=fingerprint
+            )
+
+    def test_skips_unchanged_files(self):
+        stats = self.sync()
+        self.assertEqual((stats.copied_files, stats.copied_bytes), (2, 16))
+        stats = self.sync()
+        self.assertEqual((stats.copied_files, stats.skipped_files), (0, 2))
+        self.assertEqual(stats.skipped_bytes, 16)
+
+    def test_recopies_changed_files(self):
+        self.sync()
+        self.write(os.path.join(self.source, "index.css"), "body { margin: 0 }")
+        stats = self.sync()
+        self.assertEqual((stats.copied_files, stats.skipped_files), (1, 1))
+        self.assertEqual(self.read("index.css"), "body { margin: 0 }")
+
+    def test_hardlink(self):
+        self.sync(mode="hardlink")
+        source_stat = os.stat(os.path.join(self.source, "index.css"))
+        dest_stat = os.stat(os.path.join(self.dest, "index.css"))
+        self.assertEqual(source_stat.st_ino, dest_stat.st_ino)
+
+    def test_reflink(self):
+        stats = self.sync(mode="reflink")
+        self.assertEqual(stats.copied_files, 2)
+        self.assertEqual(self.read("images/a.png"), "png-bytes")
+        self.assertEqual(self.sync(mode="reflink").skipped_files, 2)
+
+    def test_removes_orphans_but_not_pages(self):
+        manifest = BuildManifest()
+        self.sync(manifest)
+        self.write(os.path.join(self.dest, "index.html"), "<p>page</p>")
+        os.remove(os.path.join(self.source, "images", "a.png"))
+
+        manifest = BuildManifest(static=manifest.static)
+        stats = self.sync(manifest)
+        self.assertEqual(stats.removed_files, 1)
+        self.assertFalse(os.path.exists(os.path.join(self.dest, "images", "a.png")))
+        self.assertEqual(self.read("index.html"), "<p>page</p>")
+
+    def test_fingerprint(self):
+        self.write(os.path.join(self.source, "robots.txt"), "User-agent: *")
+        css = f"index.{hashlib.sha256(b'body {}').hexdigest()[:12]}.css"
+        png = f"a.{hashlib.sha256(b'png-bytes').hexdigest()[:12]}.png"
+        manifest = BuildManifest()
+        stats = self.sync(manifest, fingerprint=True)
+        self.assertEqual(stats.copied_files, 3)
+        self.assertEqual(
+            asset_urls(manifest, self.dest),
+            {"/index.css": f"/{css}", "/images/a.png": f"/images/{png}"},
+        )
+        self.assertEqual(self.read(css), "body {}")
+        self.assertEqual(self.read("robots.txt"), "User-agent: *")
+        self.assertEqual(sorted(os.listdir(self.dest)), ["images", css, "robots.txt"])
+
+        manifest = BuildManifest(static=manifest.static)
+        self.assertEqual(self.sync(manifest, fingerprint=True).skipped_files, 3)
+
+        # a changed asset gets a new name and the old one is removed
+        self.write(os.path.join(self.source, "index.css"), "body { margin: 0 }")
+        manifest = BuildManifest(static=manifest.static)
+        stats = self.sync(manifest, fingerprint=True)
+        self.assertEqual((stats.copied_files, stats.skipped_files), (1, 2))
+        new_url = asset_urls(manifest, self.dest)["/index.css"]
+        self.assertNotEqual(new_url, f"/{css}")
+        self.assertEqual(self.read(new_url[1:]), "body { margin: 0 }")
+        self.assertFalse(os.path.exists(os.path.join(self.dest, css)))
+
+    def test_fingerprint_rewrites_stylesheet_urls(self):
+        font = os.path.join(self.source, "fonts", "a.woff2")
+        self.write(font, "woff")
+        self.write(
+            os.path.join(self.source, "css", "site.css"),
+            '@import url("base.css");\n'
+            "@font-face { src: url(../fonts/a.woff2?v=1#iefix) }\n"
+            "body { background: url('/images/a.png'), url(data:image/png;base64,) }",
+        )
+        base = "h1 { background: url(x.gif) }"
+        self.write(os.path.join(self.source, "css", "base.css"), base)
+        manifest = BuildManifest()
+        self.sync(manifest, fingerprint=True)
+        urls = asset_urls(manifest, self.dest)
+        site = self.read(urls["/css/site.css"][1:])
+        font_name = os.path.basename(urls["/fonts/a.woff2"])
+        self.assertIn(f'@import url("{os.path.basename(urls["/css/base.css"])}")', site)
+        self.assertIn(f"url(../fonts/{font_name}?v=1#iefix)", site)
+        self.assertIn(f"url('{urls['/images/a.png']}')", site)
+        self.assertIn("url(data:image/png;base64,)", site)
+        # the stylesheet is named after its rewritten text
+        digest = hashlib.sha256(site.encode()).hexdigest()[:12]
+        self.assertEqual(urls["/css/site.css"], f"/css/site.{digest}.css")
+        # a reference to a file the build does not have is left as it is
+        self.assertIn("url(x.gif)", self.read(urls["/css/base.css"][1:]))
+
+        manifest = BuildManifest(static=manifest.static)
+        stats = self.sync(manifest, fingerprint=True)
+        self.assertEqual(stats.copied_files, 0)
+
+        # a new font gives the stylesheet naming it a new name too
+        self.write(font, "woff, again")
+        manifest = BuildManifest(static=manifest.static)
+        stats = self.sync(manifest, fingerprint=True)
+        self.assertEqual(stats.copied_files, 2)
+        new_urls = asset_urls(manifest, self.dest)
+        self.assertNotEqual(new_urls["/css/site.css"], urls["/css/site.css"])
+        self.assertEqual(new_urls["/css/base.css"], urls["/css/base.css"])
+        old_site = os.path.join(self.dest, urls["/css/site.css"][1:])
+        self.assertFalse(os.path.exists(old_site))
+
+    def test_fingerprint_hardlink(self):
+        manifest = BuildManifest()
+        self.sync(manifest, "hardlink", fingerprint=True)
+        url = asset_urls(manifest, self.dest)["/index.css"]
+        dest = os.path.join(self.dest, url[1:])
+        source_stat = os.stat(os.path.join(self.source, "index.css"))
+        self.assertEqual(os.stat(dest).st_ino, source_stat.st_ino)
+
+    def test_plan_static(self):
+        dest_dirs, files = plan_static(self.source, self.dest)
+        self.assertEqual(dest_dirs, [self.dest, os.path.join(self.dest, "images")])
+        self.assertEqual(
+            sorted(dest for _, dest, _ in files),
+            [
+                os.path.join(self.dest, "images", "a.png"),
+                os.path.join(self.dest, "index.css"),
+            ],
+        )
+
+    def test_deep_tree(self):
+        path = self.source
+        for _ in range(1200):
+            path = os.path.join(path, "d")
+            os.mkdir(path)
+        self.write(os.path.join(path, "deep.txt"), "deep")
+        stats = self.sync()
+        self.assertEqual(stats.copied_files, 3)
+
+        # shutil.rmtree recurses per level, so unwind the tree by hand
+        for root in (self.source, self.dest):
+            path = os.path.join(root, *["d"] * 1200)
+            os.remove(os.path.join(path, "deep.txt"))
+            while path != root:
+                os.rmdir(path)
+                path = os.path.dirname(path)
+
+    def test_quiet_and_verbose(self):
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            copy_static_tree(self.source, self.dest, verbosity=0)
+        self.assertEqual(out.getvalue(), "")
+        os.remove(os.path.join(self.dest, "index.css"))
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            copy_static_tree(self.source, self.dest, verbosity=2)
+        self.assertIn("index.css", out.getvalue())
+
+    def test_format_bytes(self):
+        self.assertEqual(format_bytes(512), "512 B")
+        self.assertEqual(format_bytes(1536), "1.5 KB")
+        self.assertEqual(format_bytes(3 * 1024 * 1024), "3.0 MB")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+import unittest
+
+from blockcache import BlockCache
+from document import Document, markdown_to_document
+from markdown_blocks import BlockType, iter_numbered_blocks
+
+
+class TestDocument(unittest.TestCase):
+    def test_metadata(self):
+        md = """
+# The Title
+
+Some **bold** words here
+
+## Section one
+
+- first item
+- second
+
+```
+# not a heading
+code words
+```
+
+> quoted text
+
+### Deeper
+"""
+        document = markdown_to_document(md)
+        self.assertEqual(document.title, "The Title")
+        self.assertEqual(
+            document.outline,
+            [(1, "The Title"), (2, "Section one"), (3, "Deeper")],
+        )
+        self.assertEqual(document.word_count, 14)
+        self.assertNotIn("code", document.tokens)
+        self.assertIn("bold", document.tokens)
+        html = document.node.to_html()
+        self.assertTrue(html.startswith("<div><h1>The Title</h1>"))
+
+    def test_tokens_come_from_rendered_text(self):
+        md = "# Title\n\nSee [the docs](https://example.com/guide) ![logo](img/logo.png)"
+        document = markdown_to_document(md)
+        # link targets and image attributes are markup, not text
+        self.assertEqual(document.tokens, {"title", "see", "the", "docs"})
+
+        # a cached block is a single leaf of HTML and gives the same tokens
+        cache = BlockCache()
+        markdown_to_document(md, cache)
+        self.assertEqual(markdown_to_document(md, cache).tokens, document.tokens)
+
+    def test_links(self):
+        md = """# Title
+
+See [here](/blog/a) and [out](https://example.com)
+then ![pic](/images/a.png) but `[not](/code)`
+
+```
+[nor](/fenced)
+```
+
+- [item](../b#top)
+"""
+        document = markdown_to_document(md)
+        self.assertEqual(
+            document.links, [(3, "/blog/a"), (4, "/images/a.png"), (10, "../b#top")]
+        )
+        self.assertEqual(
+            document.summary_record()["links"],
+            [[3, "/blog/a"], [4, "/images/a.png"], [10, "../b#top"]],
+        )
+
+    def test_links_are_the_rendered_ones(self):
+        md = """# Title
+
+**[c](/nope3)** and [wrapped
+link](/missing) then
+[again](/missing)
+
+> [quoted](/q)
+"""
+        document = markdown_to_document(md)
+        # bold text is rendered as is, a wrapped link is still a link, and a
+        # target is kept once, at its first line
+        self.assertEqual(document.links, [(3, "/missing"), (7, "/q")])
+        self.assertEqual(
+            document.summary_record()["links"], [[3, "/missing"], [7, "/q"]]
+        )
+
+    def test_first_h1_is_title(self):
+        document = markdown_to_document("## Intro\n\n# Real\n\n# Second")
+        self.assertEqual(document.title, "Real")
+
+    def test_no_title(self):
+        document = markdown_to_document("just text")
+        self.assertIsNone(document.title)
+        self.assertEqual(document.word_count, 2)
+
+    def test_read_until_title_replays_blocks(self):
+        document = Document()
+        lines = ["intro", "", "# Title", "", "after"]
+        blocks = document.read_until_title(iter_numbered_blocks(lines))
+        self.assertEqual(document.title, "Title")
+        self.assertEqual(document.word_count, 2)
+        self.assertEqual(
+            [block_lines for _, block_lines in blocks],
+            [["intro"], ["# Title"], ["after"]],
+        )
+        self.assertEqual(document.word_count, 3)
+
+    def test_front_matter_title(self):
+        document = Document({"title": "From header"})
+        blocks = document.read_until_title(iter_numbered_blocks(["# Heading"]))
+        self.assertEqual(list(blocks), [(BlockType.HEADING, ["# Heading"])])
+        self.assertEqual(document.title, "From header")
+        self.assertEqual(document.outline, [(1, "Heading")])
+
+    def test_read_until_title_missing(self):
+        document = Document()
+        with self.assertRaises(ValueError):
+            document.read_until_title(iter_numbered_blocks(["no", "", "title"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
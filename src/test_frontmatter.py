@@ -0,0 +1,82 @@
+import io
+import os
+import tempfile
+import unittest
+
+from frontmatter import (
+    is_draft,
+    parse_front_matter,
+    read_front_matter,
+    split_front_matter,
+    split_front_matter_numbered,
+)
+
+
+class TestFrontMatter(unittest.TestCase):
+    def test_parse(self):
+        metadata = parse_front_matter(
+            [
+                "# a comment",
+                "date: 2025-03-01",
+                'title: "Tom: a mistake"',
+                "draft: true",
+                "tags: [tolkien, books]",
+                "authors:",
+                "- Lane",
+                "- 'Sam'",
+                "",
+            ]
+        )
+        self.assertEqual(
+            metadata,
+            {
+                "date": "2025-03-01",
+                "title": "Tom: a mistake",
+                "draft": True,
+                "tags": ["tolkien", "books"],
+                "authors": ["Lane", "Sam"],
+            },
+        )
+        self.assertTrue(is_draft(metadata))
+
+    def test_invalid_line(self):
+        with self.assertRaises(ValueError) as cm:
+            parse_front_matter(["date: today", "not a key"])
+        self.assertIn("line 3", str(cm.exception))
+
+    def test_split_leaves_body(self):
+        source = io.StringIO("---\ntemplate: blog\n---\n# Title\n\nbody\n")
+        metadata, lines = split_front_matter(source)
+        self.assertEqual(metadata, {"template": "blog"})
+        self.assertEqual(list(lines), ["# Title\n", "\n", "body\n"])
+
+    def test_split_without_front_matter(self):
+        metadata, lines = split_front_matter(["# Title", "", "---"])
+        self.assertEqual(metadata, {})
+        self.assertEqual(list(lines), ["# Title", "", "---"])
+        metadata, lines = split_front_matter([])
+        self.assertEqual((metadata, list(lines)), ({}, []))
+
+    def test_split_numbered(self):
+        source = ["---", "title: A", "", "---", "# A"]
+        metadata, lines, first_line = split_front_matter_numbered(source)
+        self.assertEqual(metadata, {"title": "A"})
+        self.assertEqual(list(lines), ["# A"])
+        self.assertEqual(first_line, 5)
+        _, _, first_line = split_front_matter_numbered(["# A"])
+        self.assertEqual(first_line, 1)
+
+    def test_unclosed(self):
+        with self.assertRaises(ValueError):
+            split_front_matter(["---", "draft: true", "# Title"])
+
+    def test_read_stops_after_header(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "index.md")
+            with open(path, "w") as f:
+                f.write("---\ndraft: false\n---\n# Title\n")
+            self.assertEqual(read_front_matter(path), {"draft": False})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,20 @@
+import contextlib
+import io
+import os
+import tempfile
+import tracemalloc
 import unittest
 
-from gencontent import extract_title
+from blockcache import BlockCache
+from buildplan import plan_pages
+from gencontent import (
+    PageBuildError,
+    extract_title,
+    generate_pages,
+    generate_pages_recursive,
+)
+from profiler import BuildProfiler
+from template import TemplateRegistry
 
 
 class TestExtractTitle(unittest.TestCase):
@@ -46,5 +60,160 @@ no title
             pass
 
 
+class TestGeneratePages(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.content = os.path.join(self.tmp.name, "content")
+        self.dest = os.path.join(self.tmp.name, "docs")
+        self.template = os.path.join(self.tmp.name, "template.html")
+        with open(self.template, "w") as f:
+            f.write("<title>{{ Title }}</title><main>{{ Content }}</main>")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write_page(self, rel_path, text):
+        path = os.path.join(self.content, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(text)
+
+    def read_output(self, rel_path):
+        with open(os.path.join(self.dest, rel_path)) as f:
+            return f.read()
+
+    def generate(self, workers, profiler=None, cache=None):
+        with contextlib.redirect_stdout(io.StringIO()):
+            generate_pages_recursive(
+                self.content,
+                self.template,
+                self.dest,
+                "/",
+                workers=workers,
+                cache=cache,
+                profiler=profiler,
+            )
+
+    def generate_with_templates(self, drafts=False):
+        templates = TemplateRegistry(
+            self.template,
+            "/",
+            os.path.join(self.tmp.name, "templates"),
+            self.content,
+        )
+        pages = plan_pages(self.content, self.dest)
+        with contextlib.redirect_stdout(io.StringIO()):
+            return generate_pages(pages, templates, drafts=drafts)
+
+    def test_skips_non_markdown(self):
+        self.write_page("index.md", "# Home")
+        self.write_page(".DS_Store", "junk")
+        self.write_page("blog/photo.png", "png")
+        self.generate(workers=1)
+        self.assertEqual(os.listdir(self.dest), ["index.html"])
+
+    def test_parallel_matches_sequential(self):
+        for i in range(6):
+            self.write_page(f"post{i}/index.md", f"# Post {i}\n\nBody **{i}**")
+        self.generate(workers=1)
+        sequential = [self.read_output(f"post{i}/index.html") for i in range(6)]
+        self.generate(workers=3)
+        parallel = [self.read_output(f"post{i}/index.html") for i in range(6)]
+        self.assertEqual(sequential, parallel)
+        self.assertEqual(
+            parallel[2],
+            "<title>Post 2</title><main><div><h1>Post 2</h1><p>Body <b>2</b></p></div></main>",
+        )
+
+    def test_parallel_build_fills_the_cache(self):
+        for i in range(6):
+            self.write_page(f"post{i}/index.md", f"# Post {i}\n\nShared footer")
+        sequential = BlockCache()
+        self.generate(workers=1, cache=sequential)
+        parallel = BlockCache()
+        self.generate(workers=3, cache=parallel)
+        self.assertEqual(set(parallel.entries), set(sequential.entries))
+        self.assertEqual(parallel.hits + parallel.misses, 12)
+        self.assertGreaterEqual(parallel.hits, 1)
+
+    def test_profiled_page_times_the_streaming_stages(self):
+        self.write_page("index.md", "---\ndate: 2025-01-01\n---\n# Home\n\n- *a*\n- b")
+        self.generate(workers=1)
+        expected = self.read_output("index.html")
+        if not tracemalloc.is_tracing():
+            self.addCleanup(tracemalloc.stop)
+        profiler = BuildProfiler()
+        self.generate(workers=1, profiler=profiler)
+        self.assertEqual(self.read_output("index.html"), expected)
+        self.assertEqual(
+            sorted(name for name, page, _, _ in profiler.records),
+            [
+                "block split",
+                "file read",
+                "inline parse",
+                "template substitution",
+                "to_html",
+            ],
+        )
+
+    def test_failures_reported_per_file(self):
+        self.write_page("good/index.md", "# Good")
+        self.write_page("bad/index.md", "# Bad\n\n**unclosed")
+        self.write_page("untitled/index.md", "no title")
+        with self.assertRaises(PageBuildError) as cm:
+            self.generate(workers=2)
+        failed = [
+            os.path.relpath(path, self.content) for path, _ in cm.exception.failures
+        ]
+        self.assertEqual(failed, ["bad/index.md", "untitled/index.md"])
+        self.assertEqual(
+            self.read_output("good/index.html"),
+            "<title>Good</title><main><div><h1>Good</h1></div></main>",
+        )
+
+
+    def test_front_matter(self):
+        os.makedirs(os.path.join(self.tmp.name, "templates"))
+        with open(os.path.join(self.tmp.name, "templates", "post.html"), "w") as f:
+            f.write("<post>{{ Title }}|{{ Content }}</post>")
+        self.write_page(
+            "a/index.md", "---\ntemplate: post\ntitle: Named\n---\nno heading"
+        )
+        self.write_page("draft/index.md", "---\ndraft: true\n---\n# Draft")
+        self.generate_with_templates()
+        self.assertEqual(
+            self.read_output("a/index.html"),
+            "<post>Named|<div><p>no heading</p></div></post>",
+        )
+        self.assertFalse(os.path.exists(os.path.join(self.dest, "draft")))
+        self.generate_with_templates(drafts=True)
+        self.assertTrue(os.path.exists(os.path.join(self.dest, "draft")))
+
+    def test_page_records(self):
+        self.write_page(
+            "blog/a/index.md",
+            "---\ndate: 2025-01-01\n---\n# A\n\n[< Back](/)\n\nFirst _words_\n\nMore",
+        )
+        records = self.generate_with_templates()
+        record = records[os.path.join(self.content, "blog", "a", "index.md")]
+        self.assertEqual(record.title, "A")
+        self.assertEqual(record.summary, "First _words_")
+        self.assertEqual(record.metadata, {"date": "2025-01-01"})
+        # line numbers count the front matter
+        self.assertEqual(record.links, [[6, "/"]])
+
+    def test_front_matter_errors_reported(self):
+        self.write_page("good/index.md", "# Good")
+        self.write_page("open/index.md", "---\ndraft: true\n# Open")
+        self.write_page("named/index.md", "---\ntemplate: nope\n---\n# Named")
+        with self.assertRaises(PageBuildError) as cm:
+            self.generate_with_templates()
+        failed = sorted(
+            os.path.relpath(path, self.content) for path, _ in cm.exception.failures
+        )
+        self.assertEqual(failed, ["named/index.md", "open/index.md"])
+        self.assertTrue(os.path.exists(os.path.join(self.dest, "good")))
+
+
 if __name__ == "__main__":
     unittest.main()
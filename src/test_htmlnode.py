@@ -1,3 +1,4 @@
+import io
 import unittest
 from htmlnode import LeafNode, ParentNode, HTMLNode
 
@@ -108,6 +109,55 @@ class TestHTMLNode(unittest.TestCase):
             "<h2><b>Bold text</b>Normal text<i>italic text</i>Normal text</h2>",
         )
 
+    def test_iter_html_fragments(self):
+        node = ParentNode(
+            "p",
+            [LeafNode("b", "Bold"), LeafNode(None, " text")],
+            {"class": "x"},
+        )
+        self.assertEqual(
+            list(node.iter_html()),
+            ['<p class="x">', "<b>Bold</b>", " text", "</p>"],
+        )
+
+    def test_write_html(self):
+        node = ParentNode("div", [ParentNode("span", [LeafNode("i", "deep")])])
+        out = io.StringIO()
+        node.write_html(out)
+        self.assertEqual(out.getvalue(), "<div><span><i>deep</i></span></div>")
+
+    def test_to_html_very_deep(self):
+        node = LeafNode(None, "x")
+        for _ in range(5000):
+            node = ParentNode("div", [node])
+        html = node.to_html()
+        self.assertEqual(len(html), 5000 * len("<div></div>") + 1)
+        self.assertTrue(html.startswith("<div><div>"))
+
+    def test_iter_text(self):
+        node = ParentNode(
+            "p",
+            [
+                LeafNode(None, "Go "),
+                ParentNode("b", [LeafNode("i", "deep")]),
+                LeafNode("img", "", {"src": "x.png"}),
+                LeafNode("a", " now", {"href": "/away"}),
+            ],
+        )
+        self.assertEqual(list(node.iter_text()), ["Go ", "deep", "", " now"])
+
+    def test_slots_layout(self):
+        # a subclass without __slots__ would bring back a __dict__ per node
+        for node in (LeafNode("p", "x"), ParentNode("div", []), HTMLNode()):
+            self.assertFalse(hasattr(node, "__dict__"), type(node).__name__)
+        with self.assertRaises(AttributeError):
+            LeafNode("p", "x").extra = 1
+
+    def test_to_html_no_children(self):
+        node = ParentNode("div", [ParentNode("p", None)])
+        with self.assertRaises(ValueError):
+            node.to_html()
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,116 @@
+import contextlib
+import io
+import os
+import struct
+import tempfile
+import unittest
+
+from images import (
+    Image,
+    ImageCache,
+    add_image_attributes,
+    image_size,
+    process_images,
+    variant_path,
+)
+from manifest import BuildManifest
+
+
+def png_bytes(width, height):
+    ihdr = struct.pack(">II", width, height) + b"\x08\x06\x00\x00\x00"
+    return b"\x89PNG\r\n\x1a\n" + struct.pack(">I", 13) + b"IHDR" + ihdr
+
+
+def jpeg_bytes(width, height):
+    app0 = b"\xff\xe0" + struct.pack(">H", 16) + b"JFIF\x00" + b"\x00" * 9
+    sof0 = b"\xff\xc0" + struct.pack(">HBHH", 11, 8, height, width) + b"\x01" * 6
+    return b"\xff\xd8" + app0 + sof0 + b"\xff\xd9"
+
+
+class TestImages(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.static = os.path.join(self.tmp.name, "static")
+        self.dest = os.path.join(self.tmp.name, "docs")
+        self.cache_dir = os.path.join(self.tmp.name, "cache")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+    def add_static(self, manifest, rel_path, data):
+        source = self.write(os.path.join(self.static, rel_path), data)
+        dest = self.write(os.path.join(self.dest, rel_path), data)
+        manifest.record_static(source, os.stat(source), dest)
+
+    def test_image_size(self):
+        png = self.write(os.path.join(self.static, "a.png"), png_bytes(928, 468))
+        jpeg = self.write(os.path.join(self.static, "b.jpg"), jpeg_bytes(640, 480))
+        text = self.write(os.path.join(self.static, "c.png"), b"not an image")
+        self.assertEqual(image_size(png), (928, 468))
+        self.assertEqual(image_size(jpeg), (640, 480))
+        self.assertIsNone(image_size(text))
+
+    def test_variant_path(self):
+        self.assertEqual(variant_path("docs/tom.abc.png", 480), "docs/tom.abc-480w.png")
+
+    def test_add_image_attributes(self):
+        images = {
+            "/a.png": {"width": 800, "height": 600},
+            "/b.png": {"width": 900, "height": 300, "srcset": [["/b-480w.png", 480]]},
+        }
+        html = '<img src="/a.png" alt="A"></img><img src="/c.png" alt="C"></img>'
+        self.assertEqual(
+            add_image_attributes(html, images),
+            '<img src="/a.png" width="800" height="600" loading="lazy"'
+            ' decoding="async" alt="A"></img><img src="/c.png" alt="C"></img>',
+        )
+        html = '<img src="/b.png" alt="B"></img>'
+        self.assertEqual(
+            add_image_attributes(html, images, "/site/", {"/b.png": "/b.1.png"}),
+            '<img src="/b.png" width="900" height="300" loading="lazy"'
+            ' decoding="async" srcset="/site/b-480w.png 480w, /site/b.1.png 900w"'
+            ' sizes="(max-width: 900px) 100vw, 900px" alt="B"></img>',
+        )
+
+    def test_process_images(self):
+        manifest = BuildManifest()
+        self.add_static(manifest, "images/a.png", png_bytes(928, 468))
+        self.add_static(manifest, "index.css", b"body {}")
+        images = process_images(manifest, self.dest, self.cache_dir)
+        self.assertEqual(images, {"/images/a.png": {"width": 928, "height": 468}})
+
+        # the size comes from the cache while the source is unchanged
+        cache = ImageCache.load(self.cache_dir)
+        self.assertEqual(list(cache.sizes.values()), [[928, 468]])
+        source = os.path.join(self.static, "images", "a.png")
+        digest = cache.files[source]["hash"]
+        cache.sizes[digest] = [1, 1]
+        self.assertEqual(cache.size(digest, source), (1, 1))
+
+    @unittest.skipIf(Image is None, "Pillow is not installed")
+    def test_process_images_variants(self):
+        source = os.path.join(self.static, "a.png")
+        os.makedirs(self.static)
+        Image.new("RGB", (800, 400)).save(source)
+        dest = os.path.join(self.dest, "a.png")
+        os.makedirs(self.dest)
+        manifest = BuildManifest()
+        manifest.record_static(source, os.stat(source), dest)
+        with contextlib.redirect_stdout(io.StringIO()):
+            images = process_images(manifest, self.dest, self.cache_dir, [200, 1600])
+        self.assertEqual(images["/a.png"]["srcset"], [["/a-200w.png", 200]])
+        with Image.open(os.path.join(self.dest, "a-200w.png")) as variant:
+            self.assertEqual(variant.size, (200, 100))
+        self.assertEqual(
+            manifest.outputs, {os.path.join(self.dest, "a-200w.png"): "image"}
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
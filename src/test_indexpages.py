@@ -0,0 +1,134 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+from gencontent import PageRecord
+from indexpages import (
+    collect_sections,
+    section_index_pages,
+    write_index_pages,
+)
+from manifest import BuildManifest
+from template import TemplateRegistry
+
+
+def record(dest_path, title, date=None, tags=None, summary=None):
+    metadata = {}
+    if date is not None:
+        metadata["date"] = date
+    if tags is not None:
+        metadata["tags"] = tags
+    return PageRecord(dest_path, metadata, {"title": title, "summary": summary})
+
+
+class TestIndexPages(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.content = os.path.join(self.tmp.name, "content")
+        self.dest = os.path.join(self.tmp.name, "docs")
+        self.template = os.path.join(self.tmp.name, "template.html")
+        with open(self.template, "w") as f:
+            f.write("<title>{{ Title }}</title>{{ Content }}")
+        self.templates = TemplateRegistry(self.template)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def post(self, name, title, **kwargs):
+        source = os.path.join(self.content, "blog", name, "index.md")
+        dest = os.path.join(self.dest, "blog", name, "index.html")
+        return source, record(dest, title, **kwargs)
+
+    def write(self, records, manifest=None, page_size=None):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return write_index_pages(
+                dict(records),
+                self.templates,
+                self.content,
+                self.dest,
+                manifest,
+                page_size,
+            )
+
+    def read(self, *parts):
+        with open(os.path.join(self.dest, *parts)) as f:
+            return f.read()
+
+    def test_collect_sections(self):
+        records = dict(
+            [
+                self.post("old", "Old", date="2024-01-01"),
+                self.post("new", "New", date="2025-01-01"),
+                self.post("undated", "Undated"),
+                (
+                    os.path.join(self.content, "index.md"),
+                    record(os.path.join(self.dest, "index.html"), "Home"),
+                ),
+                (
+                    os.path.join(self.content, "contact", "index.md"),
+                    record(os.path.join(self.dest, "contact", "index.html"), "C"),
+                ),
+                (
+                    os.path.join(self.content, "contact", "form", "index.md"),
+                    record(os.path.join(self.dest, "contact", "f.html"), "F"),
+                ),
+            ]
+        )
+        sections = collect_sections(records, self.content, self.dest)
+        self.assertEqual(list(sections), ["blog"])
+        self.assertEqual(
+            [(post.url, post.title) for post in sections["blog"]],
+            [
+                ("/blog/new", "New"),
+                ("/blog/old", "Old"),
+                ("/blog/undated", "Undated"),
+            ],
+        )
+
+    def test_pagination_and_tags(self):
+        records = [
+            self.post(f"p{i}", f"P{i}", date=f"2025-01-0{i}", tags="Elves, books")
+            for i in range(1, 4)
+        ]
+        records.append(self.post("p0", "Post 0", tags=["elves"], summary="**hi**"))
+        sections = collect_sections(dict(records), self.content, self.dest)
+        pages = list(section_index_pages("blog", sections["blog"], 2))
+        self.assertEqual(
+            [(rel_dir, title) for rel_dir, title, _ in pages],
+            [
+                ("blog", "Blog"),
+                ("blog/page/2", "Blog (page 2)"),
+                ("blog/tags/books", "Blog: books"),
+                ("blog/tags/books/page/2", "Blog: books (page 2)"),
+                ("blog/tags/elves", "Blog: Elves"),
+                ("blog/tags/elves/page/2", "Blog: Elves (page 2)"),
+            ],
+        )
+        html = pages[1][2].to_html()
+        self.assertIn('<a href="/blog/p0">Post 0</a></h2><p><b>hi</b></p>', html)
+        self.assertTrue(html.endswith('<nav><a href="/blog">« Newer</a></nav></div>'))
+        self.assertIn('<a href="/blog/page/2">Older »</a>', pages[0][2].to_html())
+
+    def test_writes_only_changed_pages(self):
+        records = [self.post("a", "A", tags=["x"]), self.post("b", "B", tags=["y"])]
+        manifest = BuildManifest()
+        written = self.write(records, manifest)
+        self.assertEqual(len(written), 3)
+        self.assertIn("<title>Blog</title>", self.read("blog", "index.html"))
+        self.assertEqual(set(manifest.outputs.values()), {"index"})
+        self.assertEqual(len(manifest.outputs), 3)
+
+        records.append(self.post("c", "C", tags=["y"]))
+        written = self.write(records)
+        self.assertEqual(
+            written,
+            [
+                os.path.join(self.dest, "blog", "index.html"),
+                os.path.join(self.dest, "blog", "tags", "y", "index.html"),
+            ],
+        )
+
+if __name__ == "__main__":
+    unittest.main()
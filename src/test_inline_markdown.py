@@ -6,6 +6,8 @@ from inline_markdown import (
     text_to_textnodes,
     extract_markdown_links,
     extract_markdown_images,
+    extract_markdown_media,
+    split_nodes_media,
 )
 
 from textnode import TextNode, TextType
@@ -109,6 +111,31 @@ class TestInlineMarkdown(unittest.TestCase):
             matches,
         )
 
+    def test_extract_markdown_media(self):
+        images, links = extract_markdown_media(
+            "![img](a.png) then [link](https://boot.dev) and ![two](b.png)"
+        )
+        self.assertListEqual([("img", "a.png"), ("two", "b.png")], images)
+        self.assertListEqual([("link", "https://boot.dev")], links)
+
+    def test_split_media(self):
+        node = TextNode(
+            "[link](https://boot.dev) and ![image](i.png) end", TextType.TEXT
+        )
+        self.assertListEqual(
+            [
+                TextNode("link", TextType.LINK, "https://boot.dev"),
+                TextNode(" and ", TextType.TEXT),
+                TextNode("image", TextType.IMAGE, "i.png"),
+                TextNode(" end", TextType.TEXT),
+            ],
+            split_nodes_media([node]),
+        )
+
+    def test_split_link_skips_images(self):
+        node = TextNode("![image](i.png)", TextType.TEXT)
+        self.assertListEqual([node], split_nodes_link([node]))
+
     def test_split_image(self):
         node = TextNode(
             "This is text with an ![image](https://i.imgur.com/zjjcJKZ.png)",
@@ -192,5 +219,50 @@ class TestInlineMarkdown(unittest.TestCase):
         )
 
 
+    def test_text_to_textnodes_matches_split_chain(self):
+        samples = [
+            "plain text",
+            "",
+            "**bold** start and end **bold**",
+            "a `code` and _italic_ and **bold** together",
+            "snake_case_name",
+            "![img](/a.png)![img2](/b.png)",
+            "see [one](/1), [two](/2) and [three](/3).",
+            "not a link [x] and not an image ![y] or ![z](",
+            "mixed ![pic](/p.png) then [link](https://boot.dev) then ![pic2](/q.png)",
+        ]
+        for text in samples:
+            nodes = [TextNode(text, TextType.TEXT)]
+            nodes = split_nodes_delimiter(nodes, "**", TextType.BOLD)
+            nodes = split_nodes_delimiter(nodes, "_", TextType.ITALIC)
+            nodes = split_nodes_delimiter(nodes, "`", TextType.CODE)
+            nodes = split_nodes_image(nodes)
+            nodes = split_nodes_link(nodes)
+            self.assertListEqual(nodes, text_to_textnodes(text), text)
+
+    def test_text_to_textnodes_link_with_underscores(self):
+        nodes = text_to_textnodes("read [my_post](/blog/my_post) now")
+        self.assertListEqual(
+            [
+                TextNode("read ", TextType.TEXT),
+                TextNode("my_post", TextType.LINK, "/blog/my_post"),
+                TextNode(" now", TextType.TEXT),
+            ],
+            nodes,
+        )
+
+    def test_text_to_textnodes_unclosed(self):
+        with self.assertRaises(ValueError):
+            text_to_textnodes("this is **not closed")
+        with self.assertRaises(ValueError):
+            text_to_textnodes("this is `not closed")
+
+    def test_text_to_textnodes_many_links(self):
+        text = " ".join(f"[link {i}](/posts/{i})" for i in range(1000))
+        nodes = text_to_textnodes(text)
+        self.assertEqual(len(nodes), 1999)
+        self.assertEqual(nodes[-1], TextNode("link 999", TextType.LINK, "/posts/999"))
+
+
 if __name__ == "__main__":
-    unittest.main()
\ No newline at end of file
+    unittest.main()
@@ -0,0 +1,119 @@
+import io
+import os
+import unittest
+
+from gencontent import PageRecord
+from linkcheck import (
+    PathIndex,
+    check_links,
+    is_internal_url,
+    report_broken_links,
+    resolve_url,
+)
+from manifest import BuildManifest
+
+
+class TestLinkCheck(unittest.TestCase):
+    def setUp(self):
+        self.dest = os.path.join("site", "docs")
+
+    def output(self, rel_path):
+        return os.path.join(self.dest, *rel_path.split("/"))
+
+    def test_is_internal_url(self):
+        self.assertTrue(is_internal_url("/blog/tom"))
+        self.assertTrue(is_internal_url("images/a.png"))
+        self.assertTrue(is_internal_url("../b"))
+        self.assertFalse(is_internal_url("https://example.com/x"))
+        self.assertFalse(is_internal_url("//cdn.example.com/x.js"))
+        self.assertFalse(is_internal_url("mailto:me@example.com"))
+        self.assertFalse(is_internal_url("#top"))
+        self.assertFalse(is_internal_url(""))
+
+    def test_resolve_url(self):
+        self.assertEqual(resolve_url("/blog/tom#end", "/x"), "/blog/tom")
+        self.assertEqual(resolve_url("a.png?v=2", "/blog/tom"), "/blog/tom/a.png")
+        self.assertEqual(resolve_url("../majesty/", "/blog/tom"), "/blog/majesty/")
+        self.assertEqual(resolve_url("../../..", "/blog"), "/")
+        self.assertEqual(resolve_url("/with%20space.png", "/"), "/with space.png")
+        self.assertIsNone(resolve_url("?page=2", "/"))
+
+    def test_path_index(self):
+        index = PathIndex(self.dest)
+        index.add_output(self.output("index.html"))
+        index.add_output(self.output("blog/tom/index.html"))
+        index.add_output(self.output("contact.html"))
+        index.add_output(self.output("images/tom.png"))
+        for url in (
+            "/",
+            "/index.html",
+            "/blog/tom",
+            "/blog/tom/",
+            "/blog/tom/index.html",
+            "/contact",
+            "/contact.html",
+            "/images/tom.png",
+        ):
+            self.assertIn(url, index)
+        self.assertNotIn("/blog", index)
+        self.assertNotIn("/images/", index)
+
+    def test_index_from_manifest(self):
+        manifest = BuildManifest()
+        manifest.record_page("content/index.md", "h", self.output("index.html"))
+        manifest.record_output(self.output("sitemap.xml"), "artifact")
+        manifest.record_static("static/a.css", os.stat(__file__), self.output("a.css"))
+        manifest.record_static(
+            "static/b.png",
+            os.stat(__file__),
+            self.output("b.123.png"),
+            self.output("b.png"),
+        )
+        index = PathIndex.from_manifest(manifest, self.dest)
+        self.assertEqual(
+            index.paths,
+            {"/", "/index.html", "/sitemap.xml", "/a.css", "/b.123.png", "/b.png"},
+        )
+
+    def test_check_links(self):
+        index = PathIndex(self.dest)
+        index.add_output(self.output("index.html"))
+        index.add_output(self.output("blog/tom/index.html"))
+        index.add_output(self.output("images/tom.png"))
+        summary = {"title": "Tom", "summary": None}
+        records = {
+            "content/blog/tom/index.md": PageRecord(
+                self.output("blog/tom/index.html"),
+                {},
+                dict(
+                    summary, links=[[3, "/"], [5, "/blog/gone"], [9, "../../images/"]]
+                ),
+            ),
+            "content/index.md": PageRecord(
+                self.output("index.html"),
+                {},
+                dict(summary, links=[[2, "images/tom.png"], [4, "blog/tom#top"]]),
+            ),
+        }
+        broken = check_links(records, index)
+        self.assertEqual(
+            [(link.source_path, link.line, link.url) for link in broken],
+            [
+                ("content/blog/tom/index.md", 5, "/blog/gone"),
+                ("content/blog/tom/index.md", 9, "../../images/"),
+            ],
+        )
+
+        out = io.StringIO()
+        report_broken_links(broken, out)
+        self.assertEqual(
+            out.getvalue(),
+            "2 broken link(s):\n"
+            "  content/blog/tom/index.md\n"
+            "    line 5: /blog/gone\n"
+            "    line 9: ../../images/\n",
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
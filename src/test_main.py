@@ -0,0 +1,79 @@
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import main
+
+
+TEMPLATE = "<title>{{ Title }}</title><article>{{ Content }}</article>"
+
+
+class TestMain(unittest.TestCase):
+    # drives whole builds in a site laid out like the repo's own
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.tmp.name)
+        self.write("template.html", TEMPLATE)
+        self.write("content/index.md", "# Home\n\n[Post](/blog/post)")
+        self.write("content/blog/post/index.md", "# Post\n\nSome text.")
+        self.write("static/index.css", "body {}")
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def write(self, path, text):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            f.write(text)
+
+    def run_main(self, *args):
+        argv = ["main.py", "-j", "1", "-q", *args]
+        with mock.patch.object(sys, "argv", argv):
+            with contextlib.redirect_stdout(io.StringIO()):
+                with contextlib.redirect_stderr(io.StringIO()):
+                    main.main()
+
+    def mtimes(self):
+        mtimes = {}
+        for dir_path, _, names in os.walk("docs"):
+            for name in names:
+                path = os.path.join(dir_path, name)
+                mtimes[path] = os.stat(path).st_mtime_ns
+        return mtimes
+
+    def test_zero_copy_threads_uses_the_default(self):
+        self.assertEqual(main.parse_args(["--copy-threads", "0"]).copy_threads, 0)
+        with contextlib.redirect_stderr(io.StringIO()):
+            with self.assertRaises(SystemExit):
+                main.parse_args(["--copy-threads", "-1"])
+        self.run_main("--copy-threads", "0")
+        self.assertTrue(os.path.exists(os.path.join("docs", "index.css")))
+        self.assertFalse(os.path.exists(main.dir_path_staging))
+
+    def test_full_builds_keep_unchanged_mtimes(self):
+        self.run_main()
+        before = self.mtimes()
+        self.assertIn(os.path.join("docs", "blog", "post", "index.html"), before)
+        # a coarse filesystem clock would hide a rewrite; static files are
+        # copied with the mtime of their source
+        for path in [*before, os.path.join("static", "index.css")]:
+            os.utime(path, ns=(1, 1))
+        self.run_main()
+        self.assertEqual(self.mtimes(), dict.fromkeys(before, 1))
+        self.assertFalse(os.path.exists(main.dir_path_staging))
+
+        self.write("content/blog/post/index.md", "# Post\n\nOther text.")
+        self.run_main()
+        changed = [path for path, mtime in self.mtimes().items() if mtime != 1]
+        self.assertIn(os.path.join("docs", "blog", "post", "index.html"), changed)
+        self.assertNotIn(os.path.join("docs", "index.html"), changed)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,212 @@
+import os
+import tempfile
+import unittest
+
+from manifest import BuildManifest
+
+
+class TestBuildManifest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name, text):
+        path = os.path.join(self.dir, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(text)
+        return path
+
+    def test_page_unchanged(self):
+        dest = self.write("out/index.html", "<p>hi</p>")
+        manifest = BuildManifest()
+        manifest.set_inputs({"t.html": "t1"}, "/")
+        self.assertTrue(manifest.page_changed("a.md", "h1", dest))
+        manifest.record_page("a.md", "h1", dest)
+        self.assertFalse(manifest.page_changed("a.md", "h1", dest))
+        self.assertTrue(manifest.page_changed("a.md", "h2", dest))
+
+    def test_template_change_invalidates_pages(self):
+        dest = self.write("out/index.html", "<p>hi</p>")
+        manifest = BuildManifest()
+        manifest.set_inputs({"t.html": "t1"}, "/")
+        manifest.record_page("a.md", "h1", dest, template="t.html")
+        manifest.set_inputs({"t.html": "t2"}, "/")
+        self.assertTrue(manifest.page_changed("a.md", "h1", dest, "t.html"))
+
+    def test_template_change_keeps_other_templates_pages(self):
+        blog = self.write("out/blog/index.html", "blog")
+        home = self.write("out/index.html", "home")
+        manifest = BuildManifest()
+        manifest.set_inputs({"t.html": "t1", "blog.html": "b1"}, "/")
+        manifest.record_page("blog.md", "h1", blog, template="blog.html")
+        manifest.record_page("home.md", "h2", home, template="t.html")
+        manifest.set_inputs({"t.html": "t1", "blog.html": "b2"}, "/")
+        self.assertTrue(manifest.page_changed("blog.md", "h1", blog, "blog.html"))
+        self.assertFalse(manifest.page_changed("home.md", "h2", home, "t.html"))
+
+    def test_page_template_switch_is_changed(self):
+        dest = self.write("out/index.html", "<p>hi</p>")
+        manifest = BuildManifest()
+        manifest.record_page("a.md", "h1", dest, template="t.html")
+        self.assertTrue(manifest.page_changed("a.md", "h1", dest, "blog.html"))
+
+    def test_basepath_change_invalidates_pages(self):
+        dest = self.write("out/index.html", "<p>hi</p>")
+        manifest = BuildManifest()
+        manifest.set_inputs({"t.html": "t1"}, "/")
+        manifest.record_page("a.md", "h1", dest)
+        manifest.set_inputs({"t.html": "t1"}, "/site/")
+        self.assertTrue(manifest.page_changed("a.md", "h1", dest))
+
+    def test_input_change_keeps_outputs_of_deleted_sources(self):
+        kept = self.write("out/kept/index.html", "kept")
+        gone = self.write("out/gone/index.html", "gone")
+        generated = self.write("out/sitemap.xml", "<urlset/>")
+        for templates, basepath in (({"t.html": "t2"}, "/"), ({"t.html": "t1"}, "/x/")):
+            manifest = BuildManifest()
+            manifest.set_inputs({"t.html": "t1"}, "/")
+            manifest.record_page("kept.md", "h1", kept, template="t.html")
+            manifest.record_page("gone.md", "h2", gone, template="t.html")
+            manifest.record_output(generated, "artifact")
+
+            # the inputs change in the same build that gone.md was deleted in
+            manifest = BuildManifest(
+                manifest.templates, "/", manifest.pages, outputs=manifest.outputs
+            )
+            manifest.set_inputs(templates, basepath)
+            self.assertTrue(manifest.page_changed("kept.md", "h1", kept, "t.html"))
+            manifest.record_page("kept.md", "h1", kept, template="t.html")
+            self.assertEqual(manifest.prune(), [gone, generated])
+            self.assertTrue(os.path.exists(kept))
+            self.write("out/gone/index.html", "gone")
+            self.write("out/sitemap.xml", "<urlset/>")
+
+    def test_asset_change_invalidates_pages_but_keeps_outputs(self):
+        source = self.write("a.md", "# A")
+        dest = self.write("out/index.html", "<p>hi</p>")
+        manifest = BuildManifest()
+        manifest.record_page(source, "h1", dest, os.stat(source), summary={})
+        manifest.set_assets({})
+        self.assertFalse(manifest.page_changed(source, "h1", dest))
+        manifest.set_assets({"/a.css": "/a.1.css"})
+        self.assertTrue(manifest.page_changed(source, "h1", dest))
+        self.assertFalse(manifest.page_stat_matches(source, os.stat(source), dest))
+        self.assertIsNone(manifest.page_summary(source))
+
+        # an output that is not built again is still pruned
+        manifest = BuildManifest(pages=manifest.pages)
+        self.assertEqual(manifest.prune(), [dest])
+
+    def test_record_static_removes_replaced_output(self):
+        old = self.write("out/a.1.css", "old")
+        new = self.write("out/a.2.css", "new")
+        manifest = BuildManifest()
+        manifest.record_static("static/a.css", os.stat(old), old, "out/a.css")
+        manifest.record_static("static/a.css", os.stat(new), new, "out/a.css")
+        self.assertFalse(os.path.exists(old))
+        self.assertEqual(manifest.static["static/a.css"]["original"], "out/a.css")
+
+    def test_page_metadata_reused_while_stat_matches(self):
+        source = self.write("a.md", "---\ndraft: true\n---\n# A")
+        stat = os.stat(source)
+        manifest = BuildManifest()
+        manifest.record_page(source, "h1", "out.html", stat, metadata={"draft": True})
+        self.assertEqual(manifest.page_metadata(source, stat), {"draft": True})
+        self.write("a.md", "# A")
+        self.assertIsNone(manifest.page_metadata(source, os.stat(source)))
+
+    def test_missing_output_is_changed(self):
+        manifest = BuildManifest()
+        dest = os.path.join(self.dir, "gone.html")
+        manifest.record_page("a.md", "h1", dest)
+        self.assertTrue(manifest.page_changed("a.md", "h1", dest))
+
+    def test_prune_static_keeps_pages(self):
+        page = self.write("out/old/index.html", "page")
+        asset = self.write("out/old.css", "body {}")
+        manifest = BuildManifest()
+        manifest.record_page("old.md", "h1", page)
+        manifest.record_static("static/old.css", os.stat(asset), asset)
+
+        manifest = BuildManifest(pages=manifest.pages, static=manifest.static)
+        self.assertEqual(manifest.prune_static(), [asset])
+        self.assertTrue(os.path.exists(page))
+        self.assertEqual(manifest.prune(), [page])
+
+    def test_prune_removes_outputs_of_deleted_sources(self):
+        kept = self.write("out/kept/index.html", "kept")
+        gone = self.write("out/gone/index.html", "gone")
+        manifest = BuildManifest()
+        manifest.record_page("kept.md", "h1", kept)
+        manifest.record_page("gone.md", "h2", gone)
+
+        manifest = BuildManifest(pages=manifest.pages)
+        manifest.page_changed("kept.md", "h1", kept)
+        self.assertEqual(manifest.prune(), [gone])
+        self.assertTrue(os.path.exists(kept))
+        self.assertFalse(os.path.exists(gone))
+        self.assertFalse(os.path.exists(os.path.dirname(gone)))
+        self.assertEqual(list(manifest.pages), ["kept.md"])
+
+    def test_prune_outputs_by_kind(self):
+        index = self.write("out/tags/old/index.html", "old")
+        shard = self.write("out/search/ol.json", "{}")
+        image = self.write("out/a-480w.png", "png")
+        manifest = BuildManifest()
+        manifest.record_output(index, "index")
+        manifest.record_output(shard, "search")
+        manifest.record_output(image, "image")
+        self.assertEqual(manifest.prune_outputs(), [])
+
+        # a rebuild that only regenerates the index pages and the search
+        # index leaves the image variant alone
+        manifest.record_output(shard, "search")
+        self.assertEqual(manifest.prune_outputs(("index", "search")), [index])
+        self.assertEqual(manifest.outputs, {shard: "search", image: "image"})
+        self.assertEqual(manifest.prune_outputs(("search",)), [shard])
+        self.assertEqual(manifest.prune(), [image])
+        self.assertEqual(manifest.outputs, {})
+
+    def test_move_outputs(self):
+        manifest = BuildManifest()
+        manifest.record_page("a.md", "h1", "docs.staging/a/index.html")
+        manifest.record_page("b.md", "h2", "./docs.staging/b.html")
+        manifest.record_page("c.md", "h3", "elsewhere/c.html")
+        manifest.record_output(os.path.join("docs.staging", "sitemap.xml"), "artifact")
+        manifest.move_outputs("./docs.staging", "./docs")
+        self.assertEqual(
+            [entry["dest"] for entry in manifest.pages.values()],
+            ["docs/a/index.html", "./docs/b.html", "elsewhere/c.html"],
+        )
+        self.assertEqual(
+            manifest.outputs, {os.path.join("docs", "sitemap.xml"): "artifact"}
+        )
+
+    def test_save_load_roundtrip(self):
+        path = os.path.join(self.dir, "manifest.json")
+        manifest = BuildManifest()
+        manifest.set_inputs({"t.html": "t1"}, "/")
+        manifest.record_page("a.md", "h1", "docs/index.html")
+        manifest.record_output("docs/sitemap.xml", "artifact")
+        manifest.save(path)
+
+        loaded = BuildManifest.load(path)
+        self.assertEqual(loaded.templates, {"t.html": "t1"})
+        self.assertEqual(loaded.basepath, "/")
+        self.assertEqual(loaded.outputs, {"docs/sitemap.xml": "artifact"})
+        self.assertEqual(
+            loaded.pages, {"a.md": {"hash": "h1", "dest": "docs/index.html"}}
+        )
+
+    def test_load_missing(self):
+        loaded = BuildManifest.load(os.path.join(self.dir, "nope.json"))
+        self.assertEqual(loaded.pages, {})
+        self.assertEqual(loaded.templates, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,8 +3,11 @@ from markdown_blocks import (
     markdown_to_html_node,
     markdown_to_blocks,
     block_to_block_type,
+    iter_blocks,
+    iter_numbered_blocks,
     BlockType,
 )
+import io
 
 
 class TestMarkdownToHTML(unittest.TestCase):
@@ -164,5 +167,53 @@ the **same** even with inline stuff
         )
 
 
+    def test_iter_blocks_separators(self):
+        md = "# Title\n   \n\n\n\nfirst\nsecond\n\t\n- a\n- b\n"
+        self.assertEqual(
+            list(iter_blocks(md.split("\n"))),
+            [
+                (BlockType.HEADING, ["# Title"]),
+                (BlockType.PARAGRAPH, ["first", "second"]),
+                (BlockType.ULIST, ["- a", "- b"]),
+            ],
+        )
+
+    def test_iter_blocks_fence_keeps_blank_lines(self):
+        md = "```python\nx = 1\n\n\ny = 2\n```\nafter"
+        html = markdown_to_html_node(md).to_html()
+        self.assertEqual(
+            html,
+            "<div><pre><code>x = 1\n\n\ny = 2\n</code></pre><p>after</p></div>",
+        )
+
+    def test_iter_numbered_blocks(self):
+        md = "# Title\n\n\n```\ncode\n\nmore\n```\n- a\n- b\n\nend"
+        blocks = iter_numbered_blocks(md.split("\n"), 3)
+        self.assertEqual(
+            [(number, block_type) for number, block_type, _ in blocks],
+            [
+                (3, BlockType.HEADING),
+                (6, BlockType.CODE),
+                (11, BlockType.ULIST),
+                (14, BlockType.PARAGRAPH),
+            ],
+        )
+
+    def test_iter_blocks_from_file(self):
+        source = io.StringIO("> quote\r\n> more\r\n\r\n1. one\r\n2. two\r\n")
+        self.assertEqual(
+            list(iter_blocks(source)),
+            [
+                (BlockType.QUOTE, ["> quote", "> more"]),
+                (BlockType.OLIST, ["1. one", "2. two"]),
+            ],
+        )
+
+    def test_long_ordered_list(self):
+        md = "\n".join(f"{i}. item {i}" for i in range(1, 13))
+        html = markdown_to_html_node(md).to_html()
+        self.assertTrue(html.startswith("<div><ol><li>item 1</li>"))
+        self.assertTrue(html.endswith("<li>item 12</li></ol></div>"))
+
 if __name__ == "__main__":
     unittest.main()
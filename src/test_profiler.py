@@ -0,0 +1,98 @@
+import tracemalloc
+import unittest
+
+from profiler import NULL_PROFILER, BuildProfiler
+
+
+class TestBuildProfiler(unittest.TestCase):
+    def setUp(self):
+        if not tracemalloc.is_tracing():
+            self.addCleanup(tracemalloc.stop)
+
+    def test_phase_records(self):
+        profiler = BuildProfiler()
+        with profiler.phase("rmtree"):
+            pass
+        with profiler.phase("file read", "a.md"):
+            pass
+        self.assertEqual(
+            [record[:2] for record in profiler.records],
+            [("rmtree", None), ("file read", "a.md")],
+        )
+
+    def test_phase_peak_memory(self):
+        profiler = BuildProfiler()
+        with profiler.phase("artifacts"):
+            with profiler.phase("index pages"):
+                data = bytearray(1024 * 1024)
+                del data
+            kept = bytearray(64 * 1024)
+        inner, outer = [record[3] for record in profiler.records]
+        self.assertGreaterEqual(inner, 1024 * 1024)
+        # the outer phase saw the inner one's peak, and memory freed again is
+        # never negative
+        self.assertGreaterEqual(outer, inner)
+        with profiler.phase("link check"):
+            del kept
+        self.assertGreaterEqual(profiler.records[-1][3], 0)
+        self.assertIn("peak KiB", profiler.report())
+
+    def test_phase_records_on_error(self):
+        profiler = BuildProfiler()
+        with self.assertRaises(ValueError):
+            with profiler.phase("inline parse", "a.md"):
+                raise ValueError("bad")
+        self.assertEqual(len(profiler.records), 1)
+
+    def test_to_dict(self):
+        profiler = BuildProfiler()
+        profiler.merge(
+            [
+                ("file read", "a.md", 0.5, 1),
+                ("to_html", "a.md", 1.0, 2),
+                ("file read", "b.md", 2.0, 3),
+                ("static copy", None, 0.25, 4),
+            ]
+        )
+        data = profiler.to_dict(top=1)
+        self.assertEqual(data["seconds"], 3.75)
+        self.assertEqual(data["pages"], 2)
+        self.assertEqual(
+            data["phases"]["file read"], {"calls": 2, "seconds": 2.5, "peak_bytes": 3}
+        )
+        self.assertEqual(
+            data["slowest_pages"],
+            [{"page": "b.md", "seconds": 2.0, "phases": {"file read": 2.0}}],
+        )
+        self.assertIn("b.md", profiler.report(top=1))
+
+    def test_stage_clock(self):
+        profiler = BuildProfiler()
+        clock = profiler.page_clock("a.md")
+
+        def lines():
+            yield "a"
+            yield "b"
+
+        with clock.stage("template substitution"):
+            items = list(clock.iterate("file read", lines()))
+        clock.stop()
+        self.assertEqual(items, ["a", "b"])
+        # each stage is recorded once for the page, however often it ran
+        self.assertEqual(
+            [record[:2] for record in profiler.records],
+            [("template substitution", "a.md"), ("file read", "a.md")],
+        )
+        self.assertTrue(all(record[2] >= 0 for record in profiler.records))
+
+    def test_null_profiler(self):
+        with NULL_PROFILER.phase("rmtree"):
+            pass
+        lines = ["a"]
+        clock = NULL_PROFILER.page_clock("a.md")
+        self.assertIs(clock.iterate("file read", lines), lines)
+        self.assertFalse(NULL_PROFILER.enabled)
+
+
+if __name__ == "__main__":
+    unittest.main()
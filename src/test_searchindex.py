@@ -0,0 +1,85 @@
+import json
+import os
+import tempfile
+import unittest
+
+from manifest import BuildManifest
+from searchindex import (
+    SearchIndex,
+    build_postings,
+    decode_postings,
+    encode_postings,
+    shard_name,
+    tokenize,
+    write_search_index,
+)
+
+
+class TestSearchIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dest = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_tokenize(self):
+        self.assertEqual(
+            tokenize('<p>Fish &amp; <a href="/chips">Chips</a>, a_b 42</p>'),
+            ["fish", "chips", "42"],
+        )
+
+    def test_postings_roundtrip(self):
+        for doc_ids in ([], [0], [0, 1, 2], [5, 127, 128, 300, 20000, 2**40]):
+            self.assertEqual(decode_postings(encode_postings(doc_ids)), doc_ids)
+        # small gaps take a byte each
+        self.assertEqual(encode_postings([1, 2, 3]), "AQEB")
+
+    def test_build_postings(self):
+        postings = build_postings([["a", "b", "a"], ["b"], ["c", "b"]])
+        self.assertEqual(postings, {"a": [0], "b": [0, 1, 2], "c": [2]})
+
+    def test_shard_name(self):
+        self.assertEqual(shard_name("python"), "py")
+        self.assertEqual(shard_name("x"), "x")
+        self.assertEqual(shard_name("été"), "x" + "ét".encode("utf-8").hex())
+
+    def test_write_and_search(self):
+        docs = [
+            ("/", "Home", ["welcome", "python"]),
+            ("/blog/a", "A", ["python", "tips"]),
+            ("/blog/b", "B", ["pytest", "tips", "été"]),
+        ]
+        manifest = BuildManifest()
+        written = write_search_index(docs, self.dest, manifest)
+        search_dir = os.path.join(self.dest, "search")
+        names = sorted(os.listdir(search_dir))
+        self.assertEqual(len(written), len(names))
+        self.assertIn("index.json", names)
+        self.assertIn("py.json", names)
+        shard_path = os.path.join(search_dir, "py.json")
+        self.assertEqual(manifest.outputs[shard_path], "search")
+        with open(os.path.join(search_dir, "py.json")) as f:
+            self.assertEqual(set(json.load(f)), {"python", "pytest"})
+
+        index = SearchIndex(search_dir)
+        self.assertEqual(index.search("Python"), [("/", "Home"), ("/blog/a", "A")])
+        self.assertEqual(index.search("python tips"), [("/blog/a", "A")])
+        self.assertEqual(index.search("Été"), [("/blog/b", "B")])
+        self.assertEqual(index.search("missing python"), [])
+        self.assertEqual(index.search("!"), [])
+        # only the shards the queries needed were read
+        self.assertEqual(set(index.shards), {"py", "ti", shard_name("été"), "mi"})
+
+        self.assertEqual(write_search_index(docs, self.dest), [])
+
+    def test_unsupported_format(self):
+        os.makedirs(os.path.join(self.dest, "search"))
+        with open(os.path.join(self.dest, "search", "index.json"), "w") as f:
+            json.dump({"format": 99}, f)
+        with self.assertRaises(ValueError):
+            SearchIndex(os.path.join(self.dest, "search"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,176 @@
+import io
+import os
+import tempfile
+import unittest
+
+from template import Template, TemplateRegistry, rewrite_links
+
+
+class TestTemplate(unittest.TestCase):
+    def test_slots(self):
+        template = Template("<title>{{ Title }}</title><main>{{ Content }}</main>")
+        self.assertEqual(template.slots, ["Title", "Content"])
+        self.assertEqual(template.segments, ["<title>", "</title><main>", "</main>"])
+
+    def test_render(self):
+        template = Template("<title>{{ Title }}</title><main>{{ Content }}</main>")
+        self.assertEqual(
+            template.render(Title="Hi", Content="<p>body</p>"),
+            "<title>Hi</title><main><p>body</p></main>",
+        )
+
+    def test_render_repeated_slot(self):
+        template = Template("{{ Title }}|{{ Title }}")
+        self.assertEqual(template.render(Title="x"), "x|x")
+
+    def test_render_missing_value(self):
+        template = Template("<p>{{ Unknown }}</p>")
+        self.assertEqual(template.render(), "<p>{{ Unknown }}</p>")
+
+    def test_basepath_rewrites_template_links(self):
+        template = Template(
+            '<link href="/index.css" /><img src="/logo.png" />{{ Content }}',
+            "/site/",
+        )
+        self.assertEqual(
+            template.segments[0],
+            '<link href="/site/index.css" /><img src="/site/logo.png" />',
+        )
+
+    def test_basepath_rewrites_content_not_title(self):
+        template = Template("<title>{{ Title }}</title>{{ Content }}", "/site/")
+        self.assertEqual(
+            template.render(
+                Title='href="/x',
+                Content='<a href="/blog">b</a><img src="/a.png" alt=""></img>',
+            ),
+            '<title>href="/x</title><a href="/site/blog">b</a><img src="/site/a.png" alt=""></img>',
+        )
+
+    def test_write_streams_fragments(self):
+        template = Template("<title>{{ Title }}</title>{{ Content }}", "/site/")
+        out = io.StringIO()
+        template.write(
+            out,
+            Title="Hi",
+            Content=iter(['<p><a href="/a">', "a", "</a></p>"]),
+        )
+        self.assertEqual(
+            out.getvalue(), '<title>Hi</title><p><a href="/site/a">a</a></p>'
+        )
+
+    def test_rewrite_links_root_basepath(self):
+        html = '<a href="/blog">b</a>'
+        self.assertIs(rewrite_links(html, "/"), html)
+
+    def test_rewrite_links_to_assets(self):
+        assets = {"/index.css": "/index.abc.css", "/a.png": "/a.def.png"}
+        html = '<link href="/index.css" /><img src="/a.png?x=1"><a href="/blog">b</a>'
+        self.assertEqual(
+            rewrite_links(html, "/site/", assets),
+            '<link href="/site/index.abc.css" /><img src="/site/a.def.png?x=1">'
+            '<a href="/site/blog">b</a>',
+        )
+        template = Template('<link href="/index.css" />{{ Content }}', assets=assets)
+        self.assertEqual(
+            template.render(Content=iter(['<img src="/a.png">'])),
+            '<link href="/index.abc.css" /><img src="/a.def.png">',
+        )
+
+    def test_image_attributes_before_asset_rewrite(self):
+        template = Template(
+            "{{ Content }}",
+            "/site/",
+            assets={"/a.png": "/a.1.png"},
+            images={"/a.png": {"width": 2, "height": 1}},
+        )
+        self.assertEqual(
+            template.render(Content='<img src="/a.png" alt=""></img>'),
+            '<img src="/site/a.1.png" width="2" height="1" loading="lazy"'
+            ' decoding="async" alt=""></img>',
+        )
+
+    def test_rewrite_links_leaves_absolute_urls(self):
+        self.assertEqual(
+            rewrite_links('<a href="https://boot.dev">b</a>', "/site/"),
+            '<a href="https://boot.dev">b</a>',
+        )
+
+
+class TestTemplateRegistry(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.default = self.write("template.html", "default {{ Content }}")
+        self.templates = os.path.join(self.root, "templates")
+        self.content = os.path.join(self.root, "content")
+        self.blog = self.write("templates/blog.html", "blog {{ Content }}")
+        self.landing = self.write("templates/landing.html", "landing {{ Content }}")
+        self.registry = TemplateRegistry(
+            self.default, "/", self.templates, self.content
+        )
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, rel_path, text):
+        path = os.path.join(self.root, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(text)
+        return path
+
+    def source(self, rel_path):
+        return os.path.join(self.content, rel_path)
+
+    def test_template_by_section(self):
+        self.assertEqual(
+            self.registry.path_for(self.source("blog/a/index.md")), self.blog
+        )
+        self.assertEqual(
+            self.registry.path_for(self.source("contact/index.md")), self.default
+        )
+        self.assertEqual(self.registry.path_for(self.source("index.md")), self.landing)
+        self.assertEqual(self.registry.path_for(self.source("about.md")), self.default)
+
+    def test_template_by_name(self):
+        path = self.registry.path_for(self.source("contact/index.md"), "blog")
+        self.assertEqual(path, self.blog)
+        with self.assertRaises(ValueError):
+            self.registry.path_for(self.source("index.md"), "missing")
+
+    def test_compiled_once(self):
+        first = self.registry.template_for(self.source("blog/a.md"))
+        second = self.registry.template_for(self.source("blog/b.md"))
+        self.assertIs(first, second)
+        self.assertEqual(first.render(Content="x"), "blog x")
+
+    def test_set_assets_recompiles(self):
+        self.write("templates/blog.html", '<img src="/a.png">{{ Content }}')
+        self.registry.reload()
+        first = self.registry.template_for(self.source("blog/a.md"))
+        self.registry.set_assets({})
+        self.assertIs(self.registry.template_for(self.source("blog/a.md")), first)
+        self.registry.set_assets({"/a.png": "/a.123.png"})
+        template = self.registry.template_for(self.source("blog/a.md"))
+        self.assertEqual(template.render(Content=""), '<img src="/a.123.png">')
+
+    def test_hashes_and_reload(self):
+        self.assertEqual(
+            sorted(self.registry.hashes()),
+            sorted([self.default, self.blog, self.landing]),
+        )
+        os.remove(self.blog)
+        self.registry.reload()
+        self.assertEqual(
+            self.registry.path_for(self.source("blog/a.md")), self.default
+        )
+
+    def test_without_templates_dir(self):
+        registry = TemplateRegistry(self.default)
+        self.assertEqual(registry.path_for(self.source("blog/a.md")), self.default)
+        self.assertEqual(list(registry.hashes()), [self.default])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,188 @@
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import main
+from blockcache import BlockCache
+from copystatic import StaticOptions
+from manifest import BuildManifest
+from template import TemplateRegistry
+from watch import diff_snapshots, scan_paths, scan_tree
+
+
+class TestWatch(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name, text):
+        path = os.path.join(self.dir, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(text)
+        return path
+
+    def test_scan_tree(self):
+        a = self.write("a.md", "a")
+        b = self.write("sub/b.md", "bb")
+        snapshot = scan_tree(self.dir)
+        self.assertEqual(sorted(snapshot), [a, b])
+        self.assertEqual(snapshot[b][1], 2)
+
+    def test_scan_paths_single_file(self):
+        a = self.write("template.html", "x")
+        self.assertEqual(list(scan_paths([a])), [a])
+
+    def test_diff_snapshots(self):
+        old = {"a": (1, 1), "b": (1, 1), "c": (1, 1)}
+        new = {"a": (1, 1), "b": (2, 1), "d": (1, 1)}
+        self.assertEqual(diff_snapshots(old, new), (["b", "d"], ["c"]))
+
+
+class TestRebuildChanged(unittest.TestCase):
+    # a full build of a small site, then the watcher's rebuild of the paths
+    # it would report, in the form scan_tree gives them
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.tmp.name)
+        self.write("template.html", "<title>{{ Title }}</title>{{ Content }}")
+        self.write("content/index.md", "# Home\n\n[Post](/blog/post)")
+        self.write("content/blog/post/index.md", "# Post\n\nText.")
+        self.write("content/blog/other/index.md", "# Other\n\nMore text.")
+        self.write("static/index.css", "body {}")
+        with mock.patch.object(sys, "argv", ["main.py", "-j", "1", "-q"]):
+            self.quietly(main.main)
+
+        self.templates = TemplateRegistry(
+            main.template_path,
+            "/",
+            main.dir_path_templates,
+            main.dir_path_content,
+        )
+        self.manifest = BuildManifest.load(main.manifest_path)
+        self.manifest.set_inputs(self.templates.hashes(), "/")
+        # only what a rebuild writes gets a new mtime
+        for dir_path, _, names in os.walk(main.dir_path_public):
+            for name in names:
+                os.utime(os.path.join(dir_path, name), ns=(1, 1))
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def write(self, path, text):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            f.write(text)
+
+    def read(self, path):
+        with open(path) as f:
+            return f.read()
+
+    def quietly(self, function, *args):
+        with contextlib.redirect_stdout(io.StringIO()):
+            with contextlib.redirect_stderr(io.StringIO()):
+                return function(*args)
+
+    def rebuild(self, changed, removed=()):
+        self.quietly(
+            main.rebuild_changed,
+            [os.path.join(".", *path.split("/")) for path in changed],
+            [os.path.join(".", *path.split("/")) for path in removed],
+            self.templates,
+            1,
+            self.manifest,
+            BlockCache(),
+            StaticOptions(verbosity=0),
+            main.SiteOptions(),
+        )
+
+    def rewritten(self):
+        rewritten = []
+        for dir_path, _, names in os.walk(main.dir_path_public):
+            for name in names:
+                path = os.path.join(dir_path, name)
+                if os.stat(path).st_mtime_ns != 1:
+                    rewritten.append(os.path.relpath(path, main.dir_path_public))
+        return sorted(rewritten)
+
+    def test_changed_page(self):
+        self.assertIn("Post", self.read("docs/blog/index.html"))
+        self.write("content/blog/post/index.md", "# Renamed\n\nText.")
+        self.rebuild(["content/blog/post/index.md"])
+        self.assertIn("<title>Renamed</title>", self.read("docs/blog/post/index.html"))
+        self.assertIn("Renamed", self.read("docs/blog/index.html"))
+        rewritten = self.rewritten()
+        self.assertIn(os.path.join("blog", "post", "index.html"), rewritten)
+        self.assertIn(os.path.join("blog", "index.html"), rewritten)
+        self.assertNotIn("index.html", rewritten)
+        self.assertNotIn(os.path.join("blog", "other", "index.html"), rewritten)
+        # the next build starts from the rebuilt manifest
+        saved = BuildManifest.load(main.manifest_path)
+        source = os.path.join(".", "content", "blog", "post", "index.md")
+        self.assertEqual(saved.page_summary(source)["title"], "Renamed")
+
+    def test_stale_generated_outputs_are_removed(self):
+        self.write("content/blog/post/index.md", "---\ntags: [old]\n---\n# Post")
+        self.rebuild(["content/blog/post/index.md"])
+        self.assertTrue(os.path.exists("docs/blog/tags/old/index.html"))
+        self.write("content/blog/post/index.md", "---\ntags: [new]\n---\n# Post")
+        self.rebuild(["content/blog/post/index.md"])
+        self.assertTrue(os.path.exists("docs/blog/tags/new/index.html"))
+        self.assertFalse(os.path.exists("docs/blog/tags/old"))
+        self.assertNotIn(
+            os.path.join(".", "docs", "blog", "tags", "old", "index.html"),
+            BuildManifest.load(main.manifest_path).outputs,
+        )
+        # the search shards of words no page has any more go too
+        shards = os.listdir("docs/search")
+        self.write("content/blog/other/index.md", "# Other\n\nZebra.")
+        self.rebuild(["content/blog/other/index.md"])
+        self.assertIn("ze.json", os.listdir("docs/search"))
+        self.assertNotIn("mo.json", os.listdir("docs/search"))
+        self.assertIn("mo.json", shards)
+
+    def test_added_static_file(self):
+        self.write("static/app.js", "run()")
+        self.rebuild(["static/app.js"])
+        self.assertEqual(self.read("docs/app.js"), "run()")
+        self.assertEqual(self.rewritten(), ["app.js"])
+        self.assertIn(os.path.join(".", "static", "app.js"), self.manifest.static)
+
+    def test_page_became_draft(self):
+        self.assertIn("/blog/post", self.read("docs/blog/index.html"))
+        self.write("content/blog/post/index.md", "---\ndraft: true\n---\n# Post")
+        self.rebuild(["content/blog/post/index.md"])
+        self.assertFalse(os.path.exists("docs/blog/post"))
+        self.assertNotIn("/blog/post", self.read("docs/blog/index.html"))
+        self.assertTrue(os.path.exists("docs/blog/other/index.html"))
+
+    def test_deleted_page(self):
+        self.assertIn("/blog/other", self.read("docs/blog/index.html"))
+        os.remove("content/blog/other/index.md")
+        self.rebuild([], ["content/blog/other/index.md"])
+        self.assertFalse(os.path.exists("docs/blog/other"))
+        self.assertNotIn("/blog/other", self.read("docs/blog/index.html"))
+        self.assertNotIn(
+            os.path.join(".", "content", "blog", "other", "index.md"),
+            BuildManifest.load(main.manifest_path).pages,
+        )
+
+    def test_template_change_with_deleted_page(self):
+        self.write("template.html", "<main>{{ Title }}{{ Content }}</main>")
+        os.remove("content/blog/other/index.md")
+        self.rebuild(["template.html"], ["content/blog/other/index.md"])
+        self.assertIn("<main>", self.read("docs/blog/post/index.html"))
+        self.assertFalse(os.path.exists("docs/blog/other"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+import os
+import tempfile
+import unittest
+
+from writer import (
+    AtomicWriter,
+    keep_unchanged_outputs,
+    read_versioned_json,
+    swap_directories,
+    write_if_changed,
+)
+
+
+class TestAtomicWriter(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "out", "index.html")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def read(self, path=None):
+        with open(path or self.path) as f:
+            return f.read()
+
+    def test_write_and_replace(self):
+        with AtomicWriter(self.path) as f:
+            f.writelines(["<p>", "one", "</p>"])
+        self.assertEqual(self.read(), "<p>one</p>")
+        writer = AtomicWriter(self.path)
+        with writer as f:
+            f.write("<p>two</p>")
+        self.assertTrue(writer.changed)
+        self.assertEqual(self.read(), "<p>two</p>")
+        self.assertEqual(os.listdir(os.path.dirname(self.path)), ["index.html"])
+
+    def test_unchanged_output_keeps_file(self):
+        write_if_changed(self.path, "same")
+        os.utime(self.path, ns=(1, 1))
+        writer = AtomicWriter(self.path)
+        with writer as f:
+            f.write("same")
+        self.assertFalse(writer.changed)
+        self.assertEqual(os.stat(self.path).st_mtime_ns, 1)
+        self.assertFalse(write_if_changed(self.path, "same"))
+        self.assertEqual(os.stat(self.path).st_mtime_ns, 1)
+        self.assertTrue(write_if_changed(self.path, "different"))
+
+    def test_read_versioned_json(self):
+        self.assertIsNone(read_versioned_json(self.path, 1))
+        write_if_changed(self.path, '{"version": 1, "a": 2}')
+        self.assertEqual(read_versioned_json(self.path, 1), {"version": 1, "a": 2})
+        self.assertIsNone(read_versioned_json(self.path, 2))
+        for text in ("{not json", "[1]"):
+            write_if_changed(self.path, text)
+            self.assertIsNone(read_versioned_json(self.path, 1))
+
+    def test_failed_write_leaves_old_file(self):
+        write_if_changed(self.path, "old")
+        with self.assertRaises(RuntimeError):
+            with AtomicWriter(self.path) as f:
+                f.write("partial")
+                raise RuntimeError("render failed")
+        self.assertEqual(self.read(), "old")
+        self.assertEqual(os.listdir(os.path.dirname(self.path)), ["index.html"])
+
+    def test_swap_directories(self):
+        live = os.path.join(self.tmp.name, "docs")
+        staged = os.path.join(self.tmp.name, "docs.staging")
+        write_if_changed(os.path.join(live, "old.html"), "old")
+        write_if_changed(os.path.join(staged, "new.html"), "new")
+        swap_directories(staged, live)
+        self.assertEqual(os.listdir(live), ["new.html"])
+        self.assertEqual(sorted(os.listdir(self.tmp.name)), ["docs"])
+
+    def test_keep_unchanged_outputs(self):
+        live = os.path.join(self.tmp.name, "docs")
+        staged = os.path.join(self.tmp.name, "docs.staging")
+        for name, text in (("same.html", "same"), ("changed.html", "old")):
+            write_if_changed(os.path.join(live, name), text)
+            os.utime(os.path.join(live, name), ns=(1, 1))
+        paths = []
+        for name, text in (("same.html", "same"), ("changed.html", "new")):
+            paths.append(os.path.join(staged, name))
+            write_if_changed(paths[-1], text)
+        paths.append(os.path.join(staged, "new.html"))
+        write_if_changed(paths[-1], "new")
+        self.assertEqual(keep_unchanged_outputs(paths, staged, live), 1)
+        self.assertEqual(os.stat(paths[0]).st_mtime_ns, 1)
+        self.assertNotEqual(os.stat(paths[1]).st_mtime_ns, 1)
+
+    def test_swap_into_missing_directory(self):
+        live = os.path.join(self.tmp.name, "docs")
+        staged = os.path.join(self.tmp.name, "docs.staging")
+        write_if_changed(os.path.join(staged, "new.html"), "new")
+        swap_directories(staged, live)
+        self.assertEqual(self.read(os.path.join(live, "new.html")), "new")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+import os
+import threading
+import time
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+
+def scan_tree(path):
+    snapshot = {}
+    if os.path.isfile(path):
+        stat = os.stat(path)
+        snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+    for dir_path, _, filenames in os.walk(path):
+        for filename in filenames:
+            file_path = os.path.join(dir_path, filename)
+            try:
+                stat = os.stat(file_path)
+            except FileNotFoundError:
+                continue
+            snapshot[file_path] = (stat.st_mtime_ns, stat.st_size)
+    return snapshot
+
+
+def scan_paths(paths):
+    snapshot = {}
+    for path in paths:
+        snapshot.update(scan_tree(path))
+    return snapshot
+
+
+def diff_snapshots(old, new):
+    changed = [path for path, stat in new.items() if old.get(path) != stat]
+    removed = [path for path in old if path not in new]
+    return sorted(changed), sorted(removed)
+
+
+def poll(paths, on_change, interval=0.5):
+    snapshot = scan_paths(paths)
+    while True:
+        time.sleep(interval)
+        current = scan_paths(paths)
+        changed, removed = diff_snapshots(snapshot, current)
+        snapshot = current
+        if changed or removed:
+            on_change(changed, removed)
+
+
+def serve(directory, port):
+    handler = partial(SimpleHTTPRequestHandler, directory=directory)
+    server = ThreadingHTTPServer(("", port), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
@@ -0,0 +1,150 @@
+import json
+import os
+import shutil
+import uuid
+
+try:
+    import ctypes
+except ImportError:
+    ctypes = None
+
+
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+# from linux/fcntl.h and linux/fs.h, for renameat2()
+AT_FDCWD = -100
+RENAME_EXCHANGE = 2
+
+
+class AtomicWriter:
+    # writes go to a hidden temp file next to the destination, which replaces
+    # it only once everything was written; a failed or interrupted write
+    # leaves the old file as it was, and identical output is not replaced at
+    # all so the destination keeps its mtime
+    def __init__(self, path, buffering=WRITE_BUFFER_SIZE):
+        self.path = str(path)
+        self.buffering = buffering
+        self.tmp_path = None
+        self.file = None
+        self.changed = None
+
+    def __enter__(self):
+        dir_path, name = os.path.split(self.path)
+        if dir_path != "":
+            os.makedirs(dir_path, exist_ok=True)
+        self.tmp_path = os.path.join(dir_path, f".{name}.{uuid.uuid4().hex}.tmp")
+        # os.open applies the umask like open() does, unlike mkstemp's 0600
+        fd = os.open(self.tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+        self.file = open(fd, "w", buffering=self.buffering, encoding="utf-8")
+        return self.file
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.file.close()
+        finally:
+            if exc_type is not None:
+                os.remove(self.tmp_path)
+        if exc_type is not None:
+            return False
+        self.changed = not same_contents(self.tmp_path, self.path)
+        if self.changed:
+            os.replace(self.tmp_path, self.path)
+        else:
+            os.remove(self.tmp_path)
+        return False
+
+    def __repr__(self):
+        return f"AtomicWriter({self.path}, changed: {self.changed})"
+
+
+def write_if_changed(path, text):
+    # text already in memory is compared before anything is written
+    data = text.encode("utf-8")
+    try:
+        with open(path, "rb") as f:
+            if f.read() == data:
+                return False
+    except FileNotFoundError:
+        pass
+    with AtomicWriter(path) as f:
+        f.write(text)
+    return True
+
+
+def read_versioned_json(path, version):
+    # the data of a JSON state file written by this version of the build, or
+    # None for a file that is missing, corrupt or from another version
+    try:
+        with open(path, "r") as f:
+            data = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if not isinstance(data, dict) or data.get("version") != version:
+        return None
+    return data
+
+
+def same_contents(path_a, path_b):
+    try:
+        if os.path.getsize(path_a) != os.path.getsize(path_b):
+            return False
+        with open(path_a, "rb") as a, open(path_b, "rb") as b:
+            while True:
+                chunk = a.read(WRITE_BUFFER_SIZE)
+                if chunk != b.read(WRITE_BUFFER_SIZE):
+                    return False
+                if not chunk:
+                    return True
+    except FileNotFoundError:
+        return False
+
+
+def keep_unchanged_outputs(paths, staged_dir, live_dir):
+    # a staged output with the same bytes as the live file it replaces takes
+    # over that file's mtime, so swapping in a full build only touches the
+    # outputs that changed
+    kept = 0
+    for path in paths:
+        rel_path = os.path.relpath(path, staged_dir)
+        if rel_path.startswith(os.pardir):
+            continue
+        live_path = os.path.join(live_dir, rel_path)
+        if same_contents(path, live_path):
+            stat = os.stat(live_path)
+            os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+            kept += 1
+    return kept
+
+
+def swap_directories(staged_dir, live_dir):
+    # puts a fully built staged_dir in place of live_dir and removes the old
+    # one; RENAME_EXCHANGE swaps both in a single step where it is available,
+    # otherwise the live directory is missing between two renames
+    if not os.path.exists(live_dir):
+        os.rename(staged_dir, live_dir)
+        return
+    if not exchange_paths(staged_dir, live_dir):
+        old_dir = live_dir + ".old"
+        if os.path.exists(old_dir):
+            shutil.rmtree(old_dir)
+        os.rename(live_dir, old_dir)
+        os.rename(staged_dir, live_dir)
+        staged_dir = old_dir
+    shutil.rmtree(staged_dir)
+
+
+def exchange_paths(path_a, path_b):
+    if ctypes is None:
+        return False
+    try:
+        renameat2 = ctypes.CDLL(None, use_errno=True).renameat2
+    except (AttributeError, OSError):
+        return False
+    result = renameat2(
+        AT_FDCWD,
+        os.fsencode(path_a),
+        AT_FDCWD,
+        os.fsencode(path_b),
+        RENAME_EXCHANGE,
+    )
+    return result == 0